@@ -0,0 +1,145 @@
+# hrdash/aggregates.py
+
+import sqlite3
+import sys
+
+from database import DATABASE_NAME
+
+# ===================================================================
+# 1. AGGREGATE DEFINITIONS
+# ===================================================================
+# Each materialized aggregate is a table of (key, count) kept current by triggers
+# on 'employees'. A definition gives the key expression and the condition under
+# which a row counts towards it, written against a row alias '{r}' so the same
+# text can be used for trigger rows ('new'/'old') and for a full recompute.
+# 'type' is the key column's type and defaults to TEXT.
+AGGREGATES = {
+    'agg_department_headcount': {
+        'key': 'department_id',
+        'type': 'INTEGER',
+        'expr': "{r}.department_id",
+        'where': "{r}.is_active = 1",
+    },
+    'agg_job_title_headcount': {
+        'key': 'job_title_id',
+        'type': 'INTEGER',
+        'expr': "{r}.job_title_id",
+        'where': "{r}.is_active = 1",
+    },
+    'agg_monthly_hires': {
+        'key': 'month',
+        'expr': "strftime('%Y-%m', {r}.start_date)",
+        'where': "strftime('%Y-%m', {r}.start_date) IS NOT NULL",
+    },
+    'agg_monthly_departures': {
+        'key': 'month',
+        'expr': "strftime('%Y-%m', {r}.end_date)",
+        'where': "{r}.is_active = 0 AND strftime('%Y-%m', {r}.end_date) IS NOT NULL",
+    },
+}
+
+# Columns whose changes can move a row between aggregate groups
+TRACKED_COLUMNS = "department_id, job_title_id, is_active, start_date, end_date"
+
+def _increment_sql(table, definition, alias):
+    """Statement that adds the row 'alias' to its group, creating the group if needed."""
+    key = definition['key']
+    expr = definition['expr'].format(r=alias)
+    where = definition['where'].format(r=alias)
+    return (f"INSERT INTO {table} ({key}, count) SELECT {expr}, 1 WHERE {where} "
+            f"ON CONFLICT({key}) DO UPDATE SET count = count + 1;")
+
+def _decrement_sql(table, definition, alias):
+    """Statement that removes the row 'alias' from its group."""
+    key = definition['key']
+    expr = definition['expr'].format(r=alias)
+    where = definition['where'].format(r=alias)
+    return f"UPDATE {table} SET count = count - 1 WHERE {key} = {expr} AND {where};"
+
+def _recompute_sql(table, definition):
+    """Query that computes the aggregate from scratch over the 'employees' table."""
+    key = definition['key']
+    expr = definition['expr'].format(r='e')
+    where = definition['where'].format(r='e')
+    return f"SELECT {expr} AS {key}, COUNT(*) AS count FROM employees AS e WHERE {where} GROUP BY 1"
+
+# ===================================================================
+# 2. SCHEMA, REBUILD AND VERIFY
+# ===================================================================
+
+def create_aggregate_tables(cursor, aggregates=None, tracked_columns=TRACKED_COLUMNS):
+    """
+    Creates the aggregate tables and the triggers that maintain them on insert,
+    update and delete of employees, then fills them from the current data.
+    'aggregates' defaults to AGGREGATES; migrations pass the definitions of their schema version.
+    """
+    aggregates = aggregates or AGGREGATES
+    for table, definition in aggregates.items():
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                {definition['key']} {definition.get('type', 'TEXT')} PRIMARY KEY NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+
+    increments_new = "\n".join(_increment_sql(t, d, 'new') for t, d in aggregates.items())
+    decrements_old = "\n".join(_decrement_sql(t, d, 'old') for t, d in aggregates.items())
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS employees_agg_insert AFTER INSERT ON employees
+        BEGIN
+            {increments_new}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS employees_agg_delete AFTER DELETE ON employees
+        BEGIN
+            {decrements_old}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS employees_agg_update AFTER UPDATE OF {tracked_columns} ON employees
+        BEGIN
+            {decrements_old}
+            {increments_new}
+        END
+    """)
+    rebuild_aggregates(cursor, aggregates)
+
+def rebuild_aggregates(cursor, aggregates=None):
+    """Recomputes every aggregate table from the 'employees' table."""
+    for table, definition in (aggregates or AGGREGATES).items():
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(f"INSERT INTO {table} ({definition['key']}, count) {_recompute_sql(table, definition)}")
+
+def verify_aggregates(conn):
+    """
+    Recomputes every aggregate and compares it with the materialized values.
+    Returns a list of (table, key, expected count, materialized count) for each mismatch;
+    an empty list means the aggregates are consistent.
+    """
+    mismatches = []
+    for table, definition in AGGREGATES.items():
+        key = definition['key']
+        expected = dict(conn.execute(_recompute_sql(table, definition)).fetchall())
+        materialized = dict(conn.execute(f"SELECT {key}, count FROM {table} WHERE count != 0").fetchall())
+        for group in sorted(set(expected) | set(materialized)):
+            if expected.get(group, 0) != materialized.get(group, 0):
+                mismatches.append((table, group, expected.get(group, 0), materialized.get(group, 0)))
+    return mismatches
+
+if __name__ == '__main__':
+    # Usage: python aggregates.py [--rebuild] [database file]
+    # Diffs the materialized aggregates against a full recompute, optionally rebuilding them first.
+    args = [arg for arg in sys.argv[1:] if arg != '--rebuild']
+    database_name = args[0] if args else DATABASE_NAME
+    with sqlite3.connect(database_name) as conn:
+        if '--rebuild' in sys.argv:
+            rebuild_aggregates(conn.cursor())
+            conn.commit()
+            print("Aggregates rebuilt.")
+        mismatches = verify_aggregates(conn)
+    for table, group, expected, actual in mismatches:
+        print(f"MISMATCH {table}[{group}]: expected {expected}, materialized {actual}")
+    if mismatches:
+        sys.exit(1)
+    print(f"All {len(AGGREGATES)} aggregate tables match the employees table.")
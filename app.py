@@ -5,7 +5,7 @@ import logging
 from logging.handlers import RotatingFileHandler
 
 # Import the extension instances that were created in extensions.py
-from extensions import socketio, cors
+from extensions import socketio, cors, broadcaster, writer
 
 from database import create_database_table
 from config import config_by_name
@@ -31,16 +31,30 @@ def create_app(config_name='development'):
     # This step binds the extensions (like CORS and SocketIO) to our
     # specific Flask app instance.
     cors.init_app(app, resources={r"/api/*": {"origins": "*"}})
-    socketio.init_app(app, cors_allowed_origins="*")
+    # With several workers, events are fanned out between them through a message queue
+    from message_queue import socketio_options
+    socketio.init_app(app, cors_allowed_origins="*", **socketio_options(app.config))
+    broadcaster.init_app(app)
 
     # --- 3. Database Initialization and Teardown ---
     # The 'create_database_table' function sets up the DB schema if it doesn't exist.
     # The 'close_db' function is registered as a 'teardown' function, which means
-    # Flask will automatically call it to close the database connection after each request.
+    # Flask will automatically call it to return the request's pooled connection after each request.
     # This is a robust pattern for managing resources like database connections.
-    from database import close_db
+    from database import close_db, init_db_pools
     with app.app_context():
         create_database_table()
+    init_db_pools(app.config)
+    # Starts the single writer thread that owns the write connection
+    writer.init_app(app)
+    # Notices writes made by other worker processes and drops this process's stale caches
+    from coherence import change_monitor
+    change_monitor.init_app(app)
+    from cache import init_response_cache, init_employee_cache
+    init_response_cache(app)
+    init_employee_cache(app)
+    from snapshot import init_snapshot
+    init_snapshot(app)
     app.teardown_appcontext(close_db)
 
     # --- 4. Register Blueprints ---
@@ -50,6 +64,15 @@ def create_app(config_name='development'):
     from routes import api_bp
     app.register_blueprint(api_bp, url_prefix='/api')
 
+    # Request timing, SQL statistics and the Prometheus '/metrics' endpoint
+    import metrics
+    metrics.init_app(app)
+
+    # Faster JSON encoding and negotiated gzip/brotli compression. Registered after the
+    # metrics hooks so that compression (after_request hooks run in reverse) is timed too.
+    import responses
+    responses.init_app(app)
+
     # --- 5. Setup Logging and Error Handlers ---
     # Configure file-based logging for production environments.
     if not app.debug and not app.testing:
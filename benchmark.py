@@ -0,0 +1,249 @@
+# hrdash/benchmark.py
+
+"""
+Drives every /api route through the Flask test client and reports latency percentiles
+and throughput as JSON, so runs can be compared over time.
+
+Usage:
+    python generate_data.py --preset 100k
+    python benchmark.py --database bench_data/hr_100000.db [--requests 200] [--output results.json]
+
+Write routes run against a temporary copy of the database unless --in-place is given.
+The response cache is disabled by default so every request reaches SQLite; pass --cache
+to measure cached reads instead.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-p * len(sorted_values) // 100))
+    return sorted_values[int(rank) - 1]
+
+def summarize(timings, errors, elapsed):
+    """Turns a list of per-request seconds into the reported statistics (in milliseconds)."""
+    ordered = sorted(timings)
+    to_ms = lambda v: round(v * 1000, 3) if v is not None else None
+    return {
+        'requests': len(timings),
+        'errors': errors,
+        'p50_ms': to_ms(percentile(ordered, 50)),
+        'p95_ms': to_ms(percentile(ordered, 95)),
+        'p99_ms': to_ms(percentile(ordered, 99)),
+        'mean_ms': to_ms(sum(ordered) / len(ordered)) if ordered else None,
+        'max_ms': to_ms(ordered[-1]) if ordered else None,
+        'throughput_rps': round(len(timings) / elapsed, 1) if elapsed else None,
+    }
+
+def sample_values(db_path):
+    """Reads a few real values from the database so filters and ids hit existing rows."""
+    with sqlite3.connect(db_path) as conn:
+        department = conn.execute("SELECT d.name FROM employees AS e JOIN departments AS d ON d.id = e.department_id "
+                                  "WHERE e.is_active = 1 LIMIT 1").fetchone()
+        job_title = conn.execute("SELECT j.name FROM employees AS e JOIN job_titles AS j ON j.id = e.job_title_id "
+                                 "WHERE e.is_active = 1 LIMIT 1").fetchone()
+        last_name = conn.execute("SELECT last_name FROM employees WHERE is_active = 1 LIMIT 1").fetchone()
+        max_id = conn.execute("SELECT MAX(id) FROM employees").fetchone()[0] or 1
+        count = conn.execute("SELECT COUNT(*) FROM employees").fetchone()[0]
+        change_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+    return {
+        'department': department[0] if department else 'Engineering',
+        'job_title': job_title[0] if job_title else 'Engineer',
+        'search': (last_name[0] if last_name else 'Sharma')[:4],
+        'max_id': max_id,
+        'count': count,
+        'change_seq': change_seq,
+    }
+
+def build_scenarios(values):
+    """
+    Returns (name, request function) pairs covering every /api route. Each function
+    takes the test client and the iteration number and returns a response.
+    """
+    max_id = values['max_id']
+    pick_id = lambda i: 1 + (i * 7919) % max_id
+    employee = lambda i: {
+        'first_name': 'Bench', 'last_name': f'Mark{i}', 'email': f'bench.{time.time_ns()}.{i}@example.com',
+        'job_title': values['job_title'], 'department': values['department'],
+        'start_date': '2024-01-15', 'salary': 750000,
+    }
+    csv_body = lambda i: ("first_name,last_name,email,job_title,department,start_date,salary\n" + "".join(
+        f"Bulk,Row{j},bulk.{time.time_ns()}.{i}.{j}@example.com,{values['job_title']},{values['department']},2024-02-01,500000\n"
+        for j in range(100))).encode('utf-8')
+
+    reads = [
+        ('GET /employees', lambda c, i: c.get('/api/employees', query_string={'page': 1 + i % 50})),
+        ('GET /employees deep page', lambda c, i: c.get('/api/employees', query_string={'page': 1 + values['count'] // 40})),
+        ('GET /employees cursor', lambda c, i: c.get('/api/employees', query_string={'cursor': '', 'include_total': 'false'})),
+        ('GET /employees search', lambda c, i: c.get('/api/employees', query_string={'search': values['search']})),
+        ('GET /employees department', lambda c, i: c.get('/api/employees', query_string={'department': values['department']})),
+        ('GET /employees 500 columnar gzip', lambda c, i: c.get('/api/employees', headers={'Accept-Encoding': 'gzip'},
+                                                                 query_string={'page': 1 + i % 50, 'limit': 500, 'format': 'columnar'})),
+        ('GET /employees/export', lambda c, i: c.get('/api/employees/export', query_string={'department': values['department']})),
+        ('GET /employees/<id>', lambda c, i: c.get(f'/api/employees/{pick_id(i)}')),
+        ('GET /employees/<id> hot', lambda c, i: c.get(f'/api/employees/{pick_id(i % 20)}')),
+        ('GET /changes (last 100)', lambda c, i: c.get('/api/changes', query_string={'since': max(0, values['change_seq'] - 100)})),
+        ('GET /dashboard/kpis', lambda c, i: c.get('/api/dashboard/kpis')),
+        ('GET /dashboard/department-breakdown', lambda c, i: c.get('/api/dashboard/department-breakdown')),
+        ('GET /dashboard/summary', lambda c, i: c.get('/api/dashboard/summary')),
+        ('GET /departments', lambda c, i: c.get('/api/departments')),
+        ('GET /job-titles', lambda c, i: c.get('/api/job-titles')),
+        ('GET /analytics/turnover', lambda c, i: c.get('/api/analytics/turnover')),
+        ('GET /analytics/turnover ranged', lambda c, i: c.get('/api/analytics/turnover',
+                                                              query_string={'from': '2020-01-01', 'granularity': 'week'})),
+        ('GET /analytics/headcount', lambda c, i: c.get('/api/analytics/headcount',
+                                                        query_string={'from': '2020-01-01', 'by': 'department'})),
+        ('GET /analytics/salary-distribution', lambda c, i: c.get('/api/analytics/salary-distribution')),
+        ('GET /analytics/salary-statistics', lambda c, i: c.get('/api/analytics/salary-statistics')),
+        ('GET /analytics/salary-by-group', lambda c, i: c.get('/api/analytics/salary-by-group',
+                                                              query_string={'by': 'department,job_title'})),
+    ]
+    writes = [
+        ('POST /employees', lambda c, i: c.post('/api/employees', json=employee(i))),
+        ('PUT /employees/<id>', lambda c, i: c.put(f'/api/employees/{pick_id(i)}', json={'salary': 800000 + i})),
+        ('PUT /employees/<id>/deactivate', lambda c, i: c.put(f'/api/employees/{pick_id(i * 3 + 1)}/deactivate')),
+        ('PUT /employees/batch (100 ids)', lambda c, i: c.put('/api/employees/batch', json={
+            'ids': [pick_id(i * 100 + j) for j in range(100)], 'changes': {'salary': 810000 + i}})),
+        ('PUT /employees/batch/deactivate (100 ids)', lambda c, i: c.put('/api/employees/batch/deactivate', json={
+            'ids': [pick_id(i * 100 + j + 50) for j in range(100)]})),
+        ('POST /employees/import (100 rows)', lambda c, i: c.post('/api/employees/import', data=csv_body(i),
+                                                                  content_type='text/csv')),
+        ('POST+DELETE /departments', lambda c, i: c.delete(
+            f"/api/departments/{c.post('/api/departments', json={'name': f'Bench Dept {time.time_ns()}'}).get_json()['id']}")),
+        ('POST+DELETE /job-titles', lambda c, i: c.delete(
+            f"/api/job-titles/{c.post('/api/job-titles', json={'name': f'Bench Title {time.time_ns()}'}).get_json()['id']}")),
+    ]
+    return reads, writes
+
+def run_scenario(client, request_fn, iterations, warmup):
+    """Runs one scenario and returns its summary."""
+    for i in range(warmup):
+        request_fn(client, i)
+    timings, errors = [], 0
+    started = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        response = request_fn(client, warmup + i)
+        response.get_data()
+        timings.append(time.perf_counter() - t0)
+        if response.status_code >= 400:
+            errors += 1
+    return summarize(timings, errors, time.perf_counter() - started)
+
+def run_socket_fanout(app, clients, events):
+    """Measures how long the broadcaster takes to fan 'events' changes out to 'clients' subscribers."""
+    from extensions import socketio, broadcaster
+    sockets = []
+    for _ in range(clients):
+        sock = socketio.test_client(app)
+        sock.emit('subscribe', {'rooms': ['directory', 'settings', 'dashboard']})
+        sock.get_received()
+        sockets.append(sock)
+    window = broadcaster.window_ms
+    broadcaster.window_ms = 0  # Flush synchronously so the timing covers the emit itself
+    try:
+        timings = []
+        started = time.perf_counter()
+        for i in range(events):
+            t0 = time.perf_counter()
+            broadcaster.publish('employee_updated', {'id': i, 'salary': i})
+            timings.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - started
+    finally:
+        broadcaster.window_ms = window
+    delivered = sum(len(sock.get_received()) for sock in sockets)
+    for sock in sockets:
+        sock.disconnect()
+    result = summarize(timings, 0, elapsed)
+    result.update({'clients': clients, 'messages_delivered': delivered})
+    return result
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every /api route of the HR dashboard.")
+    parser.add_argument('--database', required=True, help="Database to benchmark (see generate_data.py)")
+    parser.add_argument('--requests', type=int, default=200, help="Timed requests per route")
+    parser.add_argument('--warmup', type=int, default=10, help="Untimed requests per route before timing")
+    parser.add_argument('--only', help="Only run routes whose name contains this text")
+    parser.add_argument('--skip-writes', action='store_true', help="Only benchmark read routes")
+    parser.add_argument('--cache', action='store_true', help="Keep the response cache enabled")
+    parser.add_argument('--in-place', action='store_true', help="Run write routes against the database itself")
+    parser.add_argument('--socket-clients', type=int, default=50, help="Subscribers for the socket fan-out benchmark")
+    parser.add_argument('--output', help="Write the JSON results to this file as well as stdout")
+    args = parser.parse_args()
+
+    db_path = args.database
+    workdir = None
+    if not args.in_place and not args.skip_writes:
+        workdir = tempfile.mkdtemp(prefix='hrdash-bench-')
+        db_path = os.path.join(workdir, os.path.basename(args.database))
+        shutil.copyfile(args.database, db_path)
+
+    # The database module reads its file name from the config at import time
+    os.environ['HRDASH_DATABASE'] = db_path
+    from app import create_app
+    app = create_app('production')
+    app.config['RESPONSE_CACHE_ENABLED'] = args.cache
+    client = app.test_client()
+
+    values = sample_values(db_path)
+    reads, writes = build_scenarios(values)
+    scenarios = reads + ([] if args.skip_writes else writes)
+    if args.only:
+        scenarios = [(name, fn) for name, fn in scenarios if args.only in name]
+
+    results = {}
+    try:
+        for name, request_fn in scenarios:
+            results[name] = run_scenario(client, request_fn, args.requests, args.warmup)
+            r = results[name]
+            print(f"{name:<40} p50 {r['p50_ms']:>9.3f} ms  p95 {r['p95_ms']:>9.3f} ms  "
+                  f"p99 {r['p99_ms']:>9.3f} ms  {r['throughput_rps']:>8.1f} req/s  errors {r['errors']}",
+                  file=sys.stderr)
+        if not args.only or 'socket' in args.only:
+            results['socket fan-out'] = run_socket_fanout(app, args.socket_clients, args.requests)
+    finally:
+        from database import close_db_pools
+        from extensions import writer
+        writer.stop()
+        close_db_pools()
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'database': os.path.abspath(args.database),
+        'employees': values['count'],
+        'requests_per_route': args.requests,
+        'response_cache': args.cache,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+if __name__ == '__main__':
+    main()
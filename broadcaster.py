@@ -0,0 +1,133 @@
+# hrdash/broadcaster.py
+
+import threading
+import uuid
+from collections import OrderedDict
+from itertools import combinations
+
+# Rooms a client can subscribe to, named after the pages that care about them
+BROADCAST_ROOMS = ('directory', 'settings', 'dashboard')
+
+# Which rooms receive each event
+EVENT_ROOMS = {
+    'employee_added': ('directory', 'dashboard'),
+    'employee_updated': ('directory', 'dashboard'),
+    'employee_deactivated': ('directory', 'dashboard'),
+    'employees_imported': ('directory', 'dashboard'),
+    'employees_updated': ('directory', 'dashboard'),
+    'employees_deactivated': ('directory', 'dashboard'),
+    'department_added': ('settings', 'directory'),
+    'department_deleted': ('settings', 'directory'),
+    'job_title_added': ('settings', 'directory'),
+    'job_title_deleted': ('settings', 'directory'),
+}
+
+# A client subscribed to several rooms joins one Socket.IO room named after the whole
+# set, e.g. 'rooms:dashboard+directory', so each batch reaches it in a single message
+SUBSCRIPTION_PREFIX = 'rooms:'
+
+def subscription_room(rooms):
+    """Returns the Socket.IO room for clients subscribed to exactly 'rooms'."""
+    return SUBSCRIPTION_PREFIX + '+'.join(sorted(rooms))
+
+def subscribed_rooms(joined):
+    """Returns the set of rooms encoded in the subscription room among 'joined', if any."""
+    for name in joined:
+        if name.startswith(SUBSCRIPTION_PREFIX):
+            return set(name[len(SUBSCRIPTION_PREFIX):].split('+'))
+    return set()
+
+# Every set of rooms a client can be subscribed to
+SUBSCRIPTIONS = [frozenset(combo) for size in range(1, len(BROADCAST_ROOMS) + 1)
+                 for combo in combinations(BROADCAST_ROOMS, size)]
+
+class Broadcaster:
+    """
+    Batches outgoing Socket.IO events and delivers them as one 'changes' message per
+    subscription, holding the events of all of its rooms once each. Events published within
+    'window_ms' of each other are sent together, and repeated events about the same entity
+    collapse into the most recent one. Each event carries a 'seq' number and an 'origin'
+    naming the process that sent it, since every worker process counts its own seqs.
+    """
+
+    def __init__(self, socketio, window_ms=100):
+        self.socketio = socketio
+        self.window_ms = window_ms
+        self._pending = OrderedDict()
+        self._flush_scheduled = False
+        self._seq = 0
+        self.origin = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+        self.counters = {
+            'published': 0,      # Events handed to publish()
+            'coalesced': 0,      # Events replaced by a later event for the same entity
+            'events_sent': 0,    # Events delivered, counted once per subscription
+            'messages_sent': 0,  # 'changes' messages emitted
+        }
+        self.published_by_event = {}
+        self.sent_by_event = {}
+
+    def init_app(self, app):
+        """Reads the batching window from the app config."""
+        self.window_ms = app.config.get('BROADCAST_WINDOW_MS', self.window_ms)
+        # Fresh per app, so worker processes forked from one parent don't share an origin
+        self.origin = uuid.uuid4().hex[:8]
+
+    def publish(self, event, data, key=None):
+        """
+        Queues an event for the rooms listed in EVENT_ROOMS.
+        'key' identifies the entity for coalescing and defaults to data['id'];
+        events without a key are never coalesced.
+        """
+        if key is None and isinstance(data, dict):
+            key = data.get('id')
+        with self._lock:
+            self._seq += 1
+            self.counters['published'] += 1
+            self.published_by_event[event] = self.published_by_event.get(event, 0) + 1
+            pending_key = (event, key) if key is not None else (event, None, self._seq)
+            if pending_key in self._pending:
+                # Keep the latest payload but move it to the end so ordering follows the last change
+                del self._pending[pending_key]
+                self.counters['coalesced'] += 1
+            self._pending[pending_key] = {'event': event, 'data': data, 'seq': self._seq, 'origin': self.origin}
+            schedule = not self._flush_scheduled and self.window_ms > 0
+            if schedule:
+                self._flush_scheduled = True
+        if self.window_ms <= 0:
+            self.flush()
+        elif schedule:
+            self.socketio.start_background_task(self._flush_after_window)
+
+    def _flush_after_window(self):
+        self.socketio.sleep(self.window_ms / 1000.0)
+        self.flush()
+
+    def flush(self):
+        """Sends everything queued so far, one 'changes' message per subscription."""
+        with self._lock:
+            events = list(self._pending.values())
+            self._pending.clear()
+            self._flush_scheduled = False
+        if not events:
+            return
+
+        for rooms in SUBSCRIPTIONS:
+            room_events = [item for item in events
+                           if rooms.intersection(EVENT_ROOMS.get(item['event'], BROADCAST_ROOMS))]
+            if not room_events:
+                continue
+            self.socketio.emit('changes', {'rooms': sorted(rooms), 'events': room_events},
+                               to=subscription_room(rooms))
+            with self._lock:
+                self.counters['messages_sent'] += 1
+                self.counters['events_sent'] += len(room_events)
+                for item in room_events:
+                    self.sent_by_event[item['event']] = self.sent_by_event.get(item['event'], 0) + 1
+
+    def stats(self):
+        """Returns a snapshot of the counters plus the number of events waiting to be sent."""
+        with self._lock:
+            return dict(self.counters, pending=len(self._pending),
+                        published_by_event=dict(self.published_by_event),
+                        sent_by_event=dict(self.sent_by_event))
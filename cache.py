@@ -0,0 +1,196 @@
+# hrdash/cache.py
+
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from functools import wraps
+
+from flask import current_app, request
+
+# A cached response body, tagged with the data version it was computed at. 'compressed'
+# holds the body already encoded per Content-Encoding (filled in by responses.py).
+CacheEntry = namedtuple('CacheEntry', ['version', 'body', 'etag', 'mimetype', 'compressed'])
+
+# ===================================================================
+# 1. DATA VERSION
+# ===================================================================
+# Every write route bumps this counter next to its socket broadcast. Cached
+# responses computed at an older version are treated as stale.
+
+_data_version = 0
+_version_lock = threading.Lock()
+
+def get_data_version():
+    """Returns the current data version."""
+    return _data_version
+
+def bump_data_version():
+    """Marks all cached responses as stale. Call after every committed write."""
+    global _data_version
+    with _version_lock:
+        _data_version += 1
+        return _data_version
+
+# ===================================================================
+# 2. LRU RESPONSE CACHE
+# ===================================================================
+
+class ResponseCache:
+    """A thread-safe, size-bounded LRU mapping of cache keys to CacheEntry objects."""
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        """Returns the entry for 'key' if it was computed at 'version', otherwise None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        """Stores an entry, evicting the least recently used one if the cache is full."""
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+response_cache = ResponseCache()
+
+def init_response_cache(app):
+    """Sizes the response cache from the app config and empties it."""
+    response_cache.max_size = app.config.get('RESPONSE_CACHE_SIZE', 256)
+    response_cache.clear()
+
+# ===================================================================
+# 3. VIEW DECORATOR
+# ===================================================================
+
+def cached_response(vary=None):
+    """
+    Caches a read-only JSON view's 200 responses, keyed by endpoint, view arguments
+    and query string, and answers them with a strong ETag. A matching If-None-Match
+    gets a 304 without running the view.
+    'vary' is an optional callable whose result is added to the key, for views that
+    also depend on something other than the data (e.g. today's date).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get('RESPONSE_CACHE_ENABLED', True):
+                return view(*args, **kwargs)
+
+            key = (
+                request.endpoint,
+                tuple(sorted(kwargs.items())),
+                tuple(sorted(request.args.items(multi=True))),
+                vary() if vary else None,
+            )
+            # Read the version before running the view, so a write that lands while
+            # the view runs leaves this entry stale rather than wrongly fresh
+            version = get_data_version()
+            entry = response_cache.get(key, version)
+            if entry is None:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                body = response.get_data()
+                entry = CacheEntry(version, body, hashlib.sha1(body).hexdigest(), response.mimetype, {})
+                response_cache.put(key, entry)
+
+            response = current_app.response_class(entry.body, mimetype=entry.mimetype)
+            response.cache_entry = entry
+            response.set_etag(entry.etag)
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
+
+# ===================================================================
+# 4. WRITE-THROUGH EMPLOYEE CACHE
+# ===================================================================
+# GET /employees/<id> is answered from memory for recently used employees. Rows
+# aren't tied to the data version: the employee write routes store the rows their
+# writes return (RETURNING) once they commit, so an entry is always the latest
+# committed row. Writes by other worker processes clear it (see coherence.py).
+
+class EmployeeCache:
+    """
+    A thread-safe, size-bounded LRU of 'employees' rows (as dicts) by id.
+    Readers fill it on a miss with fill(), passing the generation() they read before
+    querying; the row is dropped if a write was stored since, because it may be older
+    than that write. A max_size of 0 disables the cache.
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._rows = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def generation(self):
+        """Changes whenever a write is stored or the cache is cleared."""
+        return self._generation
+
+    def get(self, employee_id):
+        """Returns the cached row for 'employee_id', or None."""
+        with self._lock:
+            row = self._rows.get(employee_id)
+            if row is None:
+                self.misses += 1
+                return None
+            self._rows.move_to_end(employee_id)
+            self.hits += 1
+            return row
+
+    def fill(self, row, generation):
+        """Caches a row read from the database, unless a write was stored after 'generation'."""
+        with self._lock:
+            if self.max_size > 0 and generation == self._generation:
+                self._store(row)
+
+    def put(self, rows):
+        """Stores rows written by a committed write. Call from a writer on_commit callback."""
+        with self._lock:
+            self._generation += 1
+            if self.max_size > 0:
+                for row in rows:
+                    self._store(row)
+
+    def _store(self, row):
+        self._rows[row['id']] = row
+        self._rows.move_to_end(row['id'])
+        while len(self._rows) > self.max_size:
+            self._rows.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._rows.clear()
+
+    def __len__(self):
+        return len(self._rows)
+
+employee_cache = EmployeeCache()
+
+def init_employee_cache(app):
+    """Sizes the employee cache from the app config and empties it."""
+    employee_cache.max_size = app.config.get('EMPLOYEE_CACHE_SIZE', 10000)
+    employee_cache.clear()
@@ -0,0 +1,95 @@
+# hrdash/coherence.py
+
+import threading
+
+from flask import current_app
+
+# ===================================================================
+# CROSS-PROCESS CACHE COHERENCE
+# ===================================================================
+# Each worker process keeps its own response cache, lookup cache and analytics
+# snapshot, and invalidates them when its own writer commits. With several workers
+# it must also notice commits made by the others. Every write batch bumps the shared
+# 'write_epoch' row (migration 5) and remembers the value it produced; before each
+# request a worker compares the current epoch with those values, and any epoch it
+# didn't produce itself means another process has written.
+
+class ChangeMonitor:
+    """Detects writes committed by other processes and invalidates this process's caches."""
+
+    def __init__(self):
+        self.enabled = False
+        self.external_changes = 0
+        self._seen = 0
+        self._local_epochs = set()
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Enables the monitor when the app runs as one of several workers (WORKERS > 1 or a
+        Socket.IO message queue is configured). Call after writer.init_app().
+        """
+        from extensions import writer
+        from database import DATABASE_NAME, open_connection, connection_options
+
+        self.close()
+        self.enabled = app.config.get('WORKERS', 1) > 1 or bool(app.config.get('SOCKETIO_MESSAGE_QUEUE'))
+        if not self.enabled:
+            return
+        self._conn = open_connection(DATABASE_NAME, readonly=True, **connection_options(app.config))
+        self._seen = self._current_epoch()
+        self._local_epochs = set()
+        writer.add_commit_hook(self._bump_epoch)
+        app.before_request(self.check)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _current_epoch(self):
+        return self._conn.execute("SELECT value FROM write_epoch WHERE id = 1").fetchone()[0]
+
+    def _bump_epoch(self, conn):
+        """Writer commit hook: bumps the epoch in the batch transaction, recording it once committed."""
+        epoch = conn.execute("UPDATE write_epoch SET value = value + 1 WHERE id = 1 RETURNING value").fetchone()[0]
+        return lambda: self._record_local(epoch)
+
+    def _record_local(self, epoch):
+        with self._lock:
+            if epoch > self._seen:
+                self._local_epochs.add(epoch)
+
+    def check(self):
+        """
+        Runs before each request. Invalidates the caches if any epoch since the last check
+        came from another process. An own commit seen before it was recorded also counts,
+        which only costs an unnecessary invalidation.
+        """
+        with self._lock:
+            if self._conn is None:
+                return
+            current = self._current_epoch()
+            if current == self._seen:
+                return
+            own = sum(1 for epoch in self._local_epochs if self._seen < epoch <= current)
+            external = current - self._seen > own
+            self._local_epochs = {epoch for epoch in self._local_epochs if epoch > current}
+            self._seen = current
+        if external:
+            self.invalidate_caches()
+
+    def invalidate_caches(self):
+        from cache import bump_data_version, employee_cache
+        from lookups import lookup_cache
+        from snapshot import employee_snapshot
+        self.external_changes += 1
+        bump_data_version()
+        employee_cache.clear()
+        lookup_cache.invalidate()
+        employee_snapshot.invalidate()
+        current_app.logger.debug("Another worker wrote to the database; caches invalidated")
+
+change_monitor = ChangeMonitor()
@@ -5,7 +5,82 @@ import os
 class Config:
     """Base configuration."""
     SECRET_KEY = os.environ.get('SECRET_KEY', '24431dd886a304835cca4711fde4da8a9d021608d84d3feae3611fe5d7ea9ae3')
-    DATABASE_NAME = "hr_dashboard.db"
+    # Overridable so scripts such as the benchmark suite can point the app at another file
+    DATABASE_NAME = os.environ.get('HRDASH_DATABASE', "hr_dashboard.db")
+
+    # --- SQLite Connection Pool ---
+    # Read-write connections serve write routes; GET routes draw from the read-only pool
+    # so readers never queue behind a writer (WAL mode lets both run at once).
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 4))
+    DB_READ_POOL_SIZE = int(os.environ.get('DB_READ_POOL_SIZE', 16))
+    DB_POOL_TIMEOUT = 30          # Seconds to wait for a free pooled connection
+    DB_BUSY_TIMEOUT = 10          # Seconds SQLite waits on a locked database
+    DB_SYNCHRONOUS = 'NORMAL'     # Safe with WAL, avoids an fsync on every commit
+    DB_CACHE_SIZE_KB = 20000      # Page cache per connection
+    DB_MMAP_SIZE = 268435456      # 256 MB of memory-mapped I/O
+    DB_STATEMENT_CACHE_SIZE = 256 # Prepared statements cached per connection
+
+    # --- Write Queue ---
+    # All writes run on one writer thread that group-commits queued operations.
+    WRITE_QUEUE_SIZE = 256        # Operations allowed to wait; more are refused with a 503
+    WRITE_BATCH_MAX = 64          # Operations committed together in one transaction
+    WRITE_TIMEOUT = 30            # Seconds a write may wait in the queue before the request gives up
+    WRITE_RETRY_AFTER = 1         # Retry-After seconds sent with a 503 when the queue is full
+
+    # --- Response Cache ---
+    # Read endpoints cache their JSON until the next write bumps the data version.
+    RESPONSE_CACHE_ENABLED = True
+    RESPONSE_CACHE_SIZE = 256     # Maximum number of cached responses (LRU)
+    EMPLOYEE_CACHE_SIZE = 10000   # Employee rows kept for GET /employees/<id> (LRU); 0 disables
+
+    # --- Analytics Snapshot ---
+    # A columnar in-memory copy of the employees table used by the salary and turnover
+    # analytics. Requires NumPy; without it those routes query SQLite.
+    ANALYTICS_SNAPSHOT_ENABLED = True
+
+    # --- Worker Processes ---
+    # 'run.py --workers N' (or HRDASH_WORKERS) pre-forks N processes sharing one port.
+    # Socket events reach clients on every worker through the message queue: any URL
+    # Flask-SocketIO supports (e.g. 'redis://localhost:6379/0'), or 'sqlite:///<file>'
+    # for a local queue needing no other service. Several workers default to the latter,
+    # in a file next to DATABASE_NAME.
+    WORKERS = int(os.environ.get('HRDASH_WORKERS', 1))
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+    SOCKETIO_CHANNEL = 'hrdash'
+
+    # --- Response Encoding ---
+    # JSON uses orjson when installed. Responses at least this large are sent with
+    # Content-Encoding br (when the brotli package is installed) or gzip, if accepted.
+    COMPRESSION_ENABLED = True
+    COMPRESSION_MIN_SIZE = 1024   # Bytes
+
+    # --- Socket Broadcasts ---
+    # Events published within this window are sent together as one 'changes' message
+    # per subscribed client. 0 sends every event immediately.
+    BROADCAST_WINDOW_MS = 100
+
+    # --- Metrics ---
+    # Per-route latency and per-request SQL statistics, exposed at /metrics.
+    METRICS_ENABLED = True
+    # Log every SQL statement slower than this many milliseconds; 0 disables the slow-query log.
+    SLOW_QUERY_LOG_MS = int(os.environ.get('SLOW_QUERY_LOG_MS', 0))
+
+    # --- Employee Lists ---
+    EMPLOYEES_MAX_PAGE_SIZE = 1000  # Largest 'limit' GET /api/employees accepts
+
+    # --- Bulk Import ---
+    IMPORT_BATCH_SIZE = 1000      # Rows inserted per transaction
+    IMPORT_MAX_ERRORS = 1000      # Rejected rows reported in detail; the rest are only counted
+
+    # --- Batch Updates ---
+    BATCH_MAX_EMPLOYEES = 10000   # Employees one batch update or deactivation may touch
+
+    # --- Streaming Export ---
+    EXPORT_CHUNK_ROWS = 500       # Rows fetched from the cursor per streamed chunk
+
+    # --- Delta Sync ---
+    CHANGES_PAGE_SIZE = 1000      # Changed rows GET /api/changes returns by default
+    CHANGES_MAX_PAGE_SIZE = 5000  # Largest 'limit' a client may ask for
 
 class DevelopmentConfig(Config):
     """Development configuration."""
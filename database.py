@@ -1,41 +1,197 @@
 # hrdash/database.py
 
 import sqlite3
-from flask import g
+import threading
+from queue import Queue, Empty
+from flask import g, current_app, has_app_context, has_request_context, request
 from config import DevelopmentConfig
+from metrics import InstrumentedConnection
 
 # Get database name from the config file
 DATABASE_NAME = DevelopmentConfig.DATABASE_NAME
 
-def get_db_connection():
+# Name of the FTS5 virtual table that indexes employee names and emails for search
+SEARCH_INDEX_TABLE = "employees_fts"
+
+# HTTP methods that only read, and are therefore served from the read-only pool
+READ_ONLY_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+def open_connection(database, readonly=False, busy_timeout=10, synchronous='NORMAL',
+                    cache_size_kb=20000, mmap_size=0, statement_cache_size=128, isolation_level=''):
+    """
+    Opens a tuned SQLite connection: WAL journaling, the given synchronous level, page cache,
+    memory-mapped I/O, prepared-statement cache and foreign key enforcement. Read-only connections are opened with
+    mode=ro. Connections are instrumented so per-request SQL metrics can be collected (see metrics.py).
+    """
+    if readonly:
+        conn = sqlite3.connect(f"file:{database}?mode=ro", uri=True, timeout=busy_timeout,
+                               check_same_thread=False, cached_statements=statement_cache_size,
+                               isolation_level=isolation_level, factory=InstrumentedConnection)
+    else:
+        conn = sqlite3.connect(database, timeout=busy_timeout,
+                               check_same_thread=False, cached_statements=statement_cache_size,
+                               isolation_level=isolation_level, factory=InstrumentedConnection)
+        # Persisted in the database file; read-only connections pick it up from there
+        conn.executescript("PRAGMA journal_mode = WAL;")
+    conn.row_factory = sqlite3.Row
+    # executescript bypasses the instrumented cursors, so setup isn't counted against the request
+    conn.executescript(f"""
+        PRAGMA synchronous = {synchronous};
+        PRAGMA cache_size = -{int(cache_size_kb)};
+        PRAGMA mmap_size = {int(mmap_size)};
+        PRAGMA temp_store = MEMORY;
+        PRAGMA foreign_keys = ON;
+    """)
+    return conn
+
+def connection_options(config):
+    """Reads the open_connection() tuning options from a config mapping."""
+    return dict(
+        busy_timeout=config.get('DB_BUSY_TIMEOUT', 10),
+        synchronous=config.get('DB_SYNCHRONOUS', 'NORMAL'),
+        cache_size_kb=config.get('DB_CACHE_SIZE_KB', 20000),
+        mmap_size=config.get('DB_MMAP_SIZE', 0),
+        statement_cache_size=config.get('DB_STATEMENT_CACHE_SIZE', 128),
+    )
+
+class ConnectionPool:
     """
-    Establishes a connection to the SQLite database, reusing the connection if it already exists for the current request.
+    A bounded pool of tuned SQLite connections that are reused across requests.
+    Connections are opened lazily up to 'size'; once all are in use, callers wait
+    up to 'pool_timeout' seconds for one to be released.
+    """
+
+    def __init__(self, database, size, readonly=False, pool_timeout=30, **options):
+        self.database = database
+        self.size = size
+        self.readonly = readonly
+        self.pool_timeout = pool_timeout
+        self.options = options
+        self._idle = Queue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """Opens a new connection with the pool's tuning options."""
+        return open_connection(self.database, readonly=self.readonly, **self.options)
+
+    def acquire(self):
+        """Returns an idle connection, opening a new one if the pool has room."""
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+        with self._lock:
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+        if can_open:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.pool_timeout)
+        except Empty:
+            raise sqlite3.OperationalError(
+                f"Timed out waiting for a database connection (pool size {self.size})"
+            )
+
+    def release(self, conn):
+        """Returns a connection to the pool, rolling back anything left uncommitted."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # A broken connection is discarded so the pool can open a fresh one
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+            return
+        self._idle.put(conn)
+
+    def close_all(self):
+        """Closes every idle connection, e.g. at shutdown."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+
+# Pools are keyed by whether they are read-only
+_pools = {}
+_pools_lock = threading.Lock()
+
+def init_db_pools(config):
+    """
+    Creates the read-write and read-only connection pools from a config mapping
+    (normally 'app.config'). Called once from the application factory.
+    """
+    close_db_pools()
+    options = dict(connection_options(config), pool_timeout=config.get('DB_POOL_TIMEOUT', 30))
+    with _pools_lock:
+        _pools[False] = ConnectionPool(DATABASE_NAME, config.get('DB_POOL_SIZE', 4), readonly=False, **options)
+        _pools[True] = ConnectionPool(DATABASE_NAME, config.get('DB_READ_POOL_SIZE', 16), readonly=True, **options)
+
+def close_db_pools():
+    """Closes all idle pooled connections and forgets the pools."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close_all()
+        _pools.clear()
+
+def get_db_pool(readonly=False):
+    """Returns the pool for the requested mode, creating the pools on first use."""
+    if readonly not in _pools:
+        init_db_pools(current_app.config if has_app_context() else {})
+    return _pools[readonly]
+
+def get_db_connection(readonly=None):
+    """
+    Returns a pooled connection to the SQLite database, reusing the connection if it already exists for the current request.
+    GET requests receive a read-only connection unless 'readonly=False' is passed; other methods receive a read-write one.
     The connection object is configured to return rows that can be accessed by column name.
     """
-    if 'db_conn' not in g:
-        # If no connection exists for the current request, create one
-        g.db_conn = sqlite3.connect(DATABASE_NAME, timeout=10) # Added timeout
-        g.db_conn.row_factory = sqlite3.Row
-    return g.db_conn
+    if readonly is None:
+        readonly = has_request_context() and request.method in READ_ONLY_METHODS
+    key = 'db_read_conn' if readonly else 'db_conn'
+    if key not in g:
+        # If no connection exists for the current request, borrow one from the pool
+        setattr(g, key, get_db_pool(readonly).acquire())
+    return getattr(g, key)
 
 def close_db(e=None):
     """
-    Closes the database connection if it exists for the current request.
+    Returns the request's database connections to their pools.
     This function is intended to be registered with Flask's app teardown context.
     """
-    db = g.pop('db_conn', None)
-    if db is not None:
-        db.close()
+    for key, readonly in (('db_conn', False), ('db_read_conn', True)):
+        db = g.pop(key, None)
+        if db is not None:
+            if readonly in _pools:
+                _pools[readonly].release(db)
+            else:
+                db.close()
 
 def create_database_table():
     """
-    Creates the 'employees', 'departments', and 'job_titles' tables if they don't already exist.
+    Creates the 'employees', 'departments', and 'job_titles' tables if they don't already exist,
+    then applies any pending schema migrations (see migrations.py).
     This function should be called once at application startup.
     """
     print("Attempting to create database table if not exists...")
     # Use a 'with' statement to ensure the connection is closed even if errors occur
     with sqlite3.connect(DATABASE_NAME) as conn:
+        # WAL lets the read-only pool keep reading while a write is in progress
+        conn.execute("PRAGMA journal_mode = WAL")
         cursor = conn.cursor()
+        # The original shape of the table; migration 4 turns 'job_title' and 'department'
+        # into integer keys of the lookup tables below
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS employees (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -63,4 +219,15 @@ def create_database_table():
             )
         """)
         conn.commit()
-    print("Table check complete.")
\ No newline at end of file
+
+        # Bring indexes and derived tables up to the latest schema version
+        from migrations import apply_migrations
+        apply_migrations(conn)
+    print("Table check complete.")
+
+def search_index_available(conn):
+    """Returns True if the employee search index exists in the connected database."""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SEARCH_INDEX_TABLE,)
+    ).fetchone()
+    return row is not None
\ No newline at end of file
@@ -2,7 +2,15 @@
 
 from flask_socketio import SocketIO
 from flask_cors import CORS
+from broadcaster import Broadcaster
+from writer import WriteQueue
 
 # Initialize extensions here
 socketio = SocketIO()
-cors = CORS()
\ No newline at end of file
+cors = CORS()
+
+# Batches and room-scopes outgoing socket events; write routes publish through this
+broadcaster = Broadcaster(socketio)
+
+# Serializes and group-commits database writes; write routes submit their work through this
+writer = WriteQueue()
\ No newline at end of file
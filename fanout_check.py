@@ -0,0 +1,400 @@
+# hrdash/fanout_check.py
+
+"""
+Checks that worker processes sharing a message queue and a database behave as one
+server: a Socket.IO event emitted by worker A reaches a client connected to worker B,
+and B's cached responses reflect a write made through A.
+
+Usage:
+    python fanout_check.py [--database hr_dashboard.db] [--queue sqlite:///queue.db]
+
+Two single-worker servers run 'run.py' on their own port so the client can be pinned
+to worker B. Then 'run.py --workers 2' serves one shared port with its default queue:
+WebSocket clients, each held by whichever worker accepted it, must receive the events
+of writes handled by both workers, also after one worker is killed and replaced (the
+replacement check reads worker pids from /proc, so it runs on Linux only). Everything
+uses a temporary copy of the database (and a temporary SQLite queue unless --queue is
+given). The clients speak Engine.IO with the standard library only. Exits non-zero if
+any check fails.
+"""
+
+import argparse
+import base64
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+PACKET_SEPARATOR = '\x1e'
+
+def http(method, url, body=None, content_type='application/json', timeout=30):
+    """Sends a request and returns (status, body text)."""
+    data = body.encode() if isinstance(body, str) else body
+    request = urllib.request.Request(url, data=data, method=method,
+                                     headers={'Content-Type': content_type} if data is not None else {})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, response.read().decode()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode()
+
+def http_json(method, url, payload=None):
+    status, text = http(method, url, json.dumps(payload) if payload is not None else None)
+    return status, json.loads(text) if text else None
+
+class SocketIOClient:
+    """Waiting for packets, shared by the transports below; receive() returns the next packets."""
+
+    def emit(self, event, data):
+        self.send('42' + json.dumps([event, data]))
+
+    def wait_for(self, matches, timeout):
+        """Receives until a packet satisfies 'matches' and returns it, or None after 'timeout' seconds."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            for packet in self.receive(deadline - time.time()):
+                if matches(packet):
+                    return packet
+        return None
+
+    def wait_for_event(self, name, matches, timeout):
+        """Waits for a Socket.IO event called 'name' whose data satisfies 'matches'."""
+        def is_match(packet):
+            if not packet.startswith('42'):
+                return False
+            event, *args = json.loads(packet[2:])
+            return event == name and matches(args[0] if args else None)
+        packet = self.wait_for(is_match, timeout)
+        return json.loads(packet[2:])[1] if packet else None
+
+class PollingClient(SocketIOClient):
+    """A minimal Socket.IO client over Engine.IO v4 long-polling."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.sid = None
+
+    def _url(self):
+        url = f"{self.base_url}/socket.io/?EIO=4&transport=polling&t={time.time_ns()}"
+        return f"{url}&sid={self.sid}" if self.sid else url
+
+    def connect(self):
+        status, text = http('GET', self._url())
+        if status != 200 or not text.startswith('0'):
+            raise RuntimeError(f"Handshake failed: {status} {text[:200]}")
+        self.sid = json.loads(text[1:])['sid']
+        self.send('40')
+        self.wait_for(lambda packet: packet.startswith('40'), 10)
+
+    def send(self, packet):
+        status, text = http('POST', self._url(), packet, 'text/plain;charset=UTF-8')
+        if status != 200:
+            raise RuntimeError(f"Send failed: {status} {text[:200]}")
+
+    def receive(self, timeout):
+        """Returns the packets of one long-poll, answering server pings. A poll may outlast 'timeout'."""
+        status, text = http('GET', self._url(), timeout=60)
+        if status != 200:
+            raise RuntimeError(f"Poll failed: {status} {text[:200]}")
+        packets = text.split(PACKET_SEPARATOR)
+        if '2' in packets:
+            self.send('3')
+        return packets
+
+class WebSocketClient(SocketIOClient):
+    """
+    A minimal Socket.IO client over an Engine.IO v4 WebSocket. Unlike long-polling it
+    keeps one connection, so it stays on the worker that accepted it.
+    """
+
+    def __init__(self, base_url):
+        url = urllib.parse.urlsplit(base_url)
+        self.address = (url.hostname, url.port)
+        self.sock = None
+        self._buffer = b''
+
+    def connect(self):
+        self.sock = socket.create_connection(self.address, timeout=10)
+        key = base64.b64encode(os.urandom(16)).decode()
+        self.sock.sendall((f"GET /socket.io/?EIO=4&transport=websocket HTTP/1.1\r\n"
+                           f"Host: {self.address[0]}:{self.address[1]}\r\n"
+                           f"Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                           f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+        while b'\r\n\r\n' not in self._buffer:
+            self._recv()
+        head, self._buffer = self._buffer.split(b'\r\n\r\n', 1)
+        if b' 101 ' not in head.split(b'\r\n', 1)[0]:
+            raise RuntimeError(f"WebSocket upgrade failed: {head[:200]!r}")
+        if self.wait_for(lambda packet: packet.startswith('0'), 10) is None:
+            raise RuntimeError("No Engine.IO open packet")
+        self.send('40')
+        self.wait_for(lambda packet: packet.startswith('40'), 10)
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def _recv(self):
+        data = self.sock.recv(65536)
+        if not data:
+            raise RuntimeError("WebSocket closed by the server")
+        self._buffer += data
+
+    def _send_frame(self, opcode, payload):
+        # Client frames are always masked
+        mask = os.urandom(4)
+        length = len(payload)
+        if length < 126:
+            header = bytes([0x80 | opcode, 0x80 | length])
+        elif length < 65536:
+            header = bytes([0x80 | opcode, 0x80 | 126]) + length.to_bytes(2, 'big')
+        else:
+            header = bytes([0x80 | opcode, 0x80 | 127]) + length.to_bytes(8, 'big')
+        self.sock.sendall(header + mask + bytes(b ^ mask[i % 4] for i, b in enumerate(payload)))
+
+    def send(self, packet):
+        self._send_frame(0x1, packet.encode())
+
+    def _next_frame(self):
+        """Takes one complete frame off the buffer as (opcode, payload), or returns None."""
+        buffer = self._buffer
+        if len(buffer) < 2:
+            return None
+        length, offset = buffer[1] & 0x7f, 2
+        if length >= 126:
+            offset += 2 if length == 126 else 8
+            if len(buffer) < offset:
+                return None
+            length = int.from_bytes(buffer[2:offset], 'big')
+        if len(buffer) < offset + length:
+            return None
+        self._buffer = buffer[offset + length:]
+        return buffer[0] & 0x0f, buffer[offset:offset + length]
+
+    def receive(self, timeout):
+        """Returns the packets of the next text frame, answering pings, or [] after 'timeout' seconds."""
+        deadline = time.time() + timeout
+        while True:
+            frame = self._next_frame()
+            if frame is None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return []
+                self.sock.settimeout(remaining)
+                try:
+                    self._recv()
+                except socket.timeout:
+                    return []
+                continue
+            opcode, payload = frame
+            if opcode == 0x8:
+                raise RuntimeError("WebSocket closed by the server")
+            if opcode == 0x9:
+                self._send_frame(0xA, payload)
+            elif opcode == 0x1:
+                packet = payload.decode()
+                if packet == '2':
+                    self.send('3')
+                return [packet]
+
+def start_server(port, env, log, workers=1):
+    process = subprocess.Popen([sys.executable, 'run.py', '--config', 'production', '--port', str(port),
+                                '--workers', str(workers)],
+                               env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Worker on port {port} exited with status {process.returncode}")
+        try:
+            if http('GET', f"{base_url}/api/departments", timeout=2)[0] == 200:
+                return process, base_url
+        except OSError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Worker on port {port} did not start")
+
+def run_checks(worker_a, worker_b, timeout):
+    """Returns a list of (check, passed, detail)."""
+    results = []
+    client = PollingClient(worker_b)
+    client.connect()
+    client.emit('subscribe', {'rooms': ['directory', 'dashboard']})
+    client.wait_for_event('subscribed', lambda data: True, 10)
+
+    # Cached on B before the write
+    _, kpis_before = http_json('GET', f"{worker_b}/api/dashboard/kpis")
+
+    stamp = time.time_ns()
+    status, created = http_json('POST', f"{worker_a}/api/employees", {
+        'first_name': 'Fanout', 'last_name': 'Check', 'email': f"fanout.{stamp}@example.com",
+        'job_title': 'Software Engineer', 'department': f"Fanout {stamp}",
+        'start_date': time.strftime('%Y-%m-%d'), 'salary': 750000,
+    })
+    results.append(('POST /api/employees on worker A', status == 201, f"status {status}"))
+    if status != 201:
+        return results
+
+    started = time.time()
+    message = client.wait_for_event('changes', lambda data: any(
+        e['event'] == 'employee_added' and e['data']['id'] == created['id'] for e in data['events']), timeout)
+    results.append(("worker B's client receives A's 'employee_added'", message is not None,
+                    f"after {time.time() - started:.2f}s" if message else f"nothing within {timeout}s"))
+
+    _, kpis_after = http_json('GET', f"{worker_b}/api/dashboard/kpis")
+    grew = kpis_after['totalEmployees'] == kpis_before['totalEmployees'] + 1
+    results.append(("worker B's cached KPIs include A's write", grew,
+                    f"{kpis_before['totalEmployees']} -> {kpis_after['totalEmployees']}"))
+
+    status, employees = http_json('GET', f"{worker_b}/api/employees?department=Fanout%20{stamp}")
+    found = status == 200 and any(e['id'] == created['id'] for e in employees['data'])
+    results.append(("worker B resolves the department A created", found, f"status {status}"))
+    return results
+
+def worker_pids(supervisor_pid):
+    """The worker processes forked by 'run.py --workers N', or None where /proc doesn't list them."""
+    try:
+        with open(f"/proc/{supervisor_pid}/task/{supervisor_pid}/children") as children:
+            return {int(pid) for pid in children.read().split()}
+    except OSError:
+        return None
+
+def collect_origins(base_url, timeout, clients=4, max_writes=30):
+    """
+    Connects WebSocket clients to a port shared by several workers and adds employees until
+    their events carry the origins of two workers or 'max_writes' is reached. Every event
+    must reach every client, whichever worker holds it. Returns (origins, error or None).
+    """
+    connected = [WebSocketClient(base_url) for _ in range(clients)]
+    origins = set()
+    try:
+        for client in connected:
+            client.connect()
+            client.emit('subscribe', {'rooms': ['directory']})
+            if client.wait_for_event('subscribed', lambda data: True, 10) is None:
+                return origins, "a client got no 'subscribed' reply"
+        for _ in range(max_writes):
+            stamp = time.time_ns()
+            status, created = http_json('POST', f"{base_url}/api/employees", {
+                'first_name': 'Pool', 'last_name': 'Check', 'email': f"pool.{stamp}@example.com",
+                'job_title': 'Software Engineer', 'department': 'Engineering',
+                'start_date': time.strftime('%Y-%m-%d'), 'salary': 750000,
+            })
+            if status != 201:
+                return origins, f"POST /api/employees returned {status}"
+            for index, client in enumerate(connected):
+                message = client.wait_for_event('changes', lambda data: any(
+                    e['event'] == 'employee_added' and e['data']['id'] == created['id'] for e in data['events']), timeout)
+                if message is None:
+                    return origins, f"client {index} missed employee {created['id']}"
+                origins.update(e['origin'] for e in message['events']
+                               if e['event'] == 'employee_added' and e['data']['id'] == created['id'])
+            if len(origins) >= 2:
+                break
+        return origins, None
+    finally:
+        for client in connected:
+            client.close()
+
+def run_pool_checks(process, base_url, queue_path, timeout):
+    """Checks 'run.py --workers 2' on one shared port. Returns a list of (check, passed, detail)."""
+    results = []
+    origins, error = collect_origins(base_url, timeout)
+    results.append(("clients on a shared port receive writes handled by both workers",
+                    error is None and len(origins) >= 2,
+                    error or f"{len(origins)} worker origin(s) seen"))
+    results.append(("workers share the default queue next to the database", os.path.exists(queue_path), queue_path))
+
+    pids = worker_pids(process.pid)
+    if pids is None:
+        print("SKIP  worker replacement (no /proc child list on this platform)")
+        return results
+    results.append(("the supervisor runs 2 workers", len(pids) == 2, f"pids {sorted(pids)}"))
+    if not pids:
+        return results
+    killed = min(pids)
+    os.kill(killed, signal.SIGKILL)
+    deadline = time.time() + 30
+    replaced = set()
+    while time.time() < deadline:
+        replaced = (worker_pids(process.pid) or set()) - pids
+        if replaced:
+            break
+        time.sleep(0.2)
+    results.append(("a killed worker is replaced", bool(replaced), f"killed {killed}, new {sorted(replaced)}"))
+    if not replaced:
+        return results
+
+    # The replacement builds its app after forking; once it accepts connections it has a new origin
+    time.sleep(2)
+    before = origins
+    origins, error = collect_origins(base_url, timeout)
+    results.append(("the replacement worker serves and fans out",
+                    error is None and len(origins) >= 2 and bool(origins - before),
+                    error or f"{len(origins - before)} new origin(s) seen"))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Check cross-worker Socket.IO fan-out and cache coherence.")
+    parser.add_argument('--database', default='hr_dashboard.db', help="Database to copy for the check")
+    parser.add_argument('--queue', default=None, help="SOCKETIO_MESSAGE_QUEUE URL (default: a temporary SQLite queue)")
+    parser.add_argument('--ports', default='5101,5102', help="Ports of workers A and B")
+    parser.add_argument('--pool-port', type=int, default=5103, help="Port of the 'run.py --workers 2' server")
+    parser.add_argument('--timeout', type=float, default=10, help="Seconds to wait for the event on worker B")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='hrdash-fanout-')
+    database = os.path.join(workdir, 'hr_dashboard.db')
+    shutil.copyfile(args.database, database)
+    env = dict(os.environ, HRDASH_DATABASE=database,
+               SOCKETIO_MESSAGE_QUEUE=args.queue or f"sqlite:///{os.path.join(workdir, 'queue.db')}")
+    port_a, port_b = (int(p) for p in args.ports.split(','))
+
+    processes = []
+    log = open(os.path.join(workdir, 'workers.log'), 'w')
+    try:
+        # One after the other, so only A applies any pending migrations
+        process_a, worker_a = start_server(port_a, env, log)
+        processes.append(process_a)
+        process_b, worker_b = start_server(port_b, env, log)
+        processes.append(process_b)
+        results = run_checks(worker_a, worker_b, args.timeout)
+        for process in processes:
+            process.terminate()
+            process.wait(10)
+        processes = []
+
+        # Without SOCKETIO_MESSAGE_QUEUE, so the workers fall back to the default queue
+        pool_env = dict(env)
+        pool_env.pop('SOCKETIO_MESSAGE_QUEUE')
+        process, pool_url = start_server(args.pool_port, pool_env, log, workers=2)
+        processes.append(process)
+        queue_path = f"{os.path.splitext(database)[0]}.socketio_queue.db"
+        results += run_pool_checks(process, pool_url, queue_path, args.timeout)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(10)
+        log.close()
+
+    for check, passed, detail in results:
+        print(f"{'PASS' if passed else 'FAIL'}  {check} ({detail})")
+    if all(passed for _, passed, _ in results):
+        shutil.rmtree(workdir, ignore_errors=True)
+        return 0
+    print(f"Worker logs: {os.path.join(workdir, 'workers.log')}")
+    return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
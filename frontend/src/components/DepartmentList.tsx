@@ -3,6 +3,7 @@ import { motion, AnimatePresence } from 'framer-motion';
 import { Plus, Trash2, X } from 'lucide-react';
 import api from '../services/api';
 import { useSocket } from '../context/SocketContext';
+import { onChangeEvents } from '../listeners/socketListeners';
 
 interface Department {
   id: number;
@@ -13,25 +14,40 @@ const DepartmentList: React.FC = () => {
   const [departments, setDepartments] = useState<Department[]>([]);
   const [newDepartment, setNewDepartment] = useState('');
   const [isModalOpen, setIsModalOpen] = useState(false);
-  const { socket } = useSocket();
+  const { socket, lastSync } = useSocket();
 
   useEffect(() => {
     fetchDepartments();
 
     if (socket) {
-      socket.on('department_added', (department: Department) => {
-        setDepartments((prev) => [...prev, department]);
+      // Live updates arrive as events inside the batched 'changes' messages
+      return onChangeEvents(socket, {
+        department_added: (department: Department) => {
+          setDepartments((prev) => [...prev.filter((dept) => dept.id !== department.id), department]);
+        },
+        department_deleted: (data: { id: number }) => {
+          setDepartments((prev) => prev.filter((dept) => dept.id !== data.id));
+        },
       });
-      socket.on('department_deleted', (data: { id: number }) => {
-        setDepartments((prev) => prev.filter((dept) => dept.id !== data.id));
-      });
-      return () => {
-        socket.off('department_added');
-        socket.off('department_deleted');
-      };
     }
   }, [socket]);
 
+  // Apply what changed while the socket was disconnected
+  useEffect(() => {
+    if (!lastSync) return;
+    if (lastSync.resync) {
+      fetchDepartments();
+      return;
+    }
+    const removed = new Set(lastSync.deleted.departments);
+    const changed = new Map(lastSync.departments.map((item) => [item.id, item]));
+    if (!removed.size && !changed.size) return;
+    setDepartments((prev) => [
+      ...prev.filter((item) => !removed.has(item.id) && !changed.has(item.id)),
+      ...changed.values(),
+    ]);
+  }, [lastSync]);
+
   const fetchDepartments = async () => {
     try {
       const response = await api.get('/api/departments');
@@ -3,6 +3,7 @@ import { motion, AnimatePresence } from 'framer-motion';
 import { Plus, Trash2, X } from 'lucide-react';
 import api from '../services/api';
 import { useSocket } from '../context/SocketContext';
+import { onChangeEvents } from '../listeners/socketListeners';
 
 interface JobTitle {
   id: number;
@@ -13,25 +14,40 @@ const JobTitleList: React.FC = () => {
   const [jobTitles, setJobTitles] = useState<JobTitle[]>([]);
   const [newJobTitle, setNewJobTitle] = useState('');
   const [isModalOpen, setIsModalOpen] = useState(false);
-  const { socket } = useSocket();
+  const { socket, lastSync } = useSocket();
 
   useEffect(() => {
     fetchJobTitles();
 
     if (socket) {
-      socket.on('job_title_added', (jobTitle: JobTitle) => {
-        setJobTitles((prev) => [...prev, jobTitle]);
+      // Live updates arrive as events inside the batched 'changes' messages
+      return onChangeEvents(socket, {
+        job_title_added: (jobTitle: JobTitle) => {
+          setJobTitles((prev) => [...prev.filter((job) => job.id !== jobTitle.id), jobTitle]);
+        },
+        job_title_deleted: (data: { id: number }) => {
+          setJobTitles((prev) => prev.filter((job) => job.id !== data.id));
+        },
       });
-      socket.on('job_title_deleted', (data: { id: number }) => {
-        setJobTitles((prev) => prev.filter((job) => job.id !== data.id));
-      });
-      return () => {
-        socket.off('job_title_added');
-        socket.off('job_title_deleted');
-      };
     }
   }, [socket]);
 
+  // Apply what changed while the socket was disconnected
+  useEffect(() => {
+    if (!lastSync) return;
+    if (lastSync.resync) {
+      fetchJobTitles();
+      return;
+    }
+    const removed = new Set(lastSync.deleted.jobTitles);
+    const changed = new Map(lastSync.jobTitles.map((item) => [item.id, item]));
+    if (!removed.size && !changed.size) return;
+    setJobTitles((prev) => [
+      ...prev.filter((item) => !removed.has(item.id) && !changed.has(item.id)),
+      ...changed.values(),
+    ]);
+  }, [lastSync]);
+
   const fetchJobTitles = async () => {
     try {
       const response = await api.get('/api/job-titles');
@@ -1,15 +1,19 @@
-import React, { createContext, useContext, useEffect, useState } from 'react';
+import React, { createContext, useContext, useEffect, useRef, useState } from 'react';
 import { io, Socket } from 'socket.io-client';
 import toast from 'react-hot-toast';
+import { changesAPI, ChangeSet } from '../services/api';
 
 interface SocketContextType {
   socket: Socket | null;
   isConnected: boolean;
+  // The latest page of changes fetched after a reconnect; lists apply it to catch up
+  lastSync: ChangeSet | null;
 }
 
 const SocketContext = createContext<SocketContextType>({
   socket: null,
   isConnected: false,
+  lastSync: null,
 });
 
 export const useSocket = () => {
@@ -27,13 +31,53 @@ interface SocketProviderProps {
 export const SocketProvider: React.FC<SocketProviderProps> = ({ children }) => {
   const [socket, setSocket] = useState<Socket | null>(null);
   const [isConnected, setIsConnected] = useState(false);
+  const [lastSync, setLastSync] = useState<ChangeSet | null>(null);
+  // The pages load their lists once they render, so the change position is read first:
+  // anything written after the lists were read then shows up in the next catch-up
+  const [positionRead, setPositionRead] = useState(false);
+  const lastSeq = useRef<number | null>(null);
 
   useEffect(() => {
-    const newSocket = io('http://127.0.0.1:5000');
+    changesAPI.getChanges()
+      .then((response) => {
+        lastSeq.current = response.data.seq;
+      })
+      .catch((error) => console.error('Error reading the change position:', error))
+      .finally(() => setPositionRead(true));
+  }, []);
+
+  // After every connect, fetch what changed since the last known position, page by page,
+  // instead of reloading whole lists. Without a position yet, just remember the current one.
+  const catchUp = async () => {
+    try {
+      if (lastSeq.current === null) {
+        lastSeq.current = (await changesAPI.getChanges()).data.seq;
+        return;
+      }
+      let changes: ChangeSet;
+      do {
+        changes = (await changesAPI.getChanges(lastSeq.current)).data;
+        lastSeq.current = changes.seq;
+        setLastSync(changes);
+      } while (changes.hasMore && !changes.resync);
+    } catch (error) {
+      console.error('Error syncing changes:', error);
+    }
+  };
+
+  useEffect(() => {
+    // Connecting first could read a change position later than the lists
+    if (!positionRead) return;
+    // WebSocket only: with several backend workers behind one port, HTTP long-polling
+    // requests could reach a worker that doesn't hold the session
+    const newSocket = io('http://127.0.0.1:5000', { transports: ['websocket'] });
     setSocket(newSocket);
 
     newSocket.on('connect', () => {
       setIsConnected(true);
+      // Rooms are per connection, so re-subscribe after every (re)connect
+      newSocket.emit('subscribe', { rooms: ['directory', 'settings', 'dashboard'] });
+      catchUp();
       toast.success('Connected to real-time updates');
     });
 
@@ -44,11 +88,11 @@ export const SocketProvider: React.FC<SocketProviderProps> = ({ children }) => {
     return () => {
       newSocket.close();
     };
-  }, []);
+  }, [positionRead]);
 
   return (
-    <SocketContext.Provider value={{ socket, isConnected }}>
-      {children}
+    <SocketContext.Provider value={{ socket, isConnected, lastSync }}>
+      {positionRead ? children : null}
     </SocketContext.Provider>
   );
 };
\ No newline at end of file
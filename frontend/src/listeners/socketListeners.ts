@@ -15,6 +15,18 @@ const onEmployeeDeactivated = (employee: Employee) => {
   toast.error(`Employee deactivated: ${employee.first_name} ${employee.last_name}`);
 };
 
+const onEmployeesImported = (summary: { imported: number, failed: number }) => {
+  toast.success(`Imported ${summary.imported} employees${summary.failed ? ` (${summary.failed} rows rejected)` : ''}`);
+};
+
+const onEmployeesUpdated = (summary: { count: number }) => {
+  toast.success(`${summary.count} employees updated`);
+};
+
+const onEmployeesDeactivated = (summary: { count: number }) => {
+  toast.error(`${summary.count} employees deactivated`);
+};
+
 const onDepartmentAdded = (department: { id: number, name: string }) => {
   toast.success(`New department added: ${department.name}`);
 };
@@ -32,34 +44,61 @@ const onJobTitleDeleted = (data: { id: number }) => {
 };
 
 
+// Maps each event name carried inside a 'changes' message to its handler
+const handlers: { [event: string]: (data: any) => void } = {
+  employee_added: onEmployeeAdded,
+  employee_updated: onEmployeeUpdated,
+  employee_deactivated: onEmployeeDeactivated,
+  employees_imported: onEmployeesImported,
+  employees_updated: onEmployeesUpdated,
+  employees_deactivated: onEmployeesDeactivated,
+  department_added: onDepartmentAdded,
+  department_deleted: onDepartmentDeleted,
+  job_title_added: onJobTitleAdded,
+  job_title_deleted: onJobTitleDeleted,
+};
+
+interface ChangeEvent {
+  event: string;
+  data: any;
+  seq: number;
+  origin: string;
+}
+
 /**
  * Initializes all socket event listeners and returns a cleanup function.
  * The cleanup function is essential to remove listeners when a component unmounts,
  * preventing duplicate event registrations and notification spam.
  *
+ * The backend batches events into 'changes' messages. Each batch reaches a client as one
+ * message holding every event for any of its subscribed rooms, each event once.
+ *
  * @param socket The socket.io-client instance.
  * @returns A function that removes all registered listeners.
  */
-export const initializeSocketListeners = (socket: Socket) => {
-  // --- Register all event listeners ---
-  socket.on('employee_added', onEmployeeAdded);
-  socket.on('employee_updated', onEmployeeUpdated);
-  socket.on('employee_deactivated', onEmployeeDeactivated);
-  socket.on('department_added', onDepartmentAdded);
-  socket.on('department_deleted', onDepartmentDeleted);
-  socket.on('job_title_added', onJobTitleAdded);
-  socket.on('job_title_deleted', onJobTitleDeleted);
+export const initializeSocketListeners = (socket: Socket) => onChangeEvents(socket, handlers);
+
+/**
+ * Calls the handler named after each event inside the 'changes' messages, e.g. so a list
+ * can apply 'department_added'. Returns a function that removes only this listener.
+ *
+ * @param socket The socket.io-client instance.
+ * @param eventHandlers Handlers by event name; events without one are ignored.
+ * @returns A function that removes the registered listener.
+ */
+export const onChangeEvents = (socket: Socket, eventHandlers: { [event: string]: (data: any) => void }) => {
+  const onChanges = (message: { rooms: string[]; events: ChangeEvent[] }) => {
+    message.events.forEach(({ event, data }) => {
+      eventHandlers[event]?.(data);
+    });
+  };
+
+  // --- Register the batched change listener ---
+  socket.on('changes', onChanges);
 
   // --- Return the cleanup function ---
   // React will call this function when the useEffect hook cleans up.
   return () => {
-    // --- Unregister all event listeners ---
-    socket.off('employee_added', onEmployeeAdded);
-    socket.off('employee_updated', onEmployeeUpdated);
-    socket.off('employee_deactivated', onEmployeeDeactivated);
-    socket.off('department_added', onDepartmentAdded);
-    socket.off('department_deleted', onDepartmentDeleted);
-    socket.off('job_title_added', onJobTitleAdded);
-    socket.off('job_title_deleted', onJobTitleDeleted);
+    socket.off('changes', onChanges);
   };
 };
\ No newline at end of file
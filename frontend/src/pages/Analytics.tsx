@@ -26,33 +26,9 @@ const Analytics: React.FC = () => {
 
   const fetchTurnoverData = async () => {
     try {
-      const response = await api.get('/api/analytics/turnover');
-      const { hires, departures } = response.data;
-
-      const combinedData: { [key: string]: TurnoverData } = {};
-
-      hires.forEach((item: { month: string; count: number }) => {
-        combinedData[item.month] = {
-          month: item.month,
-          hires: item.count,
-          departures: 0,
-        };
-      });
-
-      departures.forEach((item: { month: string; count: number }) => {
-        if (combinedData[item.month]) {
-          combinedData[item.month].departures = item.count;
-        } else {
-          combinedData[item.month] = {
-            month: item.month,
-            hires: 0,
-            departures: item.count,
-          };
-        }
-      });
-
-      const sortedData = Object.values(combinedData).sort((a, b) => a.month.localeCompare(b.month));
-      setTurnoverData(sortedData);
+      // The backend merges hires and departures per month and returns them sorted
+      const response = await api.get<{ series: TurnoverData[] }>('/api/analytics/turnover');
+      setTurnoverData(response.data.series);
     } catch (error) {
       console.error('Error fetching turnover data:', error);
     }
@@ -2,9 +2,10 @@ import React from 'react';
 import { motion } from 'framer-motion';
 import { Users, UserCheck, Building2, DollarSign, TrendingUp } from 'lucide-react';
 import { PieChart, Pie, Cell, ResponsiveContainer, Tooltip, AreaChart, Area, XAxis, YAxis, CartesianGrid } from 'recharts';
-import { dashboardAPI, KPIData, DepartmentBreakdown, NewHireData, employeeAPI } from '../services/api';
+import { dashboardAPI, KPIData, DepartmentBreakdown, NewHireData } from '../services/api';
 import { useEffect, useState } from 'react';
 import KPIWidgets from '../components/KPIWidgets';
+import { useSocket } from '../context/SocketContext';
 import DepartmentChart from '../components/DepartmentChart';
 import NewHiresChart from '../components/NewHiresChart';
 
@@ -12,42 +13,36 @@ const Dashboard: React.FC = () => {
   const [kpis, setKpis] = useState<KPIData | null>(null);
   const [departmentData, setDepartmentData] = useState<DepartmentBreakdown[]>([]);
   const [newHireData, setNewHireData] = useState<NewHireData[]>([]);
+  const { lastSync } = useSocket();
 
-  useEffect(() => {
-    const fetchData = async () => {
-      try {
-        const kpiResponse = await dashboardAPI.getKPIs();
-        setKpis(kpiResponse.data);
-
-        const departmentResponse = await dashboardAPI.getDepartmentBreakdown();
-        const total = departmentResponse.data.reduce((acc, item) => acc + item.count, 0);
-        const dataWithPercentage = departmentResponse.data.map(item => ({
-          ...item,
-          percentage: total > 0 ? parseFloat(((item.count / total) * 100).toFixed(2)) : 0,
-        }));
-        setDepartmentData(dataWithPercentage);
-
-        // Simulate new hire data
-        const employeeResponse = await employeeAPI.getEmployees({ limit: 1000 }); // Fetch all employees
-        const hiresByMonth: { [key: string]: number } = {};
-        employeeResponse.data.data.forEach(emp => {
-          const month = new Date(emp.start_date).toLocaleString('default', { month: 'short' });
-          hiresByMonth[month] = (hiresByMonth[month] || 0) + 1;
-        });
-        const newHires = Object.keys(hiresByMonth).map(month => ({
-          month,
-          count: hiresByMonth[month],
-        }));
-        setNewHireData(newHires);
-
-      } catch (error) {
-        console.error("Failed to fetch dashboard data:", error);
-      }
-    };
+  const fetchData = async () => {
+    try {
+      // KPIs, department breakdown and monthly hires all come from one summary request
+      const { data } = await dashboardAPI.getSummary({ months: 12 });
+      setKpis(data.kpis);
+      setDepartmentData(data.departmentBreakdown);
+      setNewHireData(data.newHiresByMonth.map(item => ({
+        month: new Date(`${item.month}-01T00:00:00`).toLocaleString('default', { month: 'short' }),
+        count: item.count,
+      })));
+    } catch (error) {
+      console.error("Failed to fetch dashboard data:", error);
+    }
+  };
 
+  useEffect(() => {
     fetchData();
   }, []);
 
+  // The figures are aggregates, so any employee (or department name) that changed while
+  // the socket was disconnected means fetching the summary again
+  useEffect(() => {
+    if (lastSync && (lastSync.resync || lastSync.employees.length || lastSync.deleted.employees.length
+                     || lastSync.departments.length)) {
+      fetchData();
+    }
+  }, [lastSync]);
+
   const widgets = kpis ? [
     {
       title: 'Total Employees',
@@ -5,6 +5,7 @@ import EmployeeTable from '../components/EmployeeTable';
 import EmployeeModal from '../components/EmployeeModal';
 import { Employee, employeeAPI } from '../services/api';
 import { useDebounce } from '../hooks/useDebounce';
+import { useSocket } from '../context/SocketContext';
 
 const Employees: React.FC = () => {
   const [employees, setEmployees] = useState<Employee[]>([]);
@@ -14,6 +15,7 @@ const Employees: React.FC = () => {
   const [filterDepartment, setFilterDepartment] = useState('');
   const [pagination, setPagination] = useState({ page: 1, limit: 10, totalPages: 1 });
   const debouncedSearchTerm = useDebounce(searchTerm, 300);
+  const { lastSync } = useSocket();
 
   const fetchEmployees = useCallback(async () => {
     try {
@@ -24,7 +26,7 @@ const Employees: React.FC = () => {
         department: filterDepartment,
       });
       setEmployees(response.data.data);
-      setPagination(prev => ({ ...prev, totalPages: response.data.pagination.totalPages }));
+      setPagination(prev => ({ ...prev, totalPages: response.data.pagination.totalPages ?? 1 }));
     } catch (error) {
       console.error("Failed to fetch employees:", error);
     }
@@ -34,6 +36,24 @@ const Employees: React.FC = () => {
     fetchEmployees();
   }, [fetchEmployees]);
 
+  // Apply what changed while the socket was disconnected. Changes to rows on this page are
+  // patched in place; anything else (e.g. a new hire) may move rows between pages, so the
+  // page is fetched again.
+  useEffect(() => {
+    if (!lastSync) return;
+    const visible = new Set(employees.map((employee) => employee.id));
+    if (lastSync.resync || lastSync.deleted.employees.length
+        || lastSync.employees.some((employee) => !visible.has(employee.id))) {
+      fetchEmployees();
+      return;
+    }
+    if (!lastSync.employees.length) return;
+    const changed = new Map(lastSync.employees.map((employee) => [employee.id, employee]));
+    setEmployees((prev) => prev
+      .map((employee) => changed.get(employee.id) ?? employee)
+      .filter((employee) => employee.is_active));
+  }, [lastSync]);
+
   const departments = [...new Set(employees.map(emp => emp.department))];
 
   const handleAddEmployee = () => {
@@ -33,6 +33,8 @@ export interface Employee {
   email: string;
   department: string;
   job_title: string;
+  department_id?: number;
+  job_title_id?: number;
   start_date: string;
   end_date?: string;
   is_active: boolean;
@@ -56,24 +58,55 @@ export interface NewHireData {
   count: number;
 }
 
+export interface DashboardSummary {
+  kpis: KPIData;
+  departmentBreakdown: DepartmentBreakdown[];
+  newHiresByMonth: NewHireData[];
+}
+
 // API calls
 export const dashboardAPI = {
   getKPIs: () => api.get<KPIData>('/api/dashboard/kpis'),
   getDepartmentBreakdown: () => api.get<DepartmentBreakdown[]>('/api/dashboard/department-breakdown'),
+  getSummary: (params?: { months?: number }) => api.get<DashboardSummary>('/api/dashboard/summary', { params }),
 };
 
 export interface PaginatedEmployees {
   data: Employee[];
   pagination: {
-    totalRecords: number;
-    currentPage: number;
-    totalPages: number;
+    totalRecords: number | null;
+    currentPage?: number;
+    totalPages?: number | null;
+    nextCursor?: string | null;
+    hasMore?: boolean;
     limit: number;
   };
 }
 
+export interface BatchTarget {
+  ids?: number[];
+  filter?: { search?: string; department?: string; job_title?: string; status?: 'active' | 'inactive' | 'all' };
+}
+
+export interface BatchResult {
+  results: { id: number; status: 'updated' | 'deactivated' | 'already_inactive' | 'not_found' }[];
+  updated?: number;
+  deactivated?: number;
+  alreadyInactive?: number;
+  notFound: number;
+}
+
 export const employeeAPI = {
-  getEmployees: (params?: { search?: string; page?: number; limit?: number; department?: string }) => 
+  getEmployees: (params?: {
+    search?: string;
+    page?: number;
+    limit?: number;
+    department?: string;
+    cursor?: string;
+    include_total?: boolean;
+    // Comma-separated subset of Employee fields; the rest are omitted from each row
+    fields?: string;
+  }) => 
     api.get<PaginatedEmployees>('/api/employees', { params }),
   createEmployee: (data: Omit<Employee, 'id'>) => 
     api.post<Employee>('/api/employees', data),
@@ -81,6 +114,10 @@ export const employeeAPI = {
     api.put<Employee>(`/api/employees/${id}`, data),
   deactivateEmployee: (id: number) => 
     api.put<Employee>(`/api/employees/${id}/deactivate`),
+  batchUpdateEmployees: (target: BatchTarget, changes: Partial<Pick<Employee, 'job_title' | 'department' | 'salary' | 'start_date'>>) =>
+    api.put<BatchResult>('/api/employees/batch', { ...target, changes }),
+  batchDeactivateEmployees: (target: BatchTarget, endDate?: string) =>
+    api.put<BatchResult>('/api/employees/batch/deactivate', { ...target, end_date: endDate }),
 };
 
 export const settingsAPI = {
@@ -88,4 +125,22 @@ export const settingsAPI = {
   getJobTitles: () => api.get<any[]>('/api/job-titles'),
 };
 
+export interface ChangeSet {
+  since: number | null;
+  seq: number;
+  hasMore: boolean;
+  // 'since' is ahead of the server's change log; reload the full lists
+  resync: boolean;
+  employees: Employee[];
+  departments: { id: number; name: string }[];
+  jobTitles: { id: number; name: string }[];
+  deleted: { employees: number[]; departments: number[]; jobTitles: number[] };
+}
+
+export const changesAPI = {
+  // Without 'since', only returns the current 'seq' to sync from later
+  getChanges: (since?: number, limit?: number) =>
+    api.get<ChangeSet>('/api/changes', { params: { since, limit } }),
+};
+
 export default api;
\ No newline at end of file
@@ -0,0 +1,145 @@
+# hrdash/generate_data.py
+
+"""
+Builds reproducible synthetic HR databases for benchmarking.
+
+Usage:
+    python generate_data.py --employees 100000 [--seed 42] [--today 2025-01-01] [--output bench_data/hr_100000.db]
+    python generate_data.py --preset all      # 10k, 100k and 1M employee databases
+
+Start and end dates are spread over the years before --today (default: the current
+date), which is printed with the seed. The same --seed and --today give the same database.
+
+The databases use the application's own schema and migrations, so triggers,
+indexes and aggregates are exactly what the app would maintain.
+"""
+
+import argparse
+import math
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+PRESETS = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+BATCH_SIZE = 10_000
+
+# Department -> (share of the workforce, job titles as (title, salary multiplier))
+DEPARTMENTS = {
+    'Engineering': (0.32, [('Software Engineer', 1.0), ('Senior Software Engineer', 1.6), ('Staff Engineer', 2.3),
+                           ('QA Engineer', 0.8), ('DevOps Engineer', 1.2), ('Engineering Manager', 2.5)]),
+    'Sales': (0.18, [('Sales Executive', 0.6), ('Account Manager', 0.9), ('Sales Manager', 1.5),
+                     ('Business Development Lead', 1.3)]),
+    'Customer Support': (0.14, [('Support Associate', 0.4), ('Support Specialist', 0.6), ('Support Lead', 0.9)]),
+    'Marketing': (0.08, [('Marketing Associate', 0.6), ('Content Strategist', 0.8), ('Marketing Manager', 1.4)]),
+    'Operations': (0.09, [('Operations Analyst', 0.7), ('Operations Manager', 1.3), ('Facilities Coordinator', 0.5)]),
+    'Finance': (0.06, [('Accountant', 0.8), ('Financial Analyst', 1.0), ('Finance Manager', 1.7)]),
+    'Human Resources': (0.05, [('HR Associate', 0.6), ('Recruiter', 0.7), ('HR Business Partner', 1.2)]),
+    'Product': (0.05, [('Product Analyst', 1.0), ('Product Manager', 1.8), ('Product Designer', 1.3)]),
+    'Legal': (0.03, [('Legal Counsel', 1.9), ('Compliance Officer', 1.2), ('Paralegal', 0.7)]),
+}
+
+FIRST_NAMES = ['Aarav', 'Aditi', 'Akash', 'Ananya', 'Arjun', 'Diya', 'Farhan', 'Ishaan', 'Kavya', 'Meera',
+               'Neha', 'Nikhil', 'Priya', 'Rahul', 'Riya', 'Rohan', 'Sahil', 'Sana', 'Tanvi', 'Vikram',
+               'Aisha', 'Daniel', 'Elena', 'George', 'Hannah', 'Ivan', 'Julia', 'Kenji', 'Laura', 'Mateo',
+               'Nora', 'Omar', 'Paula', 'Quentin', 'Sofia', 'Thomas', 'Uma', 'Victor', 'Wei', 'Yusuf']
+LAST_NAMES = ['Sharma', 'Verma', 'Iyer', 'Nair', 'Reddy', 'Gupta', 'Mehta', 'Kapoor', 'Chakraborty', 'Das',
+              'Banerjee', 'Joshi', 'Kulkarni', 'Patel', 'Singh', 'Khan', 'Rao', 'Menon', 'Bose', 'Pillai',
+              'Smith', 'Garcia', 'Müller', 'Rossi', 'Tanaka', 'Kim', 'Nguyen', 'Silva', 'Novak', 'Cohen']
+
+BASE_SALARY = 600_000          # Rupees per year for a multiplier of 1.0
+HISTORY_YEARS = 10
+ANNUAL_ATTRITION = 0.15
+
+def generate_employees(count, rng, today):
+    """
+    Yields employee row tuples with department and job title names; build_database
+    swaps the names for their lookup ids in the column order of its INSERT.
+    Hiring grows over time, tenure is exponential (so attrition is roughly
+    ANNUAL_ATTRITION per year), and salaries are log-normal around each title's level.
+    """
+    departments = list(DEPARTMENTS)
+    weights = [DEPARTMENTS[d][0] for d in departments]
+    history_days = HISTORY_YEARS * 365
+    mean_tenure_days = 365 / ANNUAL_ATTRITION
+    for i in range(count):
+        department = rng.choices(departments, weights)[0]
+        title, level = rng.choice(DEPARTMENTS[department][1])
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        # sqrt skews hire dates towards the present, like a growing company
+        start = today - timedelta(days=int(history_days * (1 - math.sqrt(rng.random()))))
+        tenure = int(rng.expovariate(1 / mean_tenure_days))
+        end = start + timedelta(days=tenure)
+        is_active = 1 if end >= today else 0
+        salary = round(BASE_SALARY * level * rng.lognormvariate(0, 0.25), -2)
+        email = f"{first.lower()}.{last.lower()}.{i}@example.com"
+        yield (first, last, email, title, department, start.isoformat(),
+               None if is_active else end.isoformat(), is_active, salary)
+
+def build_database(path, count, today, seed=42):
+    """Creates a fresh database at 'path' with 'count' synthetic employees, dated up to 'today'."""
+    if os.path.exists(path):
+        os.remove(path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    # database.py reads the file name from the config at import time
+    os.environ['HRDASH_DATABASE'] = path
+    import database
+    database.DATABASE_NAME = path
+    database.create_database_table()
+
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    with sqlite3.connect(path) as conn:
+        # Durability is irrelevant while generating; the file is rebuilt on failure
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.executemany("INSERT OR IGNORE INTO departments (name) VALUES (?)", [(d,) for d in DEPARTMENTS])
+        conn.executemany("INSERT OR IGNORE INTO job_titles (name) VALUES (?)",
+                         [(t,) for _, titles in DEPARTMENTS.values() for t, _ in titles])
+        department_ids = dict(conn.execute("SELECT name, id FROM departments"))
+        job_title_ids = dict(conn.execute("SELECT name, id FROM job_titles"))
+        insert_sql = """
+            INSERT INTO employees (first_name, last_name, email, job_title_id, department_id, start_date, end_date, is_active, salary)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """
+        batch = []
+        for row in generate_employees(count, rng, today):
+            batch.append(row[:3] + (job_title_ids[row[3]], department_ids[row[4]]) + row[5:])
+            if len(batch) >= BATCH_SIZE:
+                conn.executemany(insert_sql, batch)
+                conn.commit()
+                batch = []
+        if batch:
+            conn.executemany(insert_sql, batch)
+        conn.commit()
+        conn.execute("ANALYZE")
+    print(f"Generated {count} employees in {path} with --seed {seed} --today {today.isoformat()} "
+          f"({time.perf_counter() - started:.1f}s)")
+    return path
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a synthetic HR dashboard database.")
+    parser.add_argument('--employees', type=int, help="Number of employees to generate")
+    parser.add_argument('--preset', choices=list(PRESETS) + ['all'], help="Generate a standard size (or all of them)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--today', type=date.fromisoformat, default=date.today(),
+                        help="Reference date (YYYY-MM-DD) the history ends at; default the current date")
+    parser.add_argument('--output', help="Database file (default bench_data/hr_<count>.db)")
+    args = parser.parse_args()
+
+    if args.preset == 'all':
+        sizes = list(PRESETS.values())
+    elif args.preset:
+        sizes = [PRESETS[args.preset]]
+    elif args.employees:
+        sizes = [args.employees]
+    else:
+        parser.error("pass --employees or --preset")
+    if args.output and len(sizes) > 1:
+        parser.error("--output can only be used with a single size")
+
+    for size in sizes:
+        build_database(args.output or os.path.join('bench_data', f'hr_{size}.db'), size, args.today, args.seed)
+    sys.exit(0)
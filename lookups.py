@@ -0,0 +1,101 @@
+# hrdash/lookups.py
+
+import threading
+
+# API field -> (lookup table, employees column holding the id of a row in it)
+LOOKUP_FIELDS = {
+    'department': ('departments', 'department_id'),
+    'job_title': ('job_titles', 'job_title_id'),
+}
+
+# ===================================================================
+# 1. IN-PROCESS LOOKUP CACHE
+# ===================================================================
+# 'employees' stores integer ids for its department and job title, while the API
+# speaks in names. The lookup tables hold a few dozen rows, so a full copy lives in
+# memory and translates in both directions without a JOIN.
+
+class LookupCache:
+    """
+    A thread-safe copy of the 'departments' and 'job_titles' tables.
+    It is loaded lazily, dropped by invalidate() whenever a lookup row is added or
+    deleted, and reloaded once when asked for an id it doesn't know (e.g. one created
+    by another process).
+    """
+
+    def __init__(self):
+        self.loads = 0
+        self._names = None  # {table: {id: name}}
+        self._ids = None    # {table: {name: id}}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """Forgets the cached tables; the next lookup reloads them."""
+        with self._lock:
+            self._generation += 1
+            self._names = self._ids = None
+
+    def _tables(self):
+        """Returns (names by id, ids by name), loading them from the database if needed."""
+        with self._lock:
+            if self._names is not None:
+                return self._names, self._ids
+            generation = self._generation
+
+        from database import get_db_pool
+        pool = get_db_pool(readonly=True)
+        conn = pool.acquire()
+        try:
+            names = {table: dict(conn.execute(f"SELECT id, name FROM {table}").fetchall())
+                     for table, _ in LOOKUP_FIELDS.values()}
+        finally:
+            pool.release(conn)
+        ids = {table: {name: row_id for row_id, name in by_id.items()} for table, by_id in names.items()}
+
+        with self._lock:
+            self.loads += 1
+            # An invalidate() while loading means the rows read may already be out of date
+            if self._generation == generation:
+                self._names, self._ids = names, ids
+        return names, ids
+
+    def name_of(self, field, row_id):
+        """Returns the name for a department or job title id, or None if it doesn't exist."""
+        table = LOOKUP_FIELDS[field][0]
+        names, _ = self._tables()
+        if row_id not in names[table] and row_id is not None:
+            self.invalidate()
+            names, _ = self._tables()
+        return names[table].get(row_id)
+
+    def id_of(self, field, name):
+        """Returns the id for a department or job title name, or None if there is no such name."""
+        _, ids = self._tables()
+        return ids[LOOKUP_FIELDS[field][0]].get(name)
+
+lookup_cache = LookupCache()
+
+# ===================================================================
+# 2. WRITE HELPERS
+# ===================================================================
+# Writes keep accepting names. They run on the writer thread and translate names
+# inside SQL, so they always see the committed lookup rows rather than the cache.
+
+def lookup_id_sql(field):
+    """A scalar subquery turning one name parameter into its lookup id."""
+    table = LOOKUP_FIELDS[field][0]
+    return f"(SELECT id FROM {table} WHERE name = ?)"
+
+def ensure_lookup_names(conn, field, names):
+    """
+    Adds any of 'names' missing from the field's lookup table, so a write naming a new
+    department or job title keeps working. Must run inside a writer operation; the
+    cache is invalidated once that operation commits.
+    """
+    table = LOOKUP_FIELDS[field][0]
+    before = conn.total_changes
+    conn.executemany(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", [(name,) for name in set(names)])
+    if conn.total_changes != before:
+        from extensions import writer
+        writer.on_commit(lookup_cache.invalidate)
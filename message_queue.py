@@ -0,0 +1,112 @@
+# hrdash/message_queue.py
+
+import os
+import sqlite3
+import threading
+import time
+
+import socketio
+
+def default_local_queue(database_name):
+    """
+    The queue several workers share when SOCKETIO_MESSAGE_QUEUE isn't set: a SQLite file
+    next to the database (e.g. 'hr_dashboard.socketio_queue.db'), wherever they were started.
+    """
+    base, _ = os.path.splitext(os.path.abspath(database_name))
+    return f"sqlite:///{base}.socketio_queue.db"
+
+# ===================================================================
+# 1. SQLITE PUB/SUB BACKEND
+# ===================================================================
+
+class SQLiteManager(socketio.PubSubManager):
+    """
+    A Socket.IO client manager that fans events out between processes on one machine
+    through a shared SQLite file, so several workers can run without Redis or RabbitMQ.
+
+    Publishing appends a row to 'socketio_messages'; every process polls for rows newer
+    than the last one it has seen. SQLite assigns row ids in commit order, so a poller
+    never skips a message. Rows older than 'retention' seconds are pruned by publishers.
+
+    URLs follow the SQLAlchemy convention: 'sqlite:///queue.db' is relative to the
+    working directory, 'sqlite:////var/run/hrdash/queue.db' is absolute.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, url, channel='socketio', write_only=False, logger=None,
+                 json=None, poll_interval=0.05, retention=60):
+        if not url.startswith('sqlite:///'):
+            raise ValueError(f"Not a SQLite message queue URL: {url}")
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self.path = url[len('sqlite:///'):]
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._published = 0
+        self._local = threading.local()
+        # Creates the table up front so the first poll and publish don't race to do it
+        self._connection()
+
+    def _connection(self):
+        """One connection per thread, since the listener and publishers run on different threads."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS socketio_messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    channel TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created REAL NOT NULL
+                )
+            """)
+            self._local.conn = conn
+        return conn
+
+    def _publish(self, data):
+        conn = self._connection()
+        now = time.time()
+        conn.execute("INSERT INTO socketio_messages (channel, payload, created) VALUES (?, ?, ?)",
+                     (self.channel, self.json.dumps(data), now))
+        self._published += 1
+        if self._published % 100 == 0:
+            conn.execute("DELETE FROM socketio_messages WHERE created < ?", (now - self.retention,))
+
+    def _listen(self):
+        conn = self._connection()
+        # Only messages published after this process started listening are delivered
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM socketio_messages").fetchone()[0]
+        while True:
+            rows = conn.execute(
+                "SELECT id, payload FROM socketio_messages WHERE id > ? AND channel = ? ORDER BY id",
+                (last_id, self.channel)
+            ).fetchall()
+            for row_id, payload in rows:
+                last_id = row_id
+                yield payload
+            if not rows:
+                self.server.sleep(self.poll_interval)
+
+# ===================================================================
+# 2. CONFIGURATION
+# ===================================================================
+
+def socketio_options(config):
+    """
+    Returns the SocketIO.init_app() keyword arguments that select the message queue.
+    SOCKETIO_MESSAGE_QUEUE may be a 'sqlite:///' URL (handled above) or any URL
+    Flask-SocketIO understands ('redis://', 'amqp://', 'kafka://', 'zmq+tcp://').
+    Several workers without a configured queue share default_local_queue().
+    """
+    url = config.get('SOCKETIO_MESSAGE_QUEUE')
+    if not url and config.get('WORKERS', 1) > 1:
+        url = default_local_queue(config['DATABASE_NAME'])
+    channel = config.get('SOCKETIO_CHANNEL', 'hrdash')
+    if not url:
+        # Explicitly clears a manager left over from an earlier init_app() call
+        return {'client_manager': None}
+    if url.startswith('sqlite:///'):
+        return {'client_manager': SQLiteManager(url, channel=channel)}
+    return {'message_queue': url, 'channel': channel}
@@ -0,0 +1,298 @@
+# hrdash/metrics.py
+
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import g, has_app_context, request, Response
+
+# Upper bounds of the histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+# ===================================================================
+# 1. METRIC TYPES
+# ===================================================================
+
+class Histogram:
+    """A Prometheus-style cumulative histogram, with one series per label set."""
+
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+            series['counts'][bisect_left(self.buckets, value)] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                base = format_labels(self.label_names, labels)
+                cumulative = 0
+                for bound, count in zip(self.buckets, series['counts']):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{{base}le="{bound}"}} {cumulative}')
+                lines.append(f'{self.name}_bucket{{{base}le="+Inf"}} {series["count"]}')
+                lines.append(f'{self.name}_sum{{{base.rstrip(",")}}} {series["sum"]}')
+                lines.append(f'{self.name}_count{{{base.rstrip(",")}}} {series["count"]}')
+        return lines
+
+def format_labels(names, values):
+    """Formats label pairs for the exposition format, with a trailing comma for bucket lines."""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{escaped}"')
+    return "".join(f"{pair}," for pair in pairs)
+
+def render_counter(name, help_text, label_name, values):
+    """Renders a {label value: count} mapping as a Prometheus counter."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+    for label, value in sorted(values.items()):
+        lines.append(f'{name}{{{format_labels((label_name,), (label,)).rstrip(",")}}} {value}')
+    return lines
+
+REQUEST_DURATION = Histogram(
+    'hrdash_http_request_duration_seconds', 'Time spent handling HTTP requests.',
+    ('method', 'route', 'status'), LATENCY_BUCKETS)
+SQL_STATEMENTS = Histogram(
+    'hrdash_sql_statements_per_request', 'Number of SQL statements executed per request.',
+    ('method', 'route'), STATEMENT_BUCKETS)
+SQL_TIME = Histogram(
+    'hrdash_sql_time_per_request_seconds', 'Total time spent in SQL per request.',
+    ('method', 'route'), LATENCY_BUCKETS)
+SQL_SLOWEST = Histogram(
+    'hrdash_sql_slowest_statement_seconds', 'Duration of the slowest SQL statement in each request.',
+    ('method', 'route'), LATENCY_BUCKETS)
+
+# ===================================================================
+# 2. SQL INSTRUMENTATION
+# ===================================================================
+# Pooled connections are opened with InstrumentedConnection as their factory.
+# Its cursors time each statement, including the fetches that step through its
+# results, and record it on the current request's 'g.sql_statements' list.
+# Writes run on the writer thread, which records them into the list of the
+# request that submitted them (see recording_statements).
+
+# Callables given (sql, parameters) for every statement an instrumented cursor executes,
+# e.g. by plan_check.py to collect the queries the routes actually run
+STATEMENT_LISTENERS = []
+
+# Set on the writer thread while it runs an operation for an instrumented request
+_recording = threading.local()
+
+def _record_list():
+    """Returns the current request's statement list, or None outside an instrumented request."""
+    records = getattr(_recording, 'records', None)
+    if records is not None:
+        return records
+    if has_app_context():
+        return g.get('sql_statements')
+    return None
+
+def current_statement_list():
+    """The statement list of the current request, for handing to another thread; None if not recorded."""
+    return _record_list()
+
+@contextmanager
+def recording_statements(records):
+    """Records the statements this thread executes into 'records' (a request's list, or None)."""
+    previous = getattr(_recording, 'records', None)
+    _recording.records = records
+    try:
+        yield
+    finally:
+        _recording.records = previous
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """A cursor that times its statements and the fetches that step through them."""
+
+    _record = None
+
+    def _start(self, sql):
+        records = _record_list()
+        self._record = None
+        if records is not None:
+            self._record = [sql, 0.0]
+            records.append(self._record)
+
+    def _timed(self, method, *args):
+        if self._record is None:
+            return method(*args)
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._record[1] += time.perf_counter() - started
+
+    def execute(self, sql, parameters=()):
+        self._start(sql)
+        for listener in STATEMENT_LISTENERS:
+            listener(sql, parameters)
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._start(sql)
+        return self._timed(super().executemany, sql, seq_of_parameters)
+
+    def fetchone(self):
+        return self._timed(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._timed(super().fetchmany, size if size is not None else self.arraysize)
+
+    def fetchall(self):
+        return self._timed(super().fetchall)
+
+    def __next__(self):
+        return self._timed(super().__next__)
+
+class InstrumentedConnection(sqlite3.Connection):
+    """A connection whose cursors, including those behind execute(), are InstrumentedCursors."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+# ===================================================================
+# 3. FLASK INTEGRATION
+# ===================================================================
+
+def route_label():
+    """The URL rule of the current request (so '/employees/<int:employee_id>' is one series)."""
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+def init_app(app):
+    """
+    Registers request timing hooks and the Prometheus-text '/metrics' endpoint.
+    Statements slower than SLOW_QUERY_LOG_MS are logged when that setting is non-zero.
+    """
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    slow_query_seconds = (app.config.get('SLOW_QUERY_LOG_MS') or 0) / 1000.0
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        g.sql_statements = []
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('request_started', None)
+        statements = g.pop('sql_statements', None)
+        if started is None or request.endpoint == 'metrics':
+            return response
+        method, route = request.method, route_label()
+        REQUEST_DURATION.observe((method, route, str(response.status_code)), time.perf_counter() - started)
+        statements = statements or []
+        SQL_STATEMENTS.observe((method, route), len(statements))
+        SQL_TIME.observe((method, route), sum(elapsed for _, elapsed in statements))
+        SQL_SLOWEST.observe((method, route), max((elapsed for _, elapsed in statements), default=0.0))
+        if slow_query_seconds:
+            for sql, elapsed in statements:
+                if elapsed >= slow_query_seconds:
+                    app.logger.warning(f"Slow query ({elapsed * 1000:.1f} ms) in {method} {route}: {' '.join(sql.split())}")
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        """Exposes all collected metrics in the Prometheus text format."""
+        return Response("\n".join(render_metrics()) + "\n", mimetype='text/plain; version=0.0.4')
+
+def render_metrics():
+    """Collects the lines of every metric family."""
+    from extensions import broadcaster, writer
+    from cache import response_cache, employee_cache, get_data_version
+    from snapshot import employee_snapshot
+
+    lines = []
+    for histogram in (REQUEST_DURATION, SQL_STATEMENTS, SQL_TIME, SQL_SLOWEST):
+        lines.extend(histogram.render())
+
+    stats = broadcaster.stats()
+    lines.extend(render_counter('hrdash_socket_events_published_total',
+                                'Socket events published by write routes.', 'event', stats['published_by_event']))
+    lines.extend(render_counter('hrdash_socket_events_emitted_total',
+                                'Socket events emitted after coalescing, counted once per subscription room.',
+                                'event', stats['sent_by_event']))
+    for key, help_text in (('coalesced', 'Socket events dropped because a later event replaced them.'),
+                           ('events_sent', 'Socket events delivered, counted once per subscription room.'),
+                           ('messages_sent', "Batched 'changes' messages emitted.")):
+        lines.extend([f"# HELP hrdash_socket_{key}_total {help_text}",
+                      f"# TYPE hrdash_socket_{key}_total counter",
+                      f"hrdash_socket_{key}_total {stats[key]}"])
+
+    stats = writer.stats()
+    lines.extend([
+        "# HELP hrdash_write_queue_depth Write operations waiting for the writer thread.",
+        "# TYPE hrdash_write_queue_depth gauge",
+        f"hrdash_write_queue_depth {stats['depth']}",
+        "# HELP hrdash_write_queue_capacity Maximum number of waiting write operations.",
+        "# TYPE hrdash_write_queue_capacity gauge",
+        f"hrdash_write_queue_capacity {stats['max_size']}",
+    ])
+    for key, help_text in (('submitted', 'Write operations accepted onto the queue.'),
+                           ('rejected', 'Write operations refused with a 503 because the queue was full.'),
+                           ('timed_out', 'Write operations withdrawn because the writer did not start them in time.'),
+                           ('completed', 'Write operations committed.'),
+                           ('failed', 'Write operations rolled back because they raised.'),
+                           ('batches', 'Group-commit transactions run by the writer.')):
+        lines.extend([f"# HELP hrdash_write_{key}_total {help_text}",
+                      f"# TYPE hrdash_write_{key}_total counter",
+                      f"hrdash_write_{key}_total {stats[key]}"])
+
+    lines.extend([
+        "# HELP hrdash_response_cache_hits_total Read responses served from the response cache.",
+        "# TYPE hrdash_response_cache_hits_total counter",
+        f"hrdash_response_cache_hits_total {response_cache.hits}",
+        "# HELP hrdash_response_cache_misses_total Read responses that had to be computed.",
+        "# TYPE hrdash_response_cache_misses_total counter",
+        f"hrdash_response_cache_misses_total {response_cache.misses}",
+        "# HELP hrdash_employee_cache_hits_total Single-employee reads served from the employee cache.",
+        "# TYPE hrdash_employee_cache_hits_total counter",
+        f"hrdash_employee_cache_hits_total {employee_cache.hits}",
+        "# HELP hrdash_employee_cache_misses_total Single-employee reads that went to SQLite.",
+        "# TYPE hrdash_employee_cache_misses_total counter",
+        f"hrdash_employee_cache_misses_total {employee_cache.misses}",
+        "# HELP hrdash_employee_cache_rows Employee rows held in the employee cache.",
+        "# TYPE hrdash_employee_cache_rows gauge",
+        f"hrdash_employee_cache_rows {len(employee_cache)}",
+        "# HELP hrdash_data_version Current data version, bumped by every write.",
+        "# TYPE hrdash_data_version gauge",
+        f"hrdash_data_version {get_data_version()}",
+    ])
+
+    report = employee_snapshot.memory_report()
+    lines.extend([
+        "# HELP hrdash_snapshot_rows Employees held in the in-memory analytics snapshot.",
+        "# TYPE hrdash_snapshot_rows gauge",
+        f"hrdash_snapshot_rows {report.get('rows', 0)}",
+        "# HELP hrdash_snapshot_bytes Bytes allocated for the snapshot's columns.",
+        "# TYPE hrdash_snapshot_bytes gauge",
+        f"hrdash_snapshot_bytes {report.get('allocatedBytes', 0)}",
+        "# HELP hrdash_snapshot_loads_total Full loads of the snapshot from SQLite.",
+        "# TYPE hrdash_snapshot_loads_total counter",
+        f"hrdash_snapshot_loads_total {employee_snapshot.loads}",
+        "# HELP hrdash_snapshot_patches_total Committed writes applied to the snapshot.",
+        "# TYPE hrdash_snapshot_patches_total counter",
+        f"hrdash_snapshot_patches_total {employee_snapshot.patches}",
+    ])
+    return lines
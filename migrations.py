@@ -0,0 +1,311 @@
+# hrdash/migrations.py
+
+import sqlite3
+import sys
+from datetime import datetime
+
+from database import DATABASE_NAME, SEARCH_INDEX_TABLE
+from aggregates import create_aggregate_tables
+
+# ===================================================================
+# 1. MIGRATION STEPS
+# ===================================================================
+# Each step receives a cursor inside its own transaction and must only move the
+# schema forward. Steps are applied in order of their version number and each
+# version is recorded in the 'schema_version' table once it has been applied.
+
+def add_query_indexes(cursor):
+    """
+    Adds the secondary indexes used by the employee list, KPI, breakdown, turnover
+    and salary queries. Most are partial indexes over active employees only, and
+    include 'is_active' as a trailing column so aggregates can be answered from the index alone.
+    """
+    # Employee list: default order, and the department / job title filters
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_employees_active_name
+        ON employees (first_name, last_name, id) WHERE is_active = 1
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_employees_active_department_name
+        ON employees (department, first_name, last_name, id) WHERE is_active = 1
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_employees_active_job_title_name
+        ON employees (job_title, first_name, last_name, id) WHERE is_active = 1
+    """)
+    # Department breakdown
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_employees_active_department
+        ON employees (department, is_active) WHERE is_active = 1
+    """)
+    # New hires KPI and monthly hires
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_employees_start_date
+        ON employees (start_date)
+    """)
+    # Departures KPI and monthly departures
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_employees_inactive_end_date
+        ON employees (end_date, is_active) WHERE is_active = 0
+    """)
+    # Salary distribution and active headcount
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_employees_active_salary
+        ON employees (salary, is_active) WHERE is_active = 1
+    """)
+
+def add_search_index(cursor):
+    """
+    Creates the FTS5 trigram index over active employees' names and emails, plus the
+    triggers that keep it in sync on insert, update and deactivation.
+    The index is backfilled from the 'employees' table when it is created.
+    If this SQLite build has no FTS5 support, the index is skipped and search falls back to LIKE.
+    """
+    exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SEARCH_INDEX_TABLE,)
+    ).fetchone()
+    if exists:
+        return
+    try:
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE {SEARCH_INDEX_TABLE} USING fts5(
+                first_name, last_name, email,
+                content='employees', content_rowid='id', tokenize='trigram'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        print(f"Search index not created, falling back to LIKE search: {e}")
+        return
+    create_search_triggers(cursor)
+    cursor.execute(f"""
+        INSERT INTO {SEARCH_INDEX_TABLE} (rowid, first_name, last_name, email)
+        SELECT id, first_name, last_name, email FROM employees WHERE is_active = 1
+    """)
+
+def create_search_triggers(cursor):
+    """Creates the triggers that keep the search index in step with 'employees'."""
+    # Only active employees are indexed, so deactivating someone removes them from the index
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS employees_fts_insert AFTER INSERT ON employees
+        WHEN new.is_active = 1
+        BEGIN
+            INSERT INTO {SEARCH_INDEX_TABLE} (rowid, first_name, last_name, email)
+            VALUES (new.id, new.first_name, new.last_name, new.email);
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS employees_fts_delete AFTER DELETE ON employees
+        WHEN old.is_active = 1
+        BEGIN
+            INSERT INTO {SEARCH_INDEX_TABLE} ({SEARCH_INDEX_TABLE}, rowid, first_name, last_name, email)
+            VALUES ('delete', old.id, old.first_name, old.last_name, old.email);
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS employees_fts_update
+        AFTER UPDATE OF first_name, last_name, email, is_active ON employees
+        BEGIN
+            INSERT INTO {SEARCH_INDEX_TABLE} ({SEARCH_INDEX_TABLE}, rowid, first_name, last_name, email)
+            SELECT 'delete', old.id, old.first_name, old.last_name, old.email WHERE old.is_active = 1;
+            INSERT INTO {SEARCH_INDEX_TABLE} (rowid, first_name, last_name, email)
+            SELECT new.id, new.first_name, new.last_name, new.email WHERE new.is_active = 1;
+        END
+    """)
+
+# The aggregates as released in migration 3, keyed by department and job title name.
+# Kept so that step replays unchanged on new databases; migration 4 replaces them.
+NAME_KEYED_AGGREGATES = {
+    'agg_department_headcount': {'key': 'department', 'expr': "{r}.department", 'where': "{r}.is_active = 1"},
+    'agg_job_title_headcount': {'key': 'job_title', 'expr': "{r}.job_title", 'where': "{r}.is_active = 1"},
+    'agg_monthly_hires': {
+        'key': 'month',
+        'expr': "strftime('%Y-%m', {r}.start_date)",
+        'where': "strftime('%Y-%m', {r}.start_date) IS NOT NULL",
+    },
+    'agg_monthly_departures': {
+        'key': 'month',
+        'expr': "strftime('%Y-%m', {r}.end_date)",
+        'where': "{r}.is_active = 0 AND strftime('%Y-%m', {r}.end_date) IS NOT NULL",
+    },
+}
+
+def create_name_keyed_aggregates(cursor):
+    """Migration 3: trigger-maintained aggregates over the original, name-based columns."""
+    create_aggregate_tables(cursor, NAME_KEYED_AGGREGATES, "department, job_title, is_active, start_date, end_date")
+
+def normalize_lookup_columns(cursor):
+    """
+    Replaces the free-text 'department' and 'job_title' columns with integer foreign keys
+    into 'departments' and 'job_titles'. Names used by employees but missing from those
+    tables are added first. SQLite can't change a column in place, so 'employees' is
+    rebuilt; its indexes and triggers are dropped with the old table and recreated here
+    against the id columns. Row ids are kept, so the search index stays valid.
+    """
+    for table, column in (('departments', 'department'), ('job_titles', 'job_title')):
+        cursor.execute(f"INSERT OR IGNORE INTO {table} (name) SELECT DISTINCT {column} FROM employees")
+    cursor.execute("""
+        CREATE TABLE employees_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            first_name TEXT NOT NULL,
+            last_name TEXT NOT NULL,
+            email TEXT NOT NULL UNIQUE,
+            job_title_id INTEGER NOT NULL REFERENCES job_titles (id),
+            department_id INTEGER NOT NULL REFERENCES departments (id),
+            start_date TEXT NOT NULL,
+            end_date TEXT,
+            is_active BOOLEAN NOT NULL DEFAULT 1,
+            salary REAL NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO employees_new (id, first_name, last_name, email, job_title_id, department_id,
+                                   start_date, end_date, is_active, salary)
+        SELECT e.id, e.first_name, e.last_name, e.email, j.id, d.id, e.start_date, e.end_date, e.is_active, e.salary
+        FROM employees AS e
+        JOIN job_titles AS j ON j.name = e.job_title
+        JOIN departments AS d ON d.name = e.department
+    """)
+    # Keep AUTOINCREMENT from handing out ids of employees that were deleted
+    sequence = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'employees'").fetchone()
+    cursor.execute("DROP TABLE employees")
+    cursor.execute("ALTER TABLE employees_new RENAME TO employees")
+    if sequence:
+        cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'employees'", (sequence[0],))
+
+    # The indexes of migration 1, with the id columns in place of the names. The full
+    # (department_id) and (job_title_id) indexes also serve the foreign key checks made
+    # when a department or job title is deleted.
+    cursor.execute("CREATE INDEX idx_employees_active_name ON employees (first_name, last_name, id) WHERE is_active = 1")
+    cursor.execute("""
+        CREATE INDEX idx_employees_active_department_name
+        ON employees (department_id, first_name, last_name, id) WHERE is_active = 1
+    """)
+    cursor.execute("""
+        CREATE INDEX idx_employees_active_job_title_name
+        ON employees (job_title_id, first_name, last_name, id) WHERE is_active = 1
+    """)
+    cursor.execute("CREATE INDEX idx_employees_department ON employees (department_id, is_active)")
+    cursor.execute("CREATE INDEX idx_employees_job_title ON employees (job_title_id, is_active)")
+    cursor.execute("CREATE INDEX idx_employees_start_date ON employees (start_date)")
+    cursor.execute("CREATE INDEX idx_employees_inactive_end_date ON employees (end_date, is_active) WHERE is_active = 0")
+    cursor.execute("CREATE INDEX idx_employees_active_salary ON employees (salary, is_active) WHERE is_active = 1")
+
+    has_search_index = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SEARCH_INDEX_TABLE,)
+    ).fetchone()
+    if has_search_index:
+        create_search_triggers(cursor)
+
+    # The headcount aggregates are re-keyed by id; the monthly ones are unchanged
+    cursor.execute("DROP TABLE IF EXISTS agg_department_headcount")
+    cursor.execute("DROP TABLE IF EXISTS agg_job_title_headcount")
+    create_aggregate_tables(cursor)
+
+def add_write_epoch(cursor):
+    """
+    A single-row counter bumped by every committed write batch, so worker processes
+    sharing the database can tell when another process has written (see coherence.py).
+    """
+    cursor.execute("""
+        CREATE TABLE write_epoch (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            value INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("INSERT INTO write_epoch (id, value) VALUES (1, 0)")
+
+# Tables whose rows are recorded in 'change_log', and the entity name each is logged as
+CHANGE_LOGGED_TABLES = {'employees': 'employee', 'departments': 'department', 'job_titles': 'job_title'}
+
+def add_change_log(cursor):
+    """
+    Creates 'change_log' and the triggers that append to it on every insert, update and
+    delete of an employee, department or job title, so clients can fetch what changed
+    since a sequence number (GET /api/changes). AUTOINCREMENT keeps 'seq' increasing
+    even after the highest row is removed. Each row keeps only its latest entry, so the
+    log grows with the number of rows rather than the number of writes; deletions stay
+    as tombstones. Existing rows are logged as inserts, so 'since=0' is a full sync.
+    """
+    cursor.execute("""
+        CREATE TABLE change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT NOT NULL,
+            entity_id INTEGER NOT NULL,
+            deleted BOOLEAN NOT NULL DEFAULT 0,
+            UNIQUE (entity, entity_id)
+        )
+    """)
+    for table, entity in CHANGE_LOGGED_TABLES.items():
+        for event, alias, deleted in (('INSERT', 'new', 0), ('UPDATE', 'new', 0), ('DELETE', 'old', 1)):
+            # DELETE then INSERT rather than INSERT OR REPLACE: an outer INSERT OR IGNORE
+            # would override the trigger's conflict clause
+            cursor.execute(f"""
+                CREATE TRIGGER {table}_change_log_{event.lower()} AFTER {event} ON {table}
+                BEGIN
+                    DELETE FROM change_log WHERE entity = '{entity}' AND entity_id = {alias}.id;
+                    INSERT INTO change_log (entity, entity_id, deleted) VALUES ('{entity}', {alias}.id, {deleted});
+                END
+            """)
+        cursor.execute(f"INSERT INTO change_log (entity, entity_id) SELECT '{entity}', id FROM {table} ORDER BY id")
+
+# Ordered list of (version, description, step). Never renumber or edit a released step;
+# append a new one instead.
+MIGRATIONS = [
+    (1, "Add indexes for list, KPI, breakdown, turnover and salary queries", add_query_indexes),
+    (2, "Add FTS5 search index over employee names and emails", add_search_index),
+    (3, "Add trigger-maintained headcount and monthly hire/departure aggregates", create_name_keyed_aggregates),
+    (4, "Replace employee department/job title names with lookup table foreign keys", normalize_lookup_columns),
+    (5, "Add a shared write epoch for cross-process cache invalidation", add_write_epoch),
+    (6, "Add a trigger-maintained change log for delta sync", add_change_log),
+]
+
+# ===================================================================
+# 2. MIGRATION RUNNER
+# ===================================================================
+
+def get_schema_version(conn):
+    """Returns the highest applied migration version, or 0 for a fresh database."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+    """)
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+def apply_migrations(conn):
+    """
+    Applies every migration newer than the database's schema version, in order.
+    Each step runs in its own transaction together with its 'schema_version' row,
+    so a failed step leaves the database at the previous version.
+    Returns the list of versions that were applied.
+    """
+    current_version = get_schema_version(conn)
+    applied = []
+    for version, description, step in MIGRATIONS:
+        if version <= current_version:
+            continue
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN")
+            step(cursor)
+            cursor.execute(
+                "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                (version, description, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"Applied migration {version}: {description}")
+        applied.append(version)
+    return applied
+
+if __name__ == '__main__':
+    # Usage: python migrations.py [database file]
+    # Brings the database up to date. plan_check.py then verifies that the routes' queries use indexes.
+    database_name = sys.argv[1] if len(sys.argv) > 1 else DATABASE_NAME
+    with sqlite3.connect(database_name) as conn:
+        apply_migrations(conn)
+        print(f"Schema version: {get_schema_version(conn)}")
@@ -0,0 +1,134 @@
+# hrdash/plan_check.py
+
+"""
+Checks that the SQL the /api routes run is served by indexes.
+
+Usage:
+    python plan_check.py [--database hr_dashboard.db]
+
+Every route scenario of benchmark.py is requested once through the Flask test client,
+against a temporary copy of the database, with the response cache and the analytics
+snapshot disabled so that each route runs its SQL. Every statement the routes execute
+is recorded (see metrics.STATEMENT_LISTENERS) and run through EXPLAIN QUERY PLAN with
+its own parameters. A 'SCAN' step over a table or index - a pass over all of it, where
+a 'SEARCH' seeks to the matching rows - fails the check unless ALLOWED_SCANS lists it.
+Exits non-zero if any query fails.
+"""
+
+import argparse
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+from fnmatch import fnmatch
+
+# 'SCAN <table> [AS <alias>] [USING [COVERING] INDEX <index> | VIRTUAL TABLE INDEX <n>:<constraints>]'
+SCAN_STEP = re.compile(r"SCAN (\w+)(?: AS \w+)?(?: USING (?:COVERING )?INDEX (\w+)| VIRTUAL TABLE INDEX \d+:(\S*))?")
+
+# Full passes that are intended, as (scenario name prefix or None for any route, table,
+# index pattern or None for any way of reading the table, reason). Everything else must
+# be a SEARCH.
+ALLOWED_SCANS = [
+    (None, 'departments', None, "lookup tables are small and loaded whole into the lookup cache"),
+    (None, 'job_titles', None, "lookup tables are small and loaded whole into the lookup cache"),
+    (None, 'agg_*', None, "aggregate tables hold one row per group"),
+    (None, 'json_each', None, "the list of ids a request passes in"),
+    ('GET /employees', 'employees', 'idx_employees_active_name',
+     "walks active employees in list order and stops at the page's LIMIT"),
+    ('GET /employees', 'employees', 'idx_employees_active_*',
+     "the total count is one pass over an active-only index; include_total=false skips it"),
+    ('GET /employees/export', 'employees', None, "the export streams every matching employee in id order"),
+    ('GET /analytics/salary-by-group', 'employees', None,
+     "per-group statistics rank every active salary (the SQL fallback of the snapshot)"),
+]
+
+def is_allowed(scenario, table, index):
+    return any((prefix is None or scenario.startswith(prefix)) and fnmatch(table, table_pattern)
+               and (index_pattern is None or (index is not None and fnmatch(index, index_pattern)))
+               for prefix, table_pattern, index_pattern, _ in ALLOWED_SCANS)
+
+def collect_statements(app, scenarios):
+    """
+    Requests each scenario once and returns {(scenario name, sql): parameters} for every
+    SELECT, INSERT, UPDATE or DELETE the routes executed, including on the writer thread.
+    """
+    import metrics
+    statements = {}
+    current = [None]
+
+    def record(sql, parameters):
+        if sql.lstrip().split(None, 1)[0].upper() in ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE'):
+            statements.setdefault((current[0], sql), parameters)
+
+    client = app.test_client()
+    metrics.STATEMENT_LISTENERS.append(record)
+    try:
+        for name, request_fn in scenarios:
+            current[0] = name
+            response = request_fn(client, 0)
+            response.get_data()
+            if response.status_code >= 400:
+                print(f"WARNING: {name} returned {response.status_code}", file=sys.stderr)
+    finally:
+        metrics.STATEMENT_LISTENERS.remove(record)
+    return statements
+
+def check_plans(conn, statements):
+    """Returns [(scenario name, sql, plan step)] for every SCAN step that ALLOWED_SCANS doesn't list."""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    tables.add('json_each')
+    failures = []
+    for (scenario, sql), parameters in statements.items():
+        for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall():
+            detail = row[3]
+            match = SCAN_STEP.match(detail)
+            # 'SCAN (subquery-1)' and similar read an intermediate result, not a table
+            if match is None or match.group(1) not in tables:
+                continue
+            # A virtual table given constraints (e.g. an FTS5 MATCH) looks the rows up itself
+            if match.group(3):
+                continue
+            if not is_allowed(scenario, match.group(1), match.group(2)):
+                failures.append((scenario, sql, detail))
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that every query the /api routes run uses an index.")
+    parser.add_argument('--database', default='hr_dashboard.db', help="Database to check (a temporary copy is used)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='hrdash-plans-')
+    db_path = os.path.join(workdir, os.path.basename(args.database))
+    shutil.copyfile(args.database, db_path)
+    # The database module reads its file name from the config at import time
+    os.environ['HRDASH_DATABASE'] = db_path
+    from app import create_app
+    from benchmark import build_scenarios, sample_values
+    from snapshot import employee_snapshot
+    app = create_app('production')
+    app.config['RESPONSE_CACHE_ENABLED'] = False
+    employee_snapshot.enabled = False
+
+    try:
+        reads, writes = build_scenarios(sample_values(db_path))
+        statements = collect_statements(app, reads + writes)
+        with sqlite3.connect(db_path) as conn:
+            failures = check_plans(conn, statements)
+    finally:
+        from database import close_db_pools
+        from extensions import writer
+        writer.stop()
+        close_db_pools()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for scenario, sql, detail in failures:
+        print(f"FULL SCAN in {scenario}: {detail}\n    {' '.join(sql.split())}")
+    if failures:
+        return 1
+    print(f"All {len(statements)} statements run by {len({s for s, _ in statements})} route scenarios use an index.")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+# hrdash/responses.py
+
+import json
+import zlib
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; without it responses use the standard library encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it only gzip is offered
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5   # Levels above ~6 cost far more CPU than they save bytes on dynamic responses
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/plain', 'text/csv', 'application/x-ndjson')
+
+# ===================================================================
+# 1. JSON ENCODING
+# ===================================================================
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask's JSON provider with a faster encoder: orjson when it is installed, otherwise
+    the standard library without key sorting or separator whitespace. Keys keep their
+    insertion order. Debug apps still get indented output, as with Flask's provider.
+    """
+
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+        kwargs.setdefault('default', self.default)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        if kwargs.get('indent') is None:
+            kwargs.setdefault('separators', (',', ':'))
+        return json.dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        if orjson is not None:
+            option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+            body = orjson.dumps(obj, default=self.default, option=option)
+        else:
+            body = self.dumps(obj, indent=2 if indent else None)
+        return self._app.response_class(body + (b"\n" if isinstance(body, bytes) else "\n"), mimetype=self.mimetype)
+
+# ===================================================================
+# 2. RESPONSE COMPRESSION
+# ===================================================================
+
+def choose_encoding(accept_encoding):
+    """Picks 'br' or 'gzip' from an Accept-Encoding header (honouring q=0), or None."""
+    offered = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        offered[name.strip().lower()] = quality
+    for encoding in (('br', 'gzip') if brotli is not None else ('gzip',)):
+        if offered.get(encoding, offered.get('*', 0)) > 0:
+            return encoding
+    return None
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+    return compressor.compress(body) + compressor.flush()
+
+def init_app(app):
+    """
+    Installs the fast JSON provider and compresses responses of at least
+    COMPRESSION_MIN_SIZE bytes with the best encoding the client accepts.
+    """
+    app.json = FastJSONProvider(app)
+    if not app.config.get('COMPRESSION_ENABLED', True):
+        return
+    min_size = app.config.get('COMPRESSION_MIN_SIZE', 1024)
+
+    @app.after_request
+    def compress_response(response):
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(request.headers.get('Accept-Encoding', ''))
+        if encoding is None or response.content_length is None or response.content_length < min_size:
+            return response
+
+        # Cached responses (see cache.cached_response) keep their compressed variants
+        entry = getattr(response, 'cache_entry', None)
+        body = entry.compressed.get(encoding) if entry is not None else None
+        if body is None:
+            body = compress(response.get_data(), encoding)
+            if entry is not None:
+                entry.compressed[encoding] = body
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        # The compressed bytes differ from the ones the strong ETag was computed for
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
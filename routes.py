@@ -1,17 +1,28 @@
 # hrdash/routes.py
 
-from flask import request as flask_request, jsonify, Blueprint, current_app
-from datetime import datetime, timedelta
+from flask import request as flask_request, jsonify, Blueprint, current_app, Response, stream_with_context
+from datetime import datetime, timedelta, date
 import sqlite3
 import re
-from database import get_db_connection
-from flask_socketio import emit
+import base64
+import csv
+import io
+import json
+import math
+import zlib
+from database import get_db_connection, search_index_available, SEARCH_INDEX_TABLE
+from flask_socketio import emit, join_room, leave_room, rooms as joined_rooms
+from cache import cached_response, bump_data_version, employee_cache
 from extensions import socketio
 from flask import request
 
 # Import the socketio instance from the new extensions.py file
 # This is the key fix that resolves the circular import error.
-from extensions import socketio
+from extensions import socketio, broadcaster, writer
+from broadcaster import BROADCAST_ROOMS, subscription_room, subscribed_rooms
+from writer import WriteUnavailable
+from lookups import LOOKUP_FIELDS, lookup_cache, lookup_id_sql, ensure_lookup_names
+from snapshot import get_snapshot, patch_snapshot, patch_snapshot_rows, SNAPSHOT_EXPRESSIONS
 
 # Create a Blueprint for all our REST API routes
 api_bp = Blueprint('api', __name__)
@@ -19,7 +30,7 @@ api_bp = Blueprint('api', __name__)
 # --- Helper Functions for Validation ---
 def is_valid_email(email):
     """Simple regex for validating an email address."""
-    if email:
+    if email and isinstance(email, str):
         return re.match(r"[^@]+@[^@]+\.[^@]+", email)
     return False
 
@@ -31,10 +42,680 @@ def is_valid_date(date_string):
     except (ValueError, TypeError):
         return False
 
+def parse_salary(value):
+    """Returns a salary given as a number or numeric text as a float, or None if it isn't one."""
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        return None
+    try:
+        salary = float(value)
+    except ValueError:
+        return None
+    return salary if math.isfinite(salary) else None
+
+def is_valid_name(value):
+    """Checks that a name (e.g. of a department or job title) is non-blank text."""
+    return isinstance(value, str) and value.strip() != ''
+
+EMPLOYEE_NAME_FIELDS = ('first_name', 'last_name', 'job_title', 'department')
+
+def employee_field_error(data):
+    """Returns an error message for the first invalid name or salary in 'data', or None."""
+    for field in EMPLOYEE_NAME_FIELDS:
+        if field in data and not is_valid_name(data[field]):
+            return f'{field} must be a non-empty name'
+    if 'salary' in data and parse_salary(data['salary']) is None:
+        return 'salary must be a number'
+    return None
+
+def integrity_error_response(error):
+    """Answers a failed constraint: a duplicate email is a 409, any other violation a 400."""
+    if 'employees.email' in str(error):
+        return jsonify({'error': 'An employee with this email already exists'}), 409
+    return jsonify({'error': f'Invalid employee data ({error})'}), 400
+
+# Trigram FTS5 needs at least three characters to match anything
+MIN_INDEXED_SEARCH_LENGTH = 3
+
+def build_search_filter(conn, search_term, active_only=True):
+    """
+    Builds the WHERE fragment, parameters, and ranking expression for an employee search.
+    Uses the FTS5 trigram index when it exists and the term is long enough, otherwise
+    falls back to a LIKE scan (e.g. for databases created before the index existed).
+    The index only covers active employees, so searches that include inactive ones
+    ('active_only' False) always use the LIKE scan.
+    Prefix matches on name or email rank above matches further inside the text.
+    """
+    prefix = f"{search_term}%"
+    rank = "CASE WHEN first_name LIKE ? OR last_name LIKE ? OR email LIKE ? THEN 0 ELSE 1 END"
+    rank_params = [prefix, prefix, prefix]
+
+    if active_only and len(search_term) >= MIN_INDEXED_SEARCH_LENGTH and search_index_available(conn):
+        # Quote the term as a single FTS5 phrase so user input can't inject query syntax
+        phrase = '"' + search_term.replace('"', '""') + '"'
+        clause = f" AND id IN (SELECT rowid FROM {SEARCH_INDEX_TABLE} WHERE {SEARCH_INDEX_TABLE} MATCH ?)"
+        return clause, [phrase], rank, rank_params
+
+    term = f"%{search_term}%"
+    clause = " AND (first_name LIKE ? OR last_name LIKE ? OR email LIKE ?)"
+    return clause, [term, term, term], rank, rank_params
+
+# Values accepted by the 'status' filter, mapped to their WHERE condition
+EMPLOYEE_STATUS_FILTERS = {
+    'active': "is_active = 1",
+    'inactive': "is_active = 0",
+    'all': "1 = 1",
+}
+
+def build_employee_filters(conn, search_term, department, job_title, status='active'):
+    """
+    Builds the FROM/WHERE clause and parameters for the employee list filters.
+    Returns (base query, params, rank expression or None, rank params); the rank
+    expression orders search results by match quality (see build_search_filter).
+    """
+    base_query = f"FROM employees WHERE {EMPLOYEE_STATUS_FILTERS[status]}"
+    params = []
+    rank, rank_params = None, []
+    if search_term:
+        clause, search_params, rank, rank_params = build_search_filter(conn, search_term, status == 'active')
+        base_query += clause
+        params.extend(search_params)
+    # Names are matched through their lookup ids; an unknown name matches nothing (id = NULL)
+    if department:
+        base_query += " AND department_id = ?"
+        params.append(lookup_cache.id_of('department', department))
+    if job_title:
+        base_query += " AND job_title_id = ?"
+        params.append(lookup_cache.id_of('job_title', job_title))
+    return base_query, params, rank, rank_params
+
+# --- Helper Functions for Employee Rows ---
+# Columns of an employee as the API presents them, in export order
+EMPLOYEE_COLUMNS = ['id', 'first_name', 'last_name', 'email', 'job_title', 'department',
+                    'start_date', 'end_date', 'is_active', 'salary']
+
+# Columns of an 'employees' row, in table order
+EMPLOYEE_ROW_COLUMNS = ['id', 'first_name', 'last_name', 'email', 'job_title_id', 'department_id',
+                        'start_date', 'end_date', 'is_active', 'salary']
+# Ends an employee INSERT or UPDATE so it returns the rows it wrote: their columns, then
+# their snapshot columns. The write then needs no SELECT to check for or re-read a row.
+EMPLOYEE_RETURNING = f"RETURNING {', '.join(EMPLOYEE_ROW_COLUMNS)}, {SNAPSHOT_EXPRESSIONS}"
+
+class EmployeeNotFound(LookupError):
+    """Raised inside a write operation so its savepoint also undoes any lookup names it added."""
+
+def store_written_employees(rows):
+    """
+    Splits rows returned through EMPLOYEE_RETURNING into employee dicts, which are returned,
+    and snapshot rows. The snapshot and the employee cache are updated from them once the
+    write commits. Call from inside a writer operation.
+    """
+    width = len(EMPLOYEE_ROW_COLUMNS)
+    employees = [dict(zip(EMPLOYEE_ROW_COLUMNS, row[:width])) for row in rows]
+    patch_snapshot_rows([tuple(row[width:]) for row in rows])
+    writer.on_commit(lambda: employee_cache.put(employees))
+    return employees
+
+def employee_to_dict(row):
+    """Converts an 'employees' row to its API form, adding the department and job title names."""
+    employee = dict(row)
+    employee['department'] = lookup_cache.name_of('department', employee['department_id'])
+    employee['job_title'] = lookup_cache.name_of('job_title', employee['job_title_id'])
+    return employee
+
+# Fields the employee list can return (see 'fields'); its default is all of them
+EMPLOYEE_LIST_FIELDS = EMPLOYEE_COLUMNS + ['department_id', 'job_title_id']
+EMPLOYEE_LIST_FORMATS = ('rows', 'columnar')
+
+def parse_employee_fields(args):
+    """Reads the comma-separated 'fields' projection. Returns (fields, error message)."""
+    value = args.get('fields', '', type=str)
+    if not value:
+        return list(EMPLOYEE_LIST_FIELDS), None
+    fields = list(dict.fromkeys(f.strip() for f in value.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in EMPLOYEE_LIST_FIELDS]
+    if not fields or unknown:
+        return None, f"fields must be a comma-separated list of: {', '.join(EMPLOYEE_LIST_FIELDS)}"
+    return fields, None
+
+def field_column(field):
+    """The employees column an API field is read from; names come from their lookup id."""
+    return LOOKUP_FIELDS[field][1] if field in LOOKUP_FIELDS else field
+
+def shape_employees(rows, columns, fields, columnar=False):
+    """
+    Builds the 'data' of an employee list from rows of the SELECTed 'columns': a list of
+    objects holding 'fields', or with 'columnar' one array per field, so each field
+    name is sent once per page instead of once per row.
+    """
+    names = {}
+    def name_of(field, row_id):
+        key = (field, row_id)
+        if key not in names:
+            names[key] = lookup_cache.name_of(field, row_id)
+        return names[key]
+
+    index = {column: i for i, column in enumerate(columns)}
+    getters = []
+    for field in fields:
+        position = index[field_column(field)]
+        if field in LOOKUP_FIELDS:
+            getters.append(lambda row, f=field, p=position: name_of(f, row[p]))
+        else:
+            getters.append(lambda row, p=position: row[p])
+    if columnar:
+        return {field: [get(row) for row in rows] for field, get in zip(fields, getters)}
+    pairs = list(zip(fields, getters))
+    return [{field: get(row) for field, get in pairs} for row in rows]
+
+# --- Helper Functions for Keyset Pagination ---
+def encode_cursor(values):
+    """Encodes the sort key of the last row on a page as an opaque URL-safe token."""
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token, expected_length):
+    """Decodes a cursor token back into its sort key, or returns None if it is malformed."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != expected_length:
+        return None
+    # The values are bound as SQL parameters, which must be scalars
+    if not all(value is None or isinstance(value, (str, int, float)) for value in values):
+        return None
+    return values
+
+# --- Helper Functions for Dashboard ---
+MAX_SUMMARY_MONTHS = 120
+
+def compute_kpis(conn):
+    """Returns the dashboard KPIs: active headcount plus hires and departures in the last 30 days."""
+    # Headcount comes from the trigger-maintained aggregate (see aggregates.py)
+    total_employees = conn.execute('SELECT COALESCE(SUM(count), 0) FROM agg_department_headcount').fetchone()[0]
+    thirty_days_ago = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+    new_hires = conn.execute('SELECT COUNT(*) FROM employees WHERE start_date >= ?', (thirty_days_ago,)).fetchone()[0]
+    departures = conn.execute('SELECT COUNT(*) FROM employees WHERE is_active = 0 AND end_date >= ?', (thirty_days_ago,)).fetchone()[0]
+    return {"totalEmployees": total_employees, "newHires": new_hires, "departures": departures}
+
+def read_department_breakdown(conn):
+    """Returns [{'department', 'count'}] for departments with active employees, ordered by name."""
+    rows = conn.execute("SELECT department_id, count FROM agg_department_headcount WHERE count > 0").fetchall()
+    breakdown = [{'department': lookup_cache.name_of('department', row['department_id']), 'count': row['count']}
+                 for row in rows]
+    return sorted(breakdown, key=lambda row: row['department'] or '')
+
+# --- Helper Functions for Time Series ---
+# SQL expression (over a date column) and Python function (over a date) giving the
+# period key for each granularity; the two must produce identical strings.
+GRANULARITIES = {
+    'day': ("date({col})", lambda d: d.isoformat()),
+    # Monday on or before the date
+    'week': ("date({col}, '-6 days', 'weekday 1')", lambda d: (d - timedelta(days=d.weekday())).isoformat()),
+    'month': ("strftime('%Y-%m', {col})", lambda d: f"{d.year:04d}-{d.month:02d}"),
+    'quarter': ("strftime('%Y', {col}) || '-Q' || ((CAST(strftime('%m', {col}) AS INTEGER) + 2) / 3)",
+                lambda d: f"{d.year:04d}-Q{(d.month + 2) // 3}"),
+}
+MAX_SERIES_DAYS = 366 * 20
+
+def parse_time_range(args):
+    """
+    Reads 'from', 'to' (YYYY-MM-DD, inclusive) and 'granularity' from the query string.
+    Defaults to the last year by month. Returns (from, to, granularity, error message).
+    """
+    granularity = args.get('granularity', 'month', type=str).lower()
+    if granularity not in GRANULARITIES:
+        return None, None, None, f"granularity must be one of: {', '.join(GRANULARITIES)}"
+    to_arg = args.get('to', '', type=str)
+    from_arg = args.get('from', '', type=str)
+    if (to_arg and not is_valid_date(to_arg)) or (from_arg and not is_valid_date(from_arg)):
+        return None, None, None, 'Invalid date format. Use YYYY-MM-DD.'
+    end = datetime.strptime(to_arg, '%Y-%m-%d').date() if to_arg else date.today()
+    start = datetime.strptime(from_arg, '%Y-%m-%d').date() if from_arg else end - timedelta(days=365)
+    if start > end:
+        return None, None, None, "'from' must not be after 'to'"
+    if (end - start).days > MAX_SERIES_DAYS:
+        return None, None, None, 'Date range is too long'
+    return start, end, granularity, None
+
+def period_keys(start, end, granularity):
+    """Returns the ordered period keys covering start..end, including periods with no events."""
+    key_of = GRANULARITIES[granularity][1]
+    keys = []
+    day = start
+    while day <= end:
+        key = key_of(day)
+        if not keys or keys[-1] != key:
+            keys.append(key)
+        day += timedelta(days=1)
+    return keys
+
+def count_events_by_period(conn, start, end, granularity, by_department=False):
+    """
+    Counts hires and departures per period (and department) between start and end.
+    Both sides filter on the raw date column so the start_date / end_date indexes apply;
+    the period expression is only evaluated on rows inside the range.
+    Returns rows of (period, department id or '', hires, departures) ordered by period.
+    Uses the in-memory snapshot instead when it is enabled.
+    """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.events_by_period(start, end, granularity, GRANULARITIES[granularity][1], by_department)
+    hire_period = GRANULARITIES[granularity][0].format(col='start_date')
+    exit_period = GRANULARITIES[granularity][0].format(col='end_date')
+    group = "department_id" if by_department else "''"
+    return conn.execute(f"""
+        SELECT period, dept, SUM(hires), SUM(departures) FROM (
+            SELECT {hire_period} AS period, {group} AS dept, COUNT(*) AS hires, 0 AS departures
+            FROM employees WHERE start_date >= ? AND start_date <= ?
+            GROUP BY period, dept
+            UNION ALL
+            SELECT {exit_period} AS period, {group} AS dept, 0 AS hires, COUNT(*) AS departures
+            FROM employees WHERE is_active = 0 AND end_date >= ? AND end_date <= ?
+            GROUP BY period, dept
+        )
+        GROUP BY period, dept
+        ORDER BY period
+    """, (start.isoformat(), end.isoformat(), start.isoformat(), end.isoformat())).fetchall()
+
+# --- Helper Functions for Salary Analytics ---
+# Lower edges of the default salary ranges, in Rupees
+DEFAULT_SALARY_BOUNDS = [0, 300001, 600001, 1000001, 1500001]
+MAX_SALARY_BUCKETS = 100
+
+def parse_salary_filters(args):
+    """Builds the WHERE clause and parameters shared by the salary analytics queries."""
+    where = "WHERE is_active = 1"
+    params = []
+    department = args.get('department', '', type=str)
+    job_title = args.get('job_title', '', type=str)
+    if department:
+        where += " AND department_id = ?"
+        params.append(lookup_cache.id_of('department', department))
+    if job_title:
+        where += " AND job_title_id = ?"
+        params.append(lookup_cache.id_of('job_title', job_title))
+    return where, params
+
+def salary_range_label(lower, upper):
+    """Formats a salary range in lakhs of Rupees; an open-ended last range has no upper bound."""
+    if upper is None:
+        return f"₹{lower/100000:.1f}L+"
+    return f"₹{lower/100000:.1f}L - ₹{upper/100000:.1f}L"
+
+def snapshot_salary_filters(args):
+    """The department and job title filters as lookup ids for the snapshot; an unknown name matches nothing."""
+    filters = []
+    for field in ('department', 'job_title'):
+        name = args.get(field, '', type=str)
+        filters.append((lookup_cache.id_of(field, name) or -1) if name else None)
+    return filters
+
+def compute_salary_histogram(conn, args):
+    """
+    Counts active salaries per bucket in a single pass over the salary index, or over the
+    in-memory snapshot when it is enabled.
+    Buckets come from 'bounds' (comma-separated ascending lower edges, the last bucket is
+    open-ended) or 'buckets' (that many equal-width buckets between the min and max salary),
+    defaulting to DEFAULT_SALARY_BOUNDS. Each bucket also carries its min, max and sum, so
+    overall statistics can be derived without another scan.
+    Returns (buckets, error message).
+    """
+    bounds_arg = args.get('bounds', '', type=str)
+    bucket_count = args.get('buckets', None, type=int)
+    if bucket_count is not None:
+        if not 1 <= bucket_count <= MAX_SALARY_BUCKETS:
+            return None, f"buckets must be between 1 and {MAX_SALARY_BUCKETS}"
+        bounds = None
+    else:
+        try:
+            bounds = [float(b) for b in bounds_arg.split(',')] if bounds_arg else list(DEFAULT_SALARY_BOUNDS)
+        except ValueError:
+            return None, "bounds must be a comma-separated list of numbers"
+        if not 1 <= len(bounds) <= MAX_SALARY_BUCKETS:
+            return None, f"bounds must contain between 1 and {MAX_SALARY_BUCKETS} values"
+        if any(a >= b for a, b in zip(bounds, bounds[1:])):
+            return None, "bounds must be strictly ascending"
+
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        department, job_title = snapshot_salary_filters(args)
+        bounds, upper_bounds, stats = snapshot.salary_histogram(bounds, bucket_count, department, job_title)
+        by_bucket = {i: (i,) + stat for i, stat in enumerate(stats) if stat}
+    else:
+        bounds, upper_bounds, by_bucket = query_salary_histogram(conn, args, bounds, bucket_count)
+        if bounds is None:
+            return [], None
+
+    buckets = []
+    for i, (lower, upper) in enumerate(zip(bounds, upper_bounds)):
+        row = by_bucket.get(i)
+        buckets.append({
+            "range": salary_range_label(lower, upper),
+            "lower": lower,
+            "upper": upper,
+            "count": row[1] if row else 0,
+            "min": row[2] if row else None,
+            "max": row[3] if row else None,
+            "sum": row[4] if row else 0,
+        })
+    return buckets, None
+
+def query_salary_histogram(conn, args, bounds, bucket_count):
+    """
+    The SQL side of compute_salary_histogram. Returns (lower edges, upper edges,
+    {bucket: (bucket, count, min, max, sum)}), or Nones when there are no salaries
+    to divide into 'bucket_count' buckets.
+    """
+    where, params = parse_salary_filters(args)
+    if bucket_count is not None:
+        # MIN and MAX as separate subqueries are each a single index seek
+        low, high = conn.execute(
+            f"SELECT (SELECT MIN(salary) FROM employees {where}), (SELECT MAX(salary) FROM employees {where})",
+            params + params
+        ).fetchone()
+        if low is None:
+            return None, None, None
+        width = (high - low) / bucket_count or 1
+        bounds = [low + i * width for i in range(bucket_count)]
+        upper_bounds = bounds[1:] + [high]
+        bucket_expr = "MIN(CAST((salary - ?) / ? AS INTEGER), ?)"
+        bucket_params = [low, width, bucket_count - 1]
+    else:
+        upper_bounds = bounds[1:] + [None]
+        # Highest edge first, so each salary lands in the bucket whose lower edge it passed last
+        cases = " ".join(f"WHEN salary >= ? THEN {i}" for i in reversed(range(len(bounds))))
+        bucket_expr = f"CASE {cases} END"
+        bucket_params = list(reversed(bounds))
+        where += " AND salary >= ?"
+        params = params + [bounds[0]]
+
+    rows = conn.execute(
+        f"SELECT {bucket_expr} AS bucket, COUNT(*), MIN(salary), MAX(salary), SUM(salary) "
+        f"FROM employees {where} GROUP BY bucket",
+        bucket_params + params
+    ).fetchall()
+    return bounds, upper_bounds, {row[0]: tuple(row) for row in rows}
+
+def compute_salary_percentiles(conn, args, lowest, total, percentiles):
+    """
+    Returns {percentile: salary} over the 'total' salaries at or above 'lowest', using the
+    nearest-rank method in one ordered pass that only hands the selected rows back to Python.
+    The median averages the two middle salaries when the count is even.
+    """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        department, job_title = snapshot_salary_filters(args)
+        return snapshot.salary_percentiles(percentiles, lowest, department, job_title)
+    where, params = parse_salary_filters(args)
+    where += " AND salary >= ?"
+    params.append(lowest)
+    ranks = {}
+    for p in percentiles:
+        if p == 50 and total % 2 == 0:
+            ranks[p] = (total // 2, total // 2 + 1)
+        else:
+            rank = max(1, -(-p * total // 100))  # Ceiling of p% of the total
+            ranks[p] = (rank,)
+    wanted = sorted({r for pair in ranks.values() for r in pair})
+    placeholders = ", ".join("?" for _ in wanted)
+    rows = conn.execute(
+        f"SELECT rn, salary FROM (SELECT salary, ROW_NUMBER() OVER (ORDER BY salary) AS rn "
+        f"FROM employees {where}) WHERE rn IN ({placeholders})",
+        params + wanted
+    ).fetchall()
+    salary_at = dict(rows)
+    return {p: sum(salary_at[r] for r in pair) / len(pair) for p, pair in ranks.items()}
+
+SALARY_GROUP_FIELDS = ('department', 'job_title')
+
+def query_salary_by_group(conn, fields, percentiles):
+    """
+    The SQL equivalent of EmployeeSnapshot.salary_by_group: one window-function pass that
+    only returns each group's first, last, middle and percentile rows.
+    """
+    group = ", ".join(f"{field}_id" for field in fields)
+    wanted = " OR ".join(["rn = 1", "rn = cnt", "rn = cnt / 2", "rn = cnt / 2 + 1"] +
+                         ["rn = MAX(1, (? * cnt + 99) / 100)" for _ in percentiles])
+    rows = conn.execute(f"""
+        SELECT {group}, rn, cnt, total, salary FROM (
+            SELECT {group}, salary,
+                   ROW_NUMBER() OVER (PARTITION BY {group} ORDER BY salary) AS rn,
+                   COUNT(*) OVER (PARTITION BY {group}) AS cnt,
+                   SUM(salary) OVER (PARTITION BY {group}) AS total
+            FROM employees WHERE is_active = 1
+        ) WHERE {wanted}
+        ORDER BY {group}, rn
+    """, list(percentiles)).fetchall()
+
+    by_group = {}
+    for row in rows:
+        key = tuple(row[:len(fields)])
+        rn, count, total, salary = row[len(fields):]
+        entry = by_group.setdefault(key, {'count': count, 'total': total, 'at': {}})
+        entry['at'][rn] = salary
+    groups = []
+    for key, entry in by_group.items():
+        count, at = entry['count'], entry['at']
+        group = dict(zip(fields, key))
+        group.update({'count': count, 'min': at[1], 'max': at[count], 'mean': entry['total'] / count})
+        for p in percentiles:
+            if p == 50 and count % 2 == 0:
+                group[f"p{p}"] = (at[count // 2] + at[count // 2 + 1]) / 2
+            else:
+                group[f"p{p}"] = at[max(1, -(-p * count // 100))]
+        groups.append(group)
+    return groups
+
+# --- Helper Functions for Bulk Import ---
+EMPLOYEE_REQUIRED_FIELDS = ['first_name', 'last_name', 'email', 'job_title', 'department', 'start_date', 'salary']
+EMPLOYEE_TEXT_FIELDS = ['first_name', 'last_name', 'email', 'job_title', 'department', 'start_date']
+# Takes the job title and department by name (see ensure_lookup_names)
+EMPLOYEE_INSERT_SQL = ("INSERT INTO employees (first_name, last_name, email, job_title_id, department_id, start_date, salary, is_active) "
+                       f"VALUES (?, ?, ?, {lookup_id_sql('job_title')}, {lookup_id_sql('department')}, ?, ?, ?)")
+
+def iter_import_records(stream, data_format):
+    """
+    Yields (record number, dict or None, parse error) for each record of an uploaded
+    CSV (with a header row) or NDJSON body, reading the stream incrementally.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if data_format == 'csv':
+        for number, row in enumerate(csv.DictReader(text), start=1):
+            yield number, row, None
+        return
+    number = 0
+    for line in text:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield number, None, 'Invalid JSON'
+            continue
+        if not isinstance(record, dict):
+            yield number, None, 'Each line must be a JSON object'
+            continue
+        yield number, record, None
+
+def validate_import_record(record):
+    """
+    Applies the add_employee validation to one imported record.
+    Returns (parameter tuple for EMPLOYEE_INSERT_SQL, None) or (None, error message).
+    """
+    if any(record.get(field) in (None, '') for field in EMPLOYEE_REQUIRED_FIELDS):
+        return None, 'Missing required fields'
+    # NDJSON values can be any JSON type
+    wrong_type = [field for field in EMPLOYEE_TEXT_FIELDS if not isinstance(record[field], str)]
+    if wrong_type:
+        return None, f"{', '.join(wrong_type)} must be text"
+    if not is_valid_email(record['email']):
+        return None, 'Invalid email format'
+    if not is_valid_date(record['start_date']):
+        return None, 'Invalid date format. Use YYYY-MM-DD.'
+    salary = parse_salary(record['salary'])
+    if salary is None:
+        return None, 'Invalid salary'
+    is_active = record.get('is_active', 1)
+    if isinstance(is_active, str):
+        is_active = 0 if is_active.strip().lower() in ('0', 'false', 'no') else 1
+    elif not isinstance(is_active, (bool, int, float)) and is_active is not None:
+        return None, 'Invalid is_active'
+    return (record['first_name'], record['last_name'], record['email'], record['job_title'],
+            record['department'], record['start_date'], salary, 1 if is_active else 0), None
+
+def insert_import_batch(conn, batch, report):
+    """
+    Inserts a batch of (record number, params) with executemany. Runs on the writer
+    thread, which commits it. If any row violates a constraint (e.g. a duplicate email)
+    the batch is rolled back to a savepoint and retried row by row so only the
+    offending rows are rejected. 'imported' is only counted once the batch has committed.
+    """
+    ensure_lookup_names(conn, 'job_title', [params[3] for _, params in batch])
+    ensure_lookup_names(conn, 'department', [params[4] for _, params in batch])
+    # New rows get ids above the current maximum, which is how the snapshot finds them
+    last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM employees").fetchone()[0]
+    conn.execute("SAVEPOINT import_batch")
+    try:
+        conn.executemany(EMPLOYEE_INSERT_SQL, [params for _, params in batch])
+        conn.execute("RELEASE import_batch")
+        inserted = len(batch)
+    except sqlite3.IntegrityError:
+        conn.execute("ROLLBACK TO import_batch")
+        conn.execute("RELEASE import_batch")
+        inserted = 0
+        for number, params in batch:
+            try:
+                conn.execute(EMPLOYEE_INSERT_SQL, params)
+                inserted += 1
+            except sqlite3.IntegrityError as e:
+                add_import_error(report, number, 'An employee with this email already exists'
+                                 if 'employees.email' in str(e) else f'Invalid employee data ({e})')
+    patch_snapshot(conn, "id > ?", (last_id,))
+
+    def count_imported():
+        report['imported'] += inserted
+    writer.on_commit(count_imported)
+
+def write_unavailable_response(**details):
+    """The 503 sent when the write queue is full or a queued write timed out."""
+    response = jsonify({'error': 'The server is busy processing other changes. Please retry shortly.', **details})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(current_app.config.get('WRITE_RETRY_AFTER', 1))
+    return response
+
+def add_import_error(report, number, message):
+    """Records a rejected row, keeping at most IMPORT_MAX_ERRORS details so memory stays bounded."""
+    report['failed'] += 1
+    if len(report['errors']) < current_app.config.get('IMPORT_MAX_ERRORS', 1000):
+        report['errors'].append({'row': number, 'error': message})
+    else:
+        report['errorsTruncated'] = True
+
+# --- Helper Functions for Departments and Job Titles ---
+def insert_lookup(conn, table, name):
+    """Adds a department or job title on the writer thread; the lookup cache is refreshed on commit."""
+    row_id = conn.execute(f"INSERT INTO {table} (name) VALUES (?)", (name,)).lastrowid
+    writer.on_commit(lookup_cache.invalidate)
+    return row_id
+
+def delete_lookup(conn, table, row_id):
+    """Deletes a department or job title; raises IntegrityError while employees still reference it."""
+    conn.execute(f"DELETE FROM {table} WHERE id = ?", (row_id,))
+    writer.on_commit(lookup_cache.invalidate)
+
+# --- Helper Functions for Batch Updates ---
+# Fields a batch may change; identity fields such as email stay per-employee
+BATCH_UPDATE_FIELDS = ('job_title', 'department', 'salary', 'start_date')
+BATCH_FILTER_FIELDS = ('search', 'department', 'job_title', 'status')
+
+def parse_batch_target(data):
+    """
+    Validates the 'ids' or 'filter' part of a batch request body.
+    Returns (ids, filters, error message); exactly one of ids and filters is set.
+    """
+    max_ids = current_app.config.get('BATCH_MAX_EMPLOYEES', 10000)
+    ids, filters = data.get('ids'), data.get('filter')
+    if (ids is None) == (filters is None):
+        return None, None, "Provide either 'ids' or 'filter'"
+    if ids is not None:
+        if not isinstance(ids, list) or not ids or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            return None, None, "'ids' must be a non-empty list of employee IDs"
+        if len(ids) > max_ids:
+            return None, None, f"At most {max_ids} employees can be changed in one batch"
+        return list(dict.fromkeys(ids)), None, None
+    if not isinstance(filters, dict) or set(filters) - set(BATCH_FILTER_FIELDS):
+        return None, None, f"'filter' may only contain {', '.join(BATCH_FILTER_FIELDS)}"
+    # An empty filter would match everyone; require at least one real condition
+    if not any(filters.get(key) for key in ('search', 'department', 'job_title')):
+        return None, None, "'filter' needs at least one of search, department or job_title"
+    if filters.get('status', 'active') not in EMPLOYEE_STATUS_FILTERS:
+        return None, None, f"status must be one of {', '.join(EMPLOYEE_STATUS_FILTERS)}"
+    return None, filters, None
+
+def select_batch_targets(conn, ids, filters):
+    """
+    Returns the (id, is_active) rows a batch applies to, or None if a filter matches
+    more than BATCH_MAX_EMPLOYEES employees. IDs are passed as one JSON array so the
+    lookup is a single statement however many there are.
+    """
+    if ids is not None:
+        return conn.execute("SELECT id, is_active FROM employees WHERE id IN (SELECT value FROM json_each(?))",
+                            (json.dumps(ids),)).fetchall()
+    max_ids = current_app.config.get('BATCH_MAX_EMPLOYEES', 10000)
+    base_query, params, _, _ = build_employee_filters(
+        conn, filters.get('search'), filters.get('department'), filters.get('job_title'), filters.get('status', 'active'))
+    rows = conn.execute(f"SELECT id, is_active {base_query} ORDER BY id LIMIT ?", params + [max_ids + 1]).fetchall()
+    return None if len(rows) > max_ids else rows
+
+def batch_results(ids, targets, status_of):
+    """Builds the per-id results: requested IDs that don't exist are reported as 'not_found'."""
+    found = {row['id']: row for row in targets}
+    requested = ids if ids is not None else list(found)
+    return [{'id': employee_id, 'status': status_of(found[employee_id]) if employee_id in found else 'not_found'}
+            for employee_id in requested]
+
+# --- Helper Functions for Delta Sync ---
+# Entity names used in 'change_log' (see migration 6), with their table and response key
+CHANGE_ENTITIES = {
+    'employee': ('employees', 'employees'),
+    'department': ('departments', 'departments'),
+    'job_title': ('job_titles', 'jobTitles'),
+}
+
+def read_changes(conn, since, limit):
+    """
+    Reads up to 'limit' change log entries after 'since' and the current rows they refer to.
+    Returns (last seq read, whether more follow, {entity: rows}, {entity: deleted IDs}).
+    Rows are read after the log, so a row may already hold a newer change; that change
+    is returned again by the next call, which only repeats work the client can apply twice.
+    """
+    entries = conn.execute("SELECT seq, entity, entity_id, deleted FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?",
+                           (since, limit + 1)).fetchall()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    changed = {entity: [] for entity in CHANGE_ENTITIES}
+    deleted = {entity: [] for entity in CHANGE_ENTITIES}
+    for entry in entries:
+        (deleted if entry['deleted'] else changed)[entry['entity']].append(entry['entity_id'])
+    rows = {}
+    for entity, ids in changed.items():
+        rows[entity] = conn.execute(f"SELECT * FROM {CHANGE_ENTITIES[entity][0]} "
+                                    "WHERE id IN (SELECT value FROM json_each(?)) ORDER BY id",
+                                    (json.dumps(ids),)).fetchall() if ids else []
+    return (entries[-1]['seq'] if entries else since), has_more, rows, deleted
+
 # ===================================================================
 # 1. REST API ENDPOINTS (prefixed with /api)
 # ===================================================================
 
+@api_bp.errorhandler(WriteUnavailable)
+def handle_write_unavailable(error):
+    current_app.logger.warning(f"Write refused: {error}")
+    return write_unavailable_response()
+
 @api_bp.route('/employees', methods=['GET'])
 def get_employees():
     """
@@ -44,43 +725,102 @@ def get_employees():
     - department (str): Filter by department.
     - job_title (str): Filter by job title.
     - page (int): The page number for pagination (default 1).
-    - limit (int): The number of items per page (default 20).
+    - limit (int): The number of items per page (default 20, at most EMPLOYEES_MAX_PAGE_SIZE).
+    - cursor (str): Switches to keyset pagination. Pass an empty value for the first page,
+      then the 'nextCursor' from the previous response. 'page' is ignored in this mode.
+    - include_total (bool): Whether to count all matching rows (default true).
+      Pass 'false' to skip the COUNT query, e.g. for infinite scrolling.
+    - fields (str): Comma-separated fields to return (default all); only their columns are read.
+    - format (str): 'rows' (default, a list of objects) or 'columnar' (one array per field).
     """
     page = request.args.get('page', 1, type=int)
     limit = request.args.get('limit', 20, type=int)
+    max_limit = current_app.config.get('EMPLOYEES_MAX_PAGE_SIZE', 1000)
+    if not 1 <= limit <= max_limit:
+        return jsonify({'error': f'limit must be between 1 and {max_limit}'}), 400
+    if page < 1:
+        return jsonify({'error': 'page must be at least 1'}), 400
     offset = (page - 1) * limit
+    cursor_token = request.args.get('cursor', None, type=str)
+    include_total = request.args.get('include_total', 'true', type=str).lower() not in ('false', '0', 'no')
     search_term = request.args.get('search', '', type=str)
     department = request.args.get('department', '', type=str)
     job_title = request.args.get('job_title', '', type=str)
-
-    base_query = "FROM employees WHERE is_active = 1"
-    params = []
-    
-    if search_term:
-        base_query += " AND (first_name LIKE ? OR last_name LIKE ? OR email LIKE ?)"
-        term = f"%{search_term}%"
-        params.extend([term, term, term])
-    if department:
-        base_query += " AND department = ?"
-        params.append(department)
-    if job_title:
-        base_query += " AND job_title = ?"
-        params.append(job_title)
+    fields, error = parse_employee_fields(request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    data_format = request.args.get('format', 'rows', type=str).lower()
+    if data_format not in EMPLOYEE_LIST_FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(EMPLOYEE_LIST_FORMATS)}"}), 400
+    columnar = data_format == 'columnar'
 
     conn = get_db_connection()
+    base_query, params, rank, rank_params = build_employee_filters(conn, search_term, department, job_title)
+    sort_key = ["first_name", "last_name", "id"]
+    sort_params = []
+    # The requested fields' columns, plus the sort columns a keyset cursor is built from
+    columns = list(dict.fromkeys([field_column(f) for f in fields] + sort_key))
+    if rank:
+        sort_key.insert(0, rank)
+        sort_params = rank_params
+
     # Get total count for pagination metadata, using the same filters but without limit/offset
-    total_records = conn.execute(f"SELECT COUNT(id) {base_query}", params).fetchone()[0]
-    
-    # Get the paginated results
-    results_query = f"SELECT * {base_query} ORDER BY first_name, last_name LIMIT ? OFFSET ?"
-    employees = conn.execute(results_query, params + [limit, offset]).fetchall()
+    total_records = None
+    if include_total:
+        total_records = conn.execute(f"SELECT COUNT(id) {base_query}", params).fetchone()[0]
+
+    order_by = ", ".join(sort_key)
+
+    if cursor_token is None:
+        # Get the paginated results
+        results_query = f"SELECT {', '.join(columns)} {base_query} ORDER BY {order_by} LIMIT ? OFFSET ?"
+        employees = conn.execute(results_query, params + sort_params + [limit, offset]).fetchall()
+
+        return jsonify({
+            'data': shape_employees(employees, columns, fields, columnar),
+            'pagination': {
+                'totalRecords': total_records,
+                'currentPage': page,
+                'totalPages': (total_records + limit - 1) // limit if total_records is not None else None, # Ceiling division
+                'limit': limit
+            }
+        })
+
+    # Keyset mode: seek past the last row of the previous page instead of using OFFSET,
+    # so every page costs the same however deep the client has scrolled.
+    seek_query = base_query
+    seek_params = list(params)
+    if cursor_token:
+        last_key = decode_cursor(cursor_token, len(sort_key))
+        if last_key is None:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        placeholders = ", ".join("?" for _ in sort_key)
+        seek_query += f" AND ({order_by}) > ({placeholders})"
+        seek_params += sort_params + last_key
+
+    # Fetch one extra row to find out whether another page exists
+    select_rank = f", {sort_key[0]} AS search_rank" if search_term else ""
+    results_query = f"SELECT {', '.join(columns)}{select_rank} {seek_query} ORDER BY {order_by} LIMIT ?"
+    select_params = sort_params if search_term else []
+    rows = conn.execute(results_query, select_params + seek_params + sort_params + [limit + 1]).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    employees = shape_employees(rows, columns, fields, columnar)
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        last_key = [last['first_name'], last['last_name'], last['id']]
+        if search_term:
+            last_key.insert(0, last['search_rank'])
+        next_cursor = encode_cursor(last_key)
 
     return jsonify({
-        'data': [dict(row) for row in employees],
+        'data': employees,
         'pagination': {
             'totalRecords': total_records,
-            'currentPage': page,
-            'totalPages': (total_records + limit - 1) // limit, # Ceiling division
+            'nextCursor': next_cursor,
+            'hasMore': has_more,
             'limit': limit
         }
     })
@@ -97,36 +837,127 @@ def add_employee():
         return jsonify({'error': 'Invalid email format'}), 400
     if not is_valid_date(data['start_date']):
         return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD.'}), 400
+    error = employee_field_error(data)
+    if error:
+        return jsonify({'error': error}), 400
+    is_active = data.get('is_active', 1)
+    # bool is an int subclass, so JSON true/false are accepted as 1/0
+    if not isinstance(is_active, int) or is_active not in (0, 1):
+        return jsonify({'error': 'is_active must be 0 or 1'}), 400
+
+    def insert_employee(conn):
+        ensure_lookup_names(conn, 'job_title', [data['job_title']])
+        ensure_lookup_names(conn, 'department', [data['department']])
+        rows = conn.execute(f"{EMPLOYEE_INSERT_SQL} {EMPLOYEE_RETURNING}",
+                            (data['first_name'], data['last_name'], data['email'], data['job_title'], data['department'], data['start_date'], data['salary'], int(is_active))).fetchall()
+        return store_written_employees(rows)[0]
 
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO employees (first_name, last_name, email, job_title, department, start_date, salary, is_active) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                       (data['first_name'], data['last_name'], data['email'], data['job_title'], data['department'], data['start_date'], data['salary'], data.get('is_active', 1)))
-        conn.commit()
-        new_id = cursor.lastrowid
+        created_employee = employee_to_dict(writer.run(insert_employee))
         
-        # Fetch the newly created employee from the database
-        created_employee = conn.execute('SELECT * FROM employees WHERE id = ?', (new_id,)).fetchone()
+        bump_data_version()
+        # Publish a socket event to subscribed clients, including the sender
+        broadcaster.publish('employee_added', created_employee)
+        return jsonify(created_employee), 201
         
-        # Emit a socket event to all clients, including the sender
-        socketio.emit('employee_added', dict(created_employee))
-        return jsonify(dict(created_employee)), 201
-        
-    except sqlite3.IntegrityError:
-        return jsonify({'error': 'An employee with this email already exists'}), 409
+    except sqlite3.IntegrityError as e:
+        return integrity_error_response(e)
+    except WriteUnavailable:
+        raise
     except Exception as e:
         current_app.logger.error(f"Error adding employee: {e}")
         return jsonify({'error': 'An internal server error occurred'}), 500
 
+@api_bp.route('/employees/export', methods=['GET'])
+def export_employees():
+    """
+    Streams the employee directory as CSV or NDJSON, reading rows from the cursor in
+    chunks so memory stays constant and the first bytes go out immediately.
+    Query Params:
+    - format (str): 'csv' (default) or 'ndjson'.
+    - search, department, job_title (str): Same filters as GET /employees.
+    - status (str): 'active' (default), 'inactive' or 'all'.
+    - gzip (bool): Compress the stream with gzip (sent with Content-Encoding: gzip).
+    """
+    data_format = request.args.get('format', 'csv', type=str).lower()
+    status = request.args.get('status', 'active', type=str).lower()
+    use_gzip = request.args.get('gzip', 'false', type=str).lower() in ('true', '1', 'yes')
+    if data_format not in ('csv', 'ndjson'):
+        return jsonify({'error': "format must be 'csv' or 'ndjson'"}), 400
+    if status not in EMPLOYEE_STATUS_FILTERS:
+        return jsonify({'error': f"status must be one of: {', '.join(EMPLOYEE_STATUS_FILTERS)}"}), 400
+
+    conn = get_db_connection()
+    base_query, params, _, _ = build_employee_filters(
+        conn,
+        request.args.get('search', '', type=str),
+        request.args.get('department', '', type=str),
+        request.args.get('job_title', '', type=str),
+        status,
+    )
+    # Ordering by the primary key walks the table in rowid order without a sort step.
+    # The id columns sit where EMPLOYEE_COLUMNS has the names and are translated per row.
+    cursor = conn.execute(
+        "SELECT id, first_name, last_name, email, job_title_id, department_id, start_date, end_date, is_active, salary "
+        f"{base_query} ORDER BY id", params)
+    columns = EMPLOYEE_COLUMNS
+    job_title_of = lambda row_id: lookup_cache.name_of('job_title', row_id)
+    department_of = lambda row_id: lookup_cache.name_of('department', row_id)
+    chunk_size = current_app.config.get('EXPORT_CHUNK_ROWS', 500)
+
+    def generate_chunks():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if data_format == 'csv':
+            writer.writerow(columns)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            rows = [row[:4] + (job_title_of(row[4]), department_of(row[5])) + row[6:] for row in map(tuple, rows)]
+            if data_format == 'csv':
+                writer.writerows(rows)
+            else:
+                for row in rows:
+                    buffer.write(json.dumps(dict(zip(columns, row))))
+                    buffer.write('\n')
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+        if data_format == 'csv' and buffer.tell():
+            yield buffer.getvalue().encode('utf-8')
+        cursor.close()
+
+    def generate_gzip():
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+        for chunk in generate_chunks():
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+    extension = 'csv' if data_format == 'csv' else 'ndjson'
+    mimetype = 'text/csv' if data_format == 'csv' else 'application/x-ndjson'
+    response = Response(stream_with_context(generate_gzip() if use_gzip else generate_chunks()), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=employees.{extension}'
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
 @api_bp.route('/employees/<int:employee_id>', methods=['GET'])
 def get_employee(employee_id):
-    """Fetches a single employee by their ID."""
-    conn = get_db_connection()
-    employee = conn.execute('SELECT * FROM employees WHERE id = ?', (employee_id,)).fetchone()
+    """Fetches a single employee by their ID, from the employee cache when it holds them."""
+    employee = employee_cache.get(employee_id)
     if employee is None:
-        return jsonify({'error': 'Employee not found'}), 404
-    return jsonify(dict(employee))
+        # Read before querying, so a write committed meanwhile keeps this row out of the cache
+        generation = employee_cache.generation()
+        conn = get_db_connection()
+        row = conn.execute('SELECT * FROM employees WHERE id = ?', (employee_id,)).fetchone()
+        if row is None:
+            return jsonify({'error': 'Employee not found'}), 404
+        employee = dict(row)
+        employee_cache.fill(employee, generation)
+    return jsonify(employee_to_dict(employee))
 
 @api_bp.route('/employees/<int:employee_id>', methods=['PUT'])
 def update_employee(employee_id):
@@ -140,21 +971,20 @@ def update_employee(employee_id):
         return jsonify({'error': 'Invalid email format'}), 400
     if 'start_date' in data and not is_valid_date(data['start_date']):
         return jsonify({'error': 'Invalid date format for start_date. Use YYYY-MM-DD.'}), 400
-
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Check if employee exists
-    existing_employee = cursor.execute('SELECT * FROM employees WHERE id = ?', (employee_id,)).fetchone()
-    if not existing_employee:
-        return jsonify({'error': 'Employee not found'}), 404
+    error = employee_field_error(data)
+    if error:
+        return jsonify({'error': error}), 400
 
     # Dynamically build the UPDATE query based on the fields provided in the request
     fields_to_update = []
     params = []
     for key, value in data.items():
         # Ensure only valid columns are updated
-        if key in ['first_name', 'last_name', 'email', 'job_title', 'department', 'start_date', 'salary']:
+        if key in ['job_title', 'department']:
+            # Stored as the id of the named lookup row
+            fields_to_update.append(f"{key}_id = {lookup_id_sql(key)}")
+            params.append(value)
+        elif key in ['first_name', 'last_name', 'email', 'start_date', 'salary']:
             fields_to_update.append(f"{key} = ?")
             params.append(value)
     
@@ -162,21 +992,32 @@ def update_employee(employee_id):
         return jsonify({'error': 'No updatable fields provided'}), 400
 
     params.append(employee_id)
+    query = f"UPDATE employees SET {', '.join(fields_to_update)} WHERE id = ? {EMPLOYEE_RETURNING}"
+
+    def apply_update(conn):
+        for field in ('job_title', 'department'):
+            if field in data:
+                ensure_lookup_names(conn, field, [data[field]])
+        rows = conn.execute(query, params).fetchall()
+        # No row updated means no such employee
+        if not rows:
+            raise EmployeeNotFound(employee_id)
+        return store_written_employees(rows)[0]
     
     try:
-        query = f"UPDATE employees SET {', '.join(fields_to_update)} WHERE id = ?"
-        cursor.execute(query, params)
-        conn.commit()
-        
-        # Fetch the updated employee data to return
-        updated_employee = cursor.execute('SELECT * FROM employees WHERE id = ?', (employee_id,)).fetchone()
+        updated_employee = employee_to_dict(writer.run(apply_update))
         
-        # Emit a socket event to all clients, including the sender
-        socketio.emit('employee_updated', dict(updated_employee))
-        return jsonify(dict(updated_employee))
+        bump_data_version()
+        # Publish a socket event to subscribed clients, including the sender
+        broadcaster.publish('employee_updated', updated_employee)
+        return jsonify(updated_employee)
 
-    except sqlite3.IntegrityError:
-        return jsonify({'error': 'An employee with this email already exists'}), 409
+    except EmployeeNotFound:
+        return jsonify({'error': 'Employee not found'}), 404
+    except sqlite3.IntegrityError as e:
+        return integrity_error_response(e)
+    except WriteUnavailable:
+        raise
     except Exception as e:
         current_app.logger.error(f"Error updating employee {employee_id}: {e}")
         return jsonify({'error': 'An internal server error occurred'}), 500
@@ -185,43 +1026,243 @@ def update_employee(employee_id):
 def deactivate_employee(employee_id):
     """Deactivates an employee (soft delete)."""
     end_date = datetime.now().strftime('%Y-%m-%d')
-    conn = get_db_connection()
-    
-    # First, fetch the employee's data
-    employee = conn.execute('SELECT * FROM employees WHERE id = ?', (employee_id,)).fetchone()
-    if employee is None:
+
+    def apply_deactivation(conn):
+        rows = conn.execute(f"UPDATE employees SET is_active = 0, end_date = ? WHERE id = ? {EMPLOYEE_RETURNING}",
+                            (end_date, employee_id)).fetchall()
+        # No row updated means no such employee
+        return store_written_employees(rows)[0] if rows else None
+
+    deactivated_employee = writer.run(apply_deactivation)
+    if deactivated_employee is None:
         return jsonify({'error': 'Employee not found'}), 404
-        
-    # Then, update the employee's status
-    conn.execute("UPDATE employees SET is_active = 0, end_date = ? WHERE id = ?", (end_date, employee_id))
-    conn.commit()
-    
-    # Get the updated employee record
-    deactivated_employee = conn.execute('SELECT * FROM employees WHERE id = ?', (employee_id,)).fetchone()
+    deactivated_employee = employee_to_dict(deactivated_employee)
     
-    # Emit the deactivated employee's data
-    socketio.emit('employee_deactivated', dict(deactivated_employee))
+    bump_data_version()
+    # Publish the deactivated employee's data
+    broadcaster.publish('employee_deactivated', deactivated_employee)
     
-    return jsonify(dict(deactivated_employee))
+    return jsonify(deactivated_employee)
+
+@api_bp.route('/employees/batch', methods=['PUT'])
+def batch_update_employees():
+    """
+    Applies the same field changes to many employees in one transaction, e.g. moving
+    a team to a new department. Publishes a single 'employees_updated' event.
+    Request Body:
+    - ids (list[int]) or filter (dict with search, department, job_title and status)
+    - changes (dict): any of job_title, department, salary, start_date
+    """
+    data = request.get_json()
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+    ids, filters, error = parse_batch_target(data)
+    if error:
+        return jsonify({'error': error}), 400
+
+    changes = data.get('changes')
+    if not isinstance(changes, dict) or not changes:
+        return jsonify({'error': "'changes' must be an object of fields to update"}), 400
+    if set(changes) - set(BATCH_UPDATE_FIELDS):
+        return jsonify({'error': f"Only {', '.join(BATCH_UPDATE_FIELDS)} can be changed in a batch"}), 400
+    if 'start_date' in changes and not is_valid_date(changes['start_date']):
+        return jsonify({'error': 'Invalid date format for start_date. Use YYYY-MM-DD.'}), 400
+    if 'salary' in changes:
+        salary = parse_salary(changes['salary'])
+        if salary is None:
+            return jsonify({'error': 'salary must be a number'}), 400
+        changes = dict(changes, salary=salary)
+    for field in ('job_title', 'department'):
+        if field in changes and not is_valid_name(changes[field]):
+            return jsonify({'error': f'{field} must be a non-empty name'}), 400
+
+    assignments = ', '.join(f"{key}_id = {lookup_id_sql(key)}" if key in ('job_title', 'department') else f"{key} = ?"
+                            for key in changes)
+    values = list(changes.values())
+
+    def apply_batch(conn):
+        targets = select_batch_targets(conn, ids, filters)
+        if targets is None:
+            return None
+        for field in ('job_title', 'department'):
+            if field in changes:
+                ensure_lookup_names(conn, field, [changes[field]])
+        target_ids = json.dumps([row['id'] for row in targets])
+        store_written_employees(conn.execute(
+            f"UPDATE employees SET {assignments} WHERE id IN (SELECT value FROM json_each(?)) {EMPLOYEE_RETURNING}",
+            values + [target_ids]).fetchall())
+        return targets
+
+    targets = writer.run(apply_batch)
+    if targets is None:
+        return jsonify({'error': 'Filter matches too many employees; narrow it or pass ids'}), 400
+
+    results = batch_results(ids, targets, lambda row: 'updated')
+    updated_ids = [row['id'] for row in targets]
+    if updated_ids:
+        bump_data_version()
+        broadcaster.publish('employees_updated', {'ids': updated_ids, 'changes': changes, 'count': len(updated_ids)})
+    return jsonify({'updated': len(updated_ids), 'notFound': len(results) - len(updated_ids), 'results': results})
+
+@api_bp.route('/employees/batch/deactivate', methods=['PUT'])
+def batch_deactivate_employees():
+    """
+    Deactivates many employees in one transaction (soft delete), e.g. for a layoff.
+    Publishes a single 'employees_deactivated' event.
+    Request Body:
+    - ids (list[int]) or filter (dict with search, department, job_title and status)
+    - end_date (str, optional): YYYY-MM-DD. Defaults to today.
+    """
+    data = request.get_json()
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+    ids, filters, error = parse_batch_target(data)
+    if error:
+        return jsonify({'error': error}), 400
+    end_date = data.get('end_date') or datetime.now().strftime('%Y-%m-%d')
+    if not is_valid_date(end_date):
+        return jsonify({'error': 'Invalid date format for end_date. Use YYYY-MM-DD.'}), 400
+
+    def apply_batch(conn):
+        targets = select_batch_targets(conn, ids, filters)
+        if targets is None:
+            return None
+        active_ids = [row['id'] for row in targets if row['is_active']]
+        store_written_employees(conn.execute(
+            f"UPDATE employees SET is_active = 0, end_date = ? WHERE id IN (SELECT value FROM json_each(?)) {EMPLOYEE_RETURNING}",
+            (end_date, json.dumps(active_ids))).fetchall())
+        return targets
+
+    targets = writer.run(apply_batch)
+    if targets is None:
+        return jsonify({'error': 'Filter matches too many employees; narrow it or pass ids'}), 400
+
+    results = batch_results(ids, targets, lambda row: 'deactivated' if row['is_active'] else 'already_inactive')
+    deactivated_ids = [row['id'] for row in targets if row['is_active']]
+    if deactivated_ids:
+        bump_data_version()
+        broadcaster.publish('employees_deactivated',
+                            {'ids': deactivated_ids, 'end_date': end_date, 'count': len(deactivated_ids)})
+    return jsonify({
+        'deactivated': len(deactivated_ids),
+        'alreadyInactive': sum(1 for r in results if r['status'] == 'already_inactive'),
+        'notFound': sum(1 for r in results if r['status'] == 'not_found'),
+        'results': results,
+    })
+
+@api_bp.route('/employees/import', methods=['POST'])
+def import_employees():
+    """
+    Bulk-imports employees from a streamed CSV or NDJSON request body.
+    Rows are validated like add_employee and handed to the writer in batches;
+    the response lists the rejected rows, and a single 'employees_imported'
+    socket event is emitted instead of one event per employee.
+    Query Params:
+    - format (str): 'csv' or 'ndjson'. Defaults to the request's Content-Type, then CSV.
+    """
+    data_format = request.args.get('format', '', type=str).lower()
+    if not data_format:
+        data_format = 'ndjson' if 'json' in (request.mimetype or '') else 'csv'
+    if data_format not in ('csv', 'ndjson'):
+        return jsonify({'error': "format must be 'csv' or 'ndjson'"}), 400
+
+    batch_size = current_app.config.get('IMPORT_BATCH_SIZE', 1000)
+    report = {'imported': 0, 'failed': 0, 'errors': [], 'errorsTruncated': False}
+    batch = []
+
+    def publish_imported():
+        # Batches committed so far stay imported, even if the import stops early
+        if report['imported']:
+            bump_data_version()
+            broadcaster.publish('employees_imported', {'imported': report['imported'], 'failed': report['failed']})
+
+    try:
+        try:
+            for number, record, parse_error in iter_import_records(request.stream, data_format):
+                params, error = (None, parse_error) if parse_error else validate_import_record(record)
+                if error:
+                    add_import_error(report, number, error)
+                    continue
+                batch.append((number, params))
+                if len(batch) >= batch_size:
+                    writer.run(lambda conn: insert_import_batch(conn, batch, report))
+                    batch = []
+        except (UnicodeDecodeError, csv.Error) as e:
+            # The rows read before the unreadable part are still imported below
+            report['errors'].append({'row': None, 'error': f'Could not read upload: {e}'})
+        if batch:
+            writer.run(lambda conn: insert_import_batch(conn, batch, report))
+    except WriteUnavailable as e:
+        publish_imported()
+        current_app.logger.warning(f"Import stopped: {e}")
+        return write_unavailable_response(**report)
+    except Exception as e:
+        publish_imported()
+        current_app.logger.error(f"Error importing employees: {e}")
+        return jsonify({'error': 'An internal server error occurred', **report}), 500
+
+    publish_imported()
+    return jsonify(report)
 
 @api_bp.route('/dashboard/kpis', methods=['GET'])
+@cached_response(vary=lambda: datetime.now().strftime('%Y-%m-%d'))
 def get_kpis():
     """Calculates and returns key performance indicators."""
     conn = get_db_connection()
-    total_employees = conn.execute('SELECT COUNT(*) FROM employees WHERE is_active = 1').fetchone()[0]
-    thirty_days_ago = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
-    new_hires = conn.execute('SELECT COUNT(*) FROM employees WHERE start_date >= ?', (thirty_days_ago,)).fetchone()[0]
-    departures = conn.execute('SELECT COUNT(*) FROM employees WHERE is_active = 0 AND end_date >= ?', (thirty_days_ago,)).fetchone()[0]
-    return jsonify({"totalEmployees": total_employees, "newHires": new_hires, "departures": departures})
+    return jsonify(compute_kpis(conn))
 
 @api_bp.route('/dashboard/department-breakdown', methods=['GET'])
+@cached_response()
 def get_department_breakdown():
     """Returns the count of employees per department."""
     conn = get_db_connection()
-    breakdown = conn.execute("SELECT department, COUNT(*) as count FROM employees WHERE is_active = 1 GROUP BY department").fetchall()
-    return jsonify([dict(row) for row in breakdown])
+    return jsonify(read_department_breakdown(conn))
+
+@api_bp.route('/dashboard/summary', methods=['GET'])
+@cached_response(vary=lambda: datetime.now().strftime('%Y-%m-%d'))
+def get_dashboard_summary():
+    """
+    Returns everything the Dashboard page needs in one response: the KPIs, the department
+    breakdown with percentages, and new hires per month, all read on one connection
+    from indexes and the materialized aggregates.
+    Query Params:
+    - months (int): Number of months of hires to return, ending with the current month (default 12).
+    """
+    months = request.args.get('months', 12, type=int)
+    if not 1 <= months <= MAX_SUMMARY_MONTHS:
+        return jsonify({'error': f'months must be between 1 and {MAX_SUMMARY_MONTHS}'}), 400
+
+    conn = get_db_connection()
+    kpis = compute_kpis(conn)
+
+    breakdown = read_department_breakdown(conn)
+    total = sum(row['count'] for row in breakdown)
+    departments = [{
+        'department': row['department'],
+        'count': row['count'],
+        'percentage': round(row['count'] * 100 / total, 2) if total else 0,
+    } for row in breakdown]
+
+    # Build the month keys for the window so months without hires still appear with zero
+    today = datetime.now()
+    window = []
+    year, month = today.year, today.month
+    for _ in range(months):
+        window.append(f"{year:04d}-{month:02d}")
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    window.reverse()
+    hires = dict(conn.execute(
+        "SELECT month, count FROM agg_monthly_hires WHERE month >= ? AND month <= ?", (window[0], window[-1])
+    ).fetchall())
+
+    return jsonify({
+        'kpis': kpis,
+        'departmentBreakdown': departments,
+        'newHiresByMonth': [{'month': key, 'count': hires.get(key, 0)} for key in window],
+    })
 
 @api_bp.route('/departments', methods=['GET'])
+@cached_response()
 def get_departments():
     """Fetches all departments."""
     conn = get_db_connection()
@@ -234,14 +1275,14 @@ def add_department():
     data = request.get_json()
     if not data or 'name' not in data:
         return jsonify({'error': 'Missing name field'}), 400
+    # The name is what employees are matched to this department by
+    if not is_valid_name(data['name']):
+        return jsonify({'error': 'name must be a non-empty string'}), 400
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO departments (name) VALUES (?)", (data['name'],))
-        conn.commit()
-        new_id = cursor.lastrowid
+        new_id = writer.run(lambda conn: insert_lookup(conn, 'departments', data['name']))
         new_department = {'id': new_id, 'name': data['name']}
-        socketio.emit('department_added', new_department)
+        bump_data_version()
+        broadcaster.publish('department_added', new_department)
         return jsonify(new_department), 201
     except sqlite3.IntegrityError:
         return jsonify({'error': 'Department already exists'}), 409
@@ -249,13 +1290,17 @@ def add_department():
 @api_bp.route('/departments/<int:department_id>', methods=['DELETE'])
 def delete_department(department_id):
     """Deletes a department."""
-    conn = get_db_connection()
-    conn.execute("DELETE FROM departments WHERE id = ?", (department_id,))
-    conn.commit()
-    socketio.emit('department_deleted', {'id': department_id})
+    try:
+        writer.run(lambda conn: delete_lookup(conn, 'departments', department_id))
+    except sqlite3.IntegrityError:
+        # Employees reference it through a foreign key
+        return jsonify({'error': 'Department is still assigned to employees'}), 409
+    bump_data_version()
+    broadcaster.publish('department_deleted', {'id': department_id})
     return jsonify({'message': 'Department deleted successfully'})
 
 @api_bp.route('/job-titles', methods=['GET'])
+@cached_response()
 def get_job_titles():
     """Fetches all job titles."""
     conn = get_db_connection()
@@ -268,14 +1313,14 @@ def add_job_title():
     data = request.get_json()
     if not data or 'name' not in data:
         return jsonify({'error': 'Missing name field'}), 400
+    # The name is what employees are matched to this job title by
+    if not is_valid_name(data['name']):
+        return jsonify({'error': 'name must be a non-empty string'}), 400
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO job_titles (name) VALUES (?)", (data['name'],))
-        conn.commit()
-        new_id = cursor.lastrowid
+        new_id = writer.run(lambda conn: insert_lookup(conn, 'job_titles', data['name']))
         new_job_title = {'id': new_id, 'name': data['name']}
-        socketio.emit('job_title_added', new_job_title)
+        bump_data_version()
+        broadcaster.publish('job_title_added', new_job_title)
         return jsonify(new_job_title), 201
     except sqlite3.IntegrityError:
         return jsonify({'error': 'Job title already exists'}), 409
@@ -283,39 +1328,170 @@ def add_job_title():
 @api_bp.route('/job-titles/<int:job_title_id>', methods=['DELETE'])
 def delete_job_title(job_title_id):
     """Deletes a job title."""
-    conn = get_db_connection()
-    conn.execute("DELETE FROM job_titles WHERE id = ?", (job_title_id,))
-    conn.commit()
-    socketio.emit('job_title_deleted', {'id': job_title_id})
+    try:
+        writer.run(lambda conn: delete_lookup(conn, 'job_titles', job_title_id))
+    except sqlite3.IntegrityError:
+        # Employees reference it through a foreign key
+        return jsonify({'error': 'Job title is still assigned to employees'}), 409
+    bump_data_version()
+    broadcaster.publish('job_title_deleted', {'id': job_title_id})
     return jsonify({'message': 'Job title deleted successfully'})
 
+@api_bp.route('/changes', methods=['GET'])
+@cached_response()
+def get_changes():
+    """
+    Returns the employees, departments and job titles changed since a position in the
+    change log, so a reconnecting client can catch up without refetching whole lists.
+    Deactivated employees come back as rows with is_active 0; deleted departments and
+    job titles as IDs under 'deleted'. Pass the returned 'seq' as 'since' next time.
+    Query Params:
+    - since (int): The 'seq' of the previous response. Omit it to only get the current
+      'seq', e.g. just before loading the full lists.
+    - limit (int): Changed rows per response (default CHANGES_PAGE_SIZE). While 'hasMore'
+      is true, request again with the returned 'seq'.
+    'resync' is true when 'since' is ahead of the log (e.g. the database was replaced);
+    the client must then reload its lists.
+    """
+    since = request.args.get('since', None, type=int)
+    if 'since' in request.args and (since is None or since < 0):
+        return jsonify({'error': 'since must be a non-negative integer'}), 400
+    max_limit = current_app.config.get('CHANGES_MAX_PAGE_SIZE', 5000)
+    limit = request.args.get('limit', current_app.config.get('CHANGES_PAGE_SIZE', 1000), type=int)
+    if not 1 <= limit <= max_limit:
+        return jsonify({'error': f'limit must be between 1 and {max_limit}'}), 400
+
+    conn = get_db_connection()
+    latest = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+    resync = since is not None and since > latest
+    if since is None or resync:
+        return jsonify({'since': since, 'seq': latest, 'hasMore': False, 'resync': resync,
+                        **{key: [] for _, key in CHANGE_ENTITIES.values()},
+                        'deleted': {key: [] for _, key in CHANGE_ENTITIES.values()}})
+
+    seq, has_more, rows, deleted = read_changes(conn, since, limit)
+    return jsonify({
+        'since': since,
+        'seq': seq,
+        'hasMore': has_more,
+        'resync': False,
+        'employees': [employee_to_dict(row) for row in rows['employee']],
+        'departments': [dict(row) for row in rows['department']],
+        'jobTitles': [dict(row) for row in rows['job_title']],
+        'deleted': {CHANGE_ENTITIES[entity][1]: ids for entity, ids in deleted.items()},
+    })
+
 @api_bp.route('/analytics/turnover', methods=['GET'])
+@cached_response(vary=lambda: datetime.now().strftime('%Y-%m-%d'))
 def get_turnover_data():
-    """Calculates and returns employee turnover data."""
+    """
+    Calculates and returns employee turnover data.
+    Without parameters, returns monthly hires and departures over the whole history.
+    Query Params:
+    - from, to (str): Inclusive date range in YYYY-MM-DD (defaults to the last year).
+    - granularity (str): 'day', 'week', 'month' (default) or 'quarter'.
+    Passing any of these returns 'period' keys instead of 'month' keys.
+    Both forms also include 'series', with hires and departures already merged per period.
+    """
     conn = get_db_connection()
 
-    # Get monthly hires
-    hires = conn.execute("""
-        SELECT strftime('%Y-%m', start_date) as month, COUNT(id) as count
-        FROM employees
-        GROUP BY month
-        ORDER BY month
-    """).fetchall()
-
-    # Get monthly departures
-    departures = conn.execute("""
-        SELECT strftime('%Y-%m', end_date) as month, COUNT(id) as count
-        FROM employees
-        WHERE is_active = 0 AND end_date IS NOT NULL
-        GROUP BY month
-        ORDER BY month
-    """).fetchall()
+    if not any(arg in request.args for arg in ('from', 'to', 'granularity')):
+        # Monthly hires and departures are read from the trigger-maintained aggregates (see aggregates.py)
+        hires = conn.execute("SELECT month, count FROM agg_monthly_hires WHERE count > 0 ORDER BY month").fetchall()
+        departures = conn.execute("SELECT month, count FROM agg_monthly_departures WHERE count > 0 ORDER BY month").fetchall()
+        merged = {}
+        for row in hires:
+            merged.setdefault(row['month'], {'month': row['month'], 'hires': 0, 'departures': 0})['hires'] = row['count']
+        for row in departures:
+            merged.setdefault(row['month'], {'month': row['month'], 'hires': 0, 'departures': 0})['departures'] = row['count']
+
+        return jsonify({
+            'hires': [dict(row) for row in hires],
+            'departures': [dict(row) for row in departures],
+            'series': [merged[month] for month in sorted(merged)],
+        })
+
+    start, end, granularity, error = parse_time_range(request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    counts = {row[0]: row for row in count_events_by_period(conn, start, end, granularity)}
+    series = [{'period': key, 'hires': counts[key][2] if key in counts else 0,
+               'departures': counts[key][3] if key in counts else 0}
+              for key in period_keys(start, end, granularity)]
 
     return jsonify({
-        'hires': [dict(row) for row in hires],
-        'departures': [dict(row) for row in departures]
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'granularity': granularity,
+        'hires': [{'period': p['period'], 'count': p['hires']} for p in series if p['hires']],
+        'departures': [{'period': p['period'], 'count': p['departures']} for p in series if p['departures']],
+        'series': series,
     })
 
+@api_bp.route('/analytics/headcount', methods=['GET'])
+@cached_response(vary=lambda: datetime.now().strftime('%Y-%m-%d'))
+def get_headcount_over_time():
+    """
+    Returns headcount over time with hires, departures and turnover rate per period.
+    The opening headcount comes from two indexed counts; the series is then built in a
+    single sweep over per-period hire and departure counts sorted by period.
+    Turnover rate is departures as a percentage of the period's average headcount.
+    Query Params:
+    - from, to (str): Inclusive date range in YYYY-MM-DD (defaults to the last year).
+    - granularity (str): 'day', 'week', 'month' (default) or 'quarter'.
+    - by (str): Pass 'department' to get one series per department.
+    """
+    start, end, granularity, error = parse_time_range(request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    by_department = request.args.get('by', '', type=str) == 'department'
+    conn = get_db_connection()
+
+    # Headcount just before the range opens: everyone hired before it, minus everyone who left before it
+    # The unary '+' stops SQLite from walking the department_id index to group the rows,
+    # so it searches the date range instead
+    group = "+department_id" if by_department else "''"
+    opening = {}
+    for dept, hired in conn.execute(
+            f"SELECT {group}, COUNT(*) FROM employees WHERE start_date < ? GROUP BY 1", (start.isoformat(),)):
+        opening[dept] = opening.get(dept, 0) + hired
+    for dept, left in conn.execute(
+            f"SELECT {group}, COUNT(*) FROM employees WHERE is_active = 0 AND end_date < ? GROUP BY 1", (start.isoformat(),)):
+        opening[dept] = opening.get(dept, 0) - left
+    if not by_department:
+        opening.setdefault('', 0)
+
+    events = {}
+    for period, dept, hires, departures in count_events_by_period(conn, start, end, granularity, by_department):
+        events[(period, dept)] = (hires, departures)
+        opening.setdefault(dept, 0)
+
+    keys = period_keys(start, end, granularity)
+    result = {}
+    for dept in sorted(opening):
+        headcount = opening[dept]
+        series = []
+        for key in keys:
+            hires, departures = events.get((key, dept), (0, 0))
+            period_start = headcount
+            headcount += hires - departures
+            average = (period_start + headcount) / 2
+            series.append({
+                'period': key,
+                'headcount': headcount,
+                'hires': hires,
+                'departures': departures,
+                'turnoverRate': round(departures * 100 / average, 2) if average > 0 else 0,
+            })
+        result[dept] = series
+
+    response = {'from': start.isoformat(), 'to': end.isoformat(), 'granularity': granularity}
+    if by_department:
+        response['departments'] = {lookup_cache.name_of('department', dept): series for dept, series in result.items()}
+    else:
+        response['series'] = result.get('', [])
+    return jsonify(response)
+
 # ===================================================================
 # 2. SOCKET.IO REAL-TIME EVENT HANDLERS
 # ===================================================================
@@ -331,31 +1507,112 @@ def handle_disconnect():
     """Triggered when a client disconnects."""
     print(f"Client disconnected: {request.sid}")
 
+def requested_rooms(data):
+    """Returns the known rooms named by a {'rooms': [...]} message, ignoring anything else."""
+    rooms = data.get('rooms') if isinstance(data, dict) else None
+    if not isinstance(rooms, list):
+        return set()
+    return {room for room in rooms if isinstance(room, str) and room in BROADCAST_ROOMS}
+
+def set_subscription(rooms):
+    """Moves the client to the subscription room for 'rooms' (see broadcaster.SUBSCRIPTION_PREFIX)."""
+    current = subscribed_rooms(joined_rooms())
+    if rooms == current:
+        return
+    if current:
+        leave_room(subscription_room(current))
+    if rooms:
+        join_room(subscription_room(rooms))
+
+@socketio.on('subscribe')
+def handle_subscribe(data):
+    """Adds the requested rooms to the client's subscription so it receives their 'changes' messages."""
+    rooms = subscribed_rooms(joined_rooms()) | requested_rooms(data)
+    set_subscription(rooms)
+    emit('subscribed', {'rooms': sorted(rooms)})
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe(data):
+    """Removes the given rooms from the client's subscription."""
+    set_subscription(subscribed_rooms(joined_rooms()) - requested_rooms(data))
+
 @api_bp.route('/analytics/salary-distribution', methods=['GET'])
+@cached_response()
 def get_salary_distribution():
-    """Returns salary distribution data in Rupees."""
+    """
+    Returns salary distribution data in Rupees, computed in a single pass.
+    Query Params:
+    - bounds (str): Comma-separated ascending lower edges of the buckets; the last one is open-ended.
+    - buckets (int): Number of equal-width buckets between the lowest and highest salary (overrides bounds).
+    - department (str): Only count this department.
+    - job_title (str): Only count this job title.
+    """
     conn = get_db_connection()
-    # Define salary ranges in Rupees
-    ranges = [
-        (0, 300000),
-        (300001, 600000),
-        (600001, 1000000),
-        (1000001, 1500000),
-        (1500001, 99999999)
-    ]
-
-    results = []
-    for r in ranges:
-        count = conn.execute(
-            "SELECT COUNT(*) FROM employees WHERE salary BETWEEN ? AND ? AND is_active = 1",
-            (r[0], r[1])
-        ).fetchone()[0]
-
-        if r[1] > 2000000:
-            range_label = f"₹{r[0]/100000:.1f}L+"
-        else:
-            range_label = f"₹{r[0]/100000:.1f}L - ₹{r[1]/100000:.1f}L"
+    buckets, error = compute_salary_histogram(conn, request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    return jsonify([{"range": b["range"], "lower": b["lower"], "upper": b["upper"], "count": b["count"]} for b in buckets])
+
+@api_bp.route('/analytics/salary-statistics', methods=['GET'])
+@cached_response()
+def get_salary_statistics():
+    """
+    Returns the salary histogram together with min, max, mean, median, p90 and p99 of the
+    salaries it counts. Accepts the same query params as /analytics/salary-distribution.
+    """
+    conn = get_db_connection()
+    buckets, error = compute_salary_histogram(conn, request.args)
+    if error:
+        return jsonify({'error': error}), 400
 
-        results.append({"range": range_label, "count": count})
+    # Overall figures are folded from the per-bucket aggregates rather than rescanned
+    filled = [b for b in buckets if b["count"]]
+    total = sum(b["count"] for b in filled)
+    stats = {"count": total, "min": None, "max": None, "mean": None, "median": None, "p90": None, "p99": None}
+    if total:
+        percentiles = compute_salary_percentiles(conn, request.args, buckets[0]["lower"], total, (50, 90, 99))
+        stats.update({
+            "min": min(b["min"] for b in filled),
+            "max": max(b["max"] for b in filled),
+            "mean": sum(b["sum"] for b in filled) / total,
+            "median": percentiles[50],
+            "p90": percentiles[90],
+            "p99": percentiles[99],
+        })
+
+    return jsonify({
+        "statistics": stats,
+        "buckets": [{"range": b["range"], "lower": b["lower"], "upper": b["upper"], "count": b["count"]} for b in buckets],
+    })
+
+@api_bp.route('/analytics/salary-by-group', methods=['GET'])
+@cached_response()
+def get_salary_by_group():
+    """
+    Returns the count, min, max, mean and percentiles of active salaries per department,
+    job title, or department and job title pair.
+    Query Params:
+    - by (str): 'department' (default), 'job_title' or 'department,job_title'.
+    - percentiles (str): Comma-separated percentiles between 1 and 100 (default 50,90,99).
+    """
+    fields = [f.strip() for f in request.args.get('by', 'department', type=str).split(',') if f.strip()]
+    if not fields or len(set(fields)) != len(fields) or set(fields) - set(SALARY_GROUP_FIELDS):
+        return jsonify({'error': f"by must be one or both of: {', '.join(SALARY_GROUP_FIELDS)}"}), 400
+    fields = [f for f in SALARY_GROUP_FIELDS if f in fields]
+    try:
+        percentiles = sorted({int(p) for p in request.args.get('percentiles', '50,90,99', type=str).split(',')})
+    except ValueError:
+        return jsonify({'error': 'percentiles must be a comma-separated list of integers'}), 400
+    if not percentiles or not all(1 <= p <= 100 for p in percentiles):
+        return jsonify({'error': 'percentiles must be between 1 and 100'}), 400
 
-    return jsonify(results)
\ No newline at end of file
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        groups = snapshot.salary_by_group(fields, percentiles)
+    else:
+        groups = query_salary_by_group(get_db_connection(), fields, percentiles)
+    for group in groups:
+        for field in fields:
+            group[field] = lookup_cache.name_of(field, group[field])
+    groups.sort(key=lambda group: tuple(group[field] or '' for field in fields))
+    return jsonify({'by': fields, 'percentiles': percentiles, 'groups': groups})
@@ -1,21 +1,49 @@
 # hrdash/run.py
 
-# Import the factory function to create the app
-from app import create_app
+import argparse
+import os
 
-# Import the socketio instance directly from extensions
-from extensions import socketio
-
-# Create the Flask app instance using the factory
-app = create_app()
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the HR dashboard backend.")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)))
+    parser.add_argument('--config', default=os.environ.get('HRDASH_CONFIG', 'development'),
+                        help="Configuration name: development or production")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Worker processes sharing the port (default: HRDASH_WORKERS or 1)")
+    return parser.parse_args()
 
 if __name__ == '__main__':
-    try:
-        # Use the imported socketio instance to run the app with Eventlet
-        print("Starting server with Eventlet and Socket.IO...")
-        socketio.run(app, host='0.0.0.0', port=5000, allow_unsafe_werkzeug=True)
-    finally:
-        # This ensures that the database connection is closed when the app shuts down
-        with app.app_context():
-            from database import close_db
-            close_db()
\ No newline at end of file
+    args = parse_args()
+    if args.workers is not None:
+        # Must be set before config.py is imported below
+        os.environ['HRDASH_WORKERS'] = str(args.workers)
+
+    # Import the factory function to create the app
+    from app import create_app
+    # Import the socketio instance directly from extensions
+    from extensions import socketio, writer
+    from config import config_by_name
+
+    if config_by_name[args.config].WORKERS > 1:
+        from workers import serve_workers
+        serve_workers(args.config, args.host, args.port, config_by_name[args.config].WORKERS)
+    else:
+        # Create the Flask app instance using the factory
+        app = create_app(args.config)
+        try:
+            # Use the imported socketio instance to run the app with Eventlet
+            print("Starting server with Eventlet and Socket.IO...")
+            socketio.run(app, host=args.host, port=args.port, allow_unsafe_werkzeug=True)
+        finally:
+            # This ensures that queued writes are committed and the database connections
+            # are closed when the app shuts down
+            writer.stop()
+            with app.app_context():
+                from database import close_db, close_db_pools
+                close_db()
+            close_db_pools()
+else:
+    # Imported by a WSGI server (e.g. 'gunicorn run:app')
+    from app import create_app
+    app = create_app()
@@ -0,0 +1,592 @@
+# hrdash/snapshot.py
+
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; without it the analytics routes query SQLite
+    np = None
+
+from database import DATABASE_NAME
+
+EPOCH = date(1970, 1, 1)
+NO_DATE = -2 ** 31            # Day number stored for a missing date
+LOAD_CHUNK_ROWS = 50000
+SORTED_CACHE_SIZE = 64        # Sorted salary arrays kept per (department, job title) filter
+
+# Snapshot columns: name, SQL expression that reads it from 'employees', and dtype.
+# Dates become day numbers since 1970-01-01; department and job title are already
+# dictionary-encoded as their lookup ids (see lookups.py). A salary stored as text that
+# isn't a number (from before writes validated it) counts as 0, and an is_active other than
+# 1 as inactive, rather than failing the load.
+SNAPSHOT_COLUMNS = (
+    ('id', "id", 'int64'),
+    ('salary', "CAST(salary AS REAL)", 'float64'),
+    ('start_day', f"COALESCE(CAST(julianday(start_date) - 2440587.5 AS INTEGER), {NO_DATE})", 'int32'),
+    ('end_day', f"COALESCE(CAST(julianday(end_date) - 2440587.5 AS INTEGER), {NO_DATE})", 'int32'),
+    ('department', "department_id", 'int32'),
+    ('job_title', "job_title_id", 'int32'),
+    ('active', "is_active = 1", 'bool'),
+)
+SNAPSHOT_EXPRESSIONS = ", ".join(expr for _, expr, _ in SNAPSHOT_COLUMNS)
+SNAPSHOT_SELECT = f"SELECT {SNAPSHOT_EXPRESSIONS} FROM employees"
+
+def day_number(day):
+    """Days between 1970-01-01 and a date."""
+    return (day - EPOCH).days
+
+# ===================================================================
+# 1. PERIOD CODES
+# ===================================================================
+# Vectorized equivalents of routes.GRANULARITIES: each maps an array of day numbers
+# to integer period codes, and a code back to a date inside that period (so the
+# route's own key function can label it identically to the SQL path).
+
+def _month_codes(days):
+    return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+def _month_start(code):
+    return date(1970 + code // 12, code % 12 + 1, 1)
+
+PERIOD_CODES = {
+    'day': (lambda days: days.astype(np.int64), lambda code: EPOCH + timedelta(days=int(code))),
+    # 1970-01-01 was a Thursday, so (days + 3) % 7 is the weekday with Monday as 0
+    'week': (lambda days: days.astype(np.int64) - (days.astype(np.int64) + 3) % 7,
+             lambda code: EPOCH + timedelta(days=int(code))),
+    'month': (_month_codes, lambda code: _month_start(int(code))),
+    'quarter': (lambda days: _month_codes(days) // 3, lambda code: _month_start(int(code) * 3)),
+}
+
+# ===================================================================
+# 2. COLUMNAR SNAPSHOT
+# ===================================================================
+
+class EmployeeSnapshot:
+    """
+    An in-process, columnar copy of 'employees' for the analytics routes.
+
+    Columns are NumPy arrays ordered by employee id, with spare capacity so new hires
+    are appended in place. It is loaded from SQLite on first use and then patched by
+    the write routes after each commit (see patch_snapshot), so it never needs a full
+    reload while the process lives. Patches that arrive during a load are queued and
+    applied once it finishes. Queries and patches are serialized by a lock.
+
+    Writes made by other worker processes can't be patched in; invalidate() marks the
+    snapshot stale instead, and get_snapshot() answers from SQL until a background
+    reload has caught up. A load or patch that fails marks it stale the same way.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.loads = 0
+        self.patches = 0
+        self.version = 0
+        self.stale = False
+        self._stale_generation = 0
+        self._reloading = False
+        self._columns = None
+        self._size = 0
+        self._loading = False
+        self._pending = []
+        self._sorted_cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._columns is not None
+
+    def reset(self):
+        """Drops the loaded data; the next query loads it again."""
+        with self._lock:
+            self._columns = None
+            self._size = 0
+            self.stale = False
+            self._sorted_cache.clear()
+
+    def invalidate(self):
+        """Marks the loaded data out of date, e.g. after another process wrote to the database."""
+        with self._lock:
+            if self._columns is None and not self._loading:
+                return
+            self._mark_stale()
+
+    def reload_in_background(self, logger):
+        """Starts reloading a stale snapshot on a background thread, unless one is already running."""
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = True
+            generation = self._stale_generation
+        threading.Thread(target=self._reload, args=(generation, logger),
+                         name='hrdash-snapshot-reload', daemon=True).start()
+
+    def _reload(self, generation, logger):
+        from database import get_db_pool
+        try:
+            with self._load_lock:
+                pool = get_db_pool(readonly=True)
+                conn = pool.acquire()
+                try:
+                    self.load(conn)
+                finally:
+                    pool.release(conn)
+        except Exception as e:
+            # Still stale, so the next analytics request starts another attempt
+            logger.error(f"Reloading the analytics snapshot failed: {e}")
+            with self._lock:
+                self._reloading = False
+        else:
+            with self._lock:
+                self._reloading = False
+                # Another invalidate() during the reload means it may have missed that write
+                if self._stale_generation == generation:
+                    self.stale = False
+
+    # --- Loading and patching ---
+
+    def ensure_loaded(self):
+        """Loads the snapshot through a pooled read-only connection unless it is already loaded."""
+        if self.loaded:
+            return
+        with self._load_lock:
+            if self.loaded:
+                return
+            from database import get_db_pool
+            pool = get_db_pool(readonly=True)
+            conn = pool.acquire()
+            try:
+                self.load(conn)
+            finally:
+                pool.release(conn)
+
+    def load(self, conn):
+        """Replaces the snapshot with the contents of 'employees' as read on 'conn'."""
+        with self._lock:
+            self._loading = True
+            self._pending = []
+        try:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(f"{SNAPSHOT_SELECT} ORDER BY id")
+            chunks = []
+            while True:
+                rows = cursor.fetchmany(LOAD_CHUNK_ROWS)
+                if not rows:
+                    break
+                chunks.append(self._to_columns(rows))
+            size = sum(len(chunk['id']) for chunk in chunks)
+            capacity = max(1024, int(size * 1.25))
+            columns = {}
+            for name, _, dtype in SNAPSHOT_COLUMNS:
+                column = np.zeros(capacity, dtype=dtype)
+                if chunks:
+                    column[:size] = np.concatenate([chunk[name] for chunk in chunks])
+                columns[name] = column
+        except Exception:
+            with self._lock:
+                self._loading = False
+                self._pending = []
+                self._mark_stale()
+            raise
+        with self._lock:
+            self._columns, self._size = columns, size
+            self._sorted_cache.clear()
+            self.loads += 1
+            self.version += 1
+            try:
+                # Writes committed while the rows were being read
+                for rows in self._pending:
+                    self._apply_or_mark_stale(rows)
+            finally:
+                self._pending = []
+                self._loading = False
+
+    def patch(self, rows):
+        """Upserts rows (tuples in SNAPSHOT_COLUMNS order) changed by a committed write."""
+        with self._lock:
+            if self._loading:
+                self._pending.append(rows)
+            elif self._columns is not None:
+                self._apply_or_mark_stale(rows)
+
+    def _mark_stale(self):
+        self.stale = True
+        self._stale_generation += 1
+
+    def _apply_or_mark_stale(self, rows):
+        """Applies a patch; if that fails, the columns may be half-patched, so they are reloaded."""
+        try:
+            self._apply(rows)
+        except Exception:
+            self._mark_stale()
+            raise
+
+    @staticmethod
+    def _to_columns(rows):
+        """Converts row tuples into one array per snapshot column."""
+        block = np.array(rows, dtype=np.float64).reshape(len(rows), len(SNAPSHOT_COLUMNS))
+        return {name: block[:, i].astype(dtype) for i, (name, _, dtype) in enumerate(SNAPSHOT_COLUMNS)}
+
+    def _apply(self, rows):
+        block = self._to_columns(rows)
+        size = self._size
+        ids = self._columns['id'][:size]
+        positions = np.searchsorted(ids, block['id'])
+        found = positions < size
+        found[found] = ids[positions[found]] == block['id'][found]
+        for name, _, _ in SNAPSHOT_COLUMNS:
+            self._columns[name][positions[found]] = block[name][found]
+
+        new = ~found
+        if new.any():
+            new_ids = block['id'][new]
+            order = np.argsort(new_ids)
+            if size == 0 or new_ids.min() > ids[-1]:
+                # New hires have the highest ids, so they are appended in place
+                self._reserve(size + len(new_ids))
+                for name, _, _ in SNAPSHOT_COLUMNS:
+                    self._columns[name][size:size + len(new_ids)] = block[name][new][order]
+            else:
+                merged_order = np.argsort(np.concatenate([ids, new_ids]), kind='stable')
+                capacity = max(len(self._columns['id']), int((size + len(new_ids)) * 1.25))
+                for name, _, dtype in SNAPSHOT_COLUMNS:
+                    merged = np.concatenate([self._columns[name][:size], block[name][new]])[merged_order]
+                    column = np.zeros(capacity, dtype=dtype)
+                    column[:len(merged)] = merged
+                    self._columns[name] = column
+            self._size = size + len(new_ids)
+
+        self.patches += 1
+        self.version += 1
+        self._sorted_cache.clear()
+
+    def _reserve(self, size):
+        capacity = len(self._columns['id'])
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2)
+        for name, _, dtype in SNAPSHOT_COLUMNS:
+            column = np.zeros(capacity, dtype=dtype)
+            column[:self._size] = self._columns[name][:self._size]
+            self._columns[name] = column
+
+    # --- Queries ---
+    # Department and job title filters are lookup ids; None means no filter.
+
+    def _column(self, name):
+        return self._columns[name][:self._size]
+
+    def _active_mask(self, department=None, job_title=None):
+        mask = self._column('active').copy()
+        if department is not None:
+            mask &= self._column('department') == department
+        if job_title is not None:
+            mask &= self._column('job_title') == job_title
+        return mask
+
+    def _sorted_salaries(self, department=None, job_title=None):
+        """Ascending salaries of the matching active employees, cached until the next patch."""
+        key = (department, job_title)
+        salaries = self._sorted_cache.get(key)
+        if salaries is None:
+            salaries = np.sort(self._column('salary')[self._active_mask(department, job_title)])
+            self._sorted_cache[key] = salaries
+            while len(self._sorted_cache) > SORTED_CACHE_SIZE:
+                self._sorted_cache.popitem(last=False)
+        else:
+            self._sorted_cache.move_to_end(key)
+        return salaries
+
+    def headcount(self, field):
+        """Returns {lookup id: active headcount} for 'department' or 'job_title'."""
+        with self._lock:
+            codes = self._column(field)[self._column('active')]
+            counts = np.bincount(codes) if len(codes) else np.zeros(0, dtype=np.int64)
+        return {int(code): int(count) for code, count in enumerate(counts) if count}
+
+    def salary_histogram(self, bounds=None, bucket_count=None, department=None, job_title=None):
+        """
+        Buckets active salaries like routes.compute_salary_histogram: either by ascending lower
+        edges ('bounds', last bucket open-ended, salaries below the first edge excluded) or into
+        'bucket_count' equal-width buckets between the lowest and highest salary.
+        Returns (lower edges, upper edges, [(count, min, max, sum) or None per bucket]).
+        """
+        with self._lock:
+            salaries = self._sorted_salaries(department, job_title)
+        if bucket_count is not None:
+            if not len(salaries):
+                return [], [], []
+            low, high = float(salaries[0]), float(salaries[-1])
+            width = (high - low) / bucket_count or 1
+            bounds = [low + i * width for i in range(bucket_count)]
+            upper_bounds = bounds[1:] + [high]
+            # Same arithmetic as the SQL expression, so every salary lands in the same bucket
+            buckets = np.minimum(((salaries - low) / width).astype(np.int64), bucket_count - 1)
+            edges = np.searchsorted(buckets, np.arange(bucket_count + 1), side='left')
+        else:
+            upper_bounds = list(bounds[1:]) + [None]
+            edges = np.append(np.searchsorted(salaries, bounds, side='left'), len(salaries))
+        prefix = np.concatenate([[0.0], np.cumsum(salaries)])
+        stats = []
+        for start, end in zip(edges[:-1], edges[1:]):
+            if end > start:
+                stats.append((int(end - start), float(salaries[start]), float(salaries[end - 1]),
+                              float(prefix[end] - prefix[start])))
+            else:
+                stats.append(None)
+        return list(bounds), upper_bounds, stats
+
+    def salary_percentiles(self, percentiles, lowest, department=None, job_title=None):
+        """
+        Returns {percentile: salary} over active salaries at or above 'lowest', by the
+        nearest-rank method; the median averages the two middle salaries for even counts.
+        """
+        with self._lock:
+            salaries = self._sorted_salaries(department, job_title)
+        salaries = salaries[np.searchsorted(salaries, lowest, side='left'):]
+        total = len(salaries)
+        result = {}
+        for p in percentiles:
+            if not total:
+                result[p] = None
+            elif p == 50 and total % 2 == 0:
+                result[p] = float((salaries[total // 2 - 1] + salaries[total // 2]) / 2)
+            else:
+                result[p] = float(salaries[max(1, -(-p * total // 100)) - 1])
+        return result
+
+    def salary_by_group(self, fields, percentiles):
+        """
+        Salary statistics of active employees per combination of 'fields' (any of
+        'department', 'job_title'). Returns a list of dicts with the group's lookup ids,
+        count, min, max, mean and 'p<N>' for each percentile.
+        """
+        with self._lock:
+            active = self._column('active')
+            salaries = self._column('salary')[active]
+            codes = [self._column(field)[active] for field in fields]
+        if not len(salaries):
+            return []
+        # Sort by group, then salary, so each group is one ascending run
+        order = np.lexsort([salaries] + codes[::-1])
+        salaries = salaries[order]
+        codes = [c[order] for c in codes]
+        change = np.zeros(len(salaries), dtype=bool)
+        change[0] = True
+        for c in codes:
+            change[1:] |= c[1:] != c[:-1]
+        starts = np.flatnonzero(change)
+        ends = np.append(starts[1:], len(salaries))
+        counts = ends - starts
+        sums = np.add.reduceat(salaries, starts)
+
+        values = {}
+        for p in percentiles:
+            ranks = np.maximum(1, -(-p * counts // 100))
+            picked = salaries[starts + ranks - 1]
+            if p == 50:
+                even = counts % 2 == 0
+                lower = salaries[starts + np.maximum(counts // 2 - 1, 0)]
+                upper = salaries[np.minimum(starts + counts // 2, len(salaries) - 1)]
+                picked = np.where(even, (lower + upper) / 2, picked)
+            values[p] = picked
+
+        groups = []
+        for i, start in enumerate(starts):
+            group = {field: int(c[start]) for field, c in zip(fields, codes)}
+            group.update({
+                'count': int(counts[i]),
+                'min': float(salaries[start]),
+                'max': float(salaries[ends[i] - 1]),
+                'mean': float(sums[i] / counts[i]),
+            })
+            group.update({f"p{p}": float(values[p][i]) for p in percentiles})
+            groups.append(group)
+        return groups
+
+    def events_by_period(self, start, end, granularity, key_of, by_department=False):
+        """
+        Counts hires and departures per period (and department) between the dates start
+        and end, like routes.count_events_by_period. 'key_of' is the route's date -> period
+        key function. Returns rows of (period, department id or '', hires, departures).
+        """
+        code_of, date_of = PERIOD_CODES[granularity]
+        first, last = day_number(start), day_number(end)
+        with self._lock:
+            start_days, end_days = self._column('start_day'), self._column('end_day')
+            hired = (start_days >= first) & (start_days <= last)
+            left = ~self._column('active') & (end_days >= first) & (end_days <= last)
+            departments = self._column('department')
+            sides = [(code_of(start_days[hired]), departments[hired]),
+                     (code_of(end_days[left]), departments[left])]
+
+        counts = {}
+        for side, (periods, depts) in enumerate(sides):
+            if not len(periods):
+                continue
+            width = int(depts.max()) + 1 if by_department else 1
+            keys = periods * width + (depts if by_department else 0)
+            unique, totals = np.unique(keys, return_counts=True)
+            for key, total in zip(unique.tolist(), totals.tolist()):
+                period, dept = divmod(key, width)
+                entry = counts.setdefault((period, dept if by_department else ''), [0, 0])
+                entry[side] += total
+        return [(key_of(date_of(period)), dept, hires, departures)
+                for (period, dept), (hires, departures) in sorted(counts.items(), key=lambda item: item[0][0])]
+
+    # --- Diagnostics ---
+
+    def memory_report(self):
+        """Bytes used by each column (live rows) and allocated (including spare capacity)."""
+        with self._lock:
+            if self._columns is None:
+                return {'loaded': False}
+            columns = {name: {'dtype': dtype,
+                              'bytes': int(self._columns[name][:self._size].nbytes),
+                              'allocatedBytes': int(self._columns[name].nbytes)}
+                       for name, _, dtype in SNAPSHOT_COLUMNS}
+            sorted_cache_bytes = sum(int(a.nbytes) for a in self._sorted_cache.values())
+            rows, capacity = self._size, len(self._columns['id'])
+        used = sum(c['bytes'] for c in columns.values())
+        allocated = sum(c['allocatedBytes'] for c in columns.values())
+        return {
+            'loaded': True,
+            'rows': rows,
+            'capacity': capacity,
+            'columns': columns,
+            'bytes': used,
+            'allocatedBytes': allocated,
+            'bytesPerRow': round(used / rows, 1) if rows else 0,
+            'sortedCacheEntries': len(self._sorted_cache),
+            'sortedCacheBytes': sorted_cache_bytes,
+        }
+
+employee_snapshot = EmployeeSnapshot()
+
+def init_snapshot(app):
+    """Enables the snapshot when configured and NumPy is installed; it loads on first use."""
+    employee_snapshot.enabled = bool(app.config.get('ANALYTICS_SNAPSHOT_ENABLED', True)) and np is not None
+    employee_snapshot.reset()
+    if app.config.get('ANALYTICS_SNAPSHOT_ENABLED', True) and np is None:
+        app.logger.info("NumPy is not installed; analytics are computed in SQLite")
+
+def get_snapshot():
+    """
+    Returns the loaded snapshot for an analytics query, or None when it is disabled,
+    stale (in which case a reload is started and the caller queries SQLite meanwhile)
+    or could not be loaded.
+    """
+    from flask import current_app
+    if not employee_snapshot.enabled:
+        return None
+    if employee_snapshot.stale:
+        employee_snapshot.reload_in_background(current_app.logger)
+        return None
+    try:
+        employee_snapshot.ensure_loaded()
+    except Exception as e:
+        current_app.logger.error(f"Loading the analytics snapshot failed; querying SQLite instead: {e}")
+        return None
+    return employee_snapshot
+
+def patch_snapshot(conn, where, params=()):
+    """
+    Reads the employees matching 'where' on the writer connection and patches the snapshot
+    with them once the current write operation commits. Call from inside a writer operation.
+    """
+    if not employee_snapshot.enabled:
+        return
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    patch_snapshot_rows(cursor.execute(f"{SNAPSHOT_SELECT} WHERE {where}", params).fetchall())
+
+def patch_snapshot_rows(rows):
+    """
+    Patches the snapshot with rows a write has already read back, e.g. with SNAPSHOT_EXPRESSIONS
+    in its RETURNING clause (tuples in SNAPSHOT_COLUMNS order), once the current write
+    operation commits. Call from inside a writer operation.
+    """
+    if rows and employee_snapshot.enabled:
+        from extensions import writer
+        writer.on_commit(lambda: employee_snapshot.patch(rows))
+
+# ===================================================================
+# 3. CONSISTENCY CHECK
+# ===================================================================
+
+def verify_snapshot(snapshot, conn):
+    """
+    Compares the snapshot with SQLite: every column of every row, then the headcount,
+    salary and monthly hire/departure figures computed both ways.
+    Returns a list of mismatch descriptions; an empty list means they agree.
+    """
+    mismatches = []
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    rows = cursor.execute(f"{SNAPSHOT_SELECT} ORDER BY id").fetchall()
+    expected = EmployeeSnapshot._to_columns(rows) if rows else {name: np.zeros(0, dtype) for name, _, dtype in SNAPSHOT_COLUMNS}
+    with snapshot._lock:
+        actual = {name: snapshot._column(name).copy() for name, _, _ in SNAPSHOT_COLUMNS}
+    if len(expected['id']) != len(actual['id']):
+        return [f"row count: SQL has {len(expected['id'])}, snapshot has {len(actual['id'])}"]
+    for name, _, _ in SNAPSHOT_COLUMNS:
+        differs = np.flatnonzero(expected[name] != actual[name])
+        if len(differs):
+            sample = ", ".join(str(i) for i in expected['id'][differs[:5]].tolist())
+            mismatches.append(f"column {name}: {len(differs)} rows differ (ids {sample})")
+
+    for field, column in (('department', 'department_id'), ('job_title', 'job_title_id')):
+        sql = dict(conn.execute(f"SELECT {column}, COUNT(*) FROM employees WHERE is_active = 1 GROUP BY 1").fetchall())
+        if sql != snapshot.headcount(field):
+            mismatches.append(f"headcount by {field} differs")
+
+    salaries = [row[0] for row in conn.execute("SELECT salary FROM employees WHERE is_active = 1 ORDER BY salary")]
+    _, _, stats = snapshot.salary_histogram(bounds=[min(salaries, default=0)])
+    if salaries:
+        count, low, high, total = stats[0]
+        if (count, low, high) != (len(salaries), salaries[0], salaries[-1]) or abs(total - sum(salaries)) > 1e-6 * abs(total or 1):
+            mismatches.append("salary totals differ")
+        for p, value in snapshot.salary_percentiles((50, 90, 99), salaries[0]).items():
+            n = len(salaries)
+            if p == 50 and n % 2 == 0:
+                sql_value = (salaries[n // 2 - 1] + salaries[n // 2]) / 2
+            else:
+                sql_value = salaries[max(1, -(-p * n // 100)) - 1]
+            if value != sql_value:
+                mismatches.append(f"salary p{p}: SQL {sql_value}, snapshot {value}")
+
+    month_key = lambda d: f"{d.year:04d}-{d.month:02d}"
+    events = snapshot.events_by_period(date(1, 1, 1), date(9999, 12, 31), 'month', month_key)
+    for table, index in (('agg_monthly_hires', 2), ('agg_monthly_departures', 3)):
+        sql = dict(conn.execute(f"SELECT month, count FROM {table} WHERE count > 0").fetchall())
+        mine = {row[0]: row[index] for row in events if row[index]}
+        if sql != mine:
+            mismatches.append(f"{table} differs from the snapshot's monthly counts")
+    return mismatches
+
+if __name__ == '__main__':
+    # Usage: python snapshot.py [database file]
+    # Loads the snapshot, prints its memory footprint and checks it against SQL.
+    import json
+    import time
+    if np is None:
+        print("NumPy is not installed; the analytics snapshot is unavailable.")
+        sys.exit(1)
+    database_name = sys.argv[1] if len(sys.argv) > 1 else DATABASE_NAME
+    with sqlite3.connect(database_name) as conn:
+        snapshot = EmployeeSnapshot()
+        started = time.perf_counter()
+        snapshot.load(conn)
+        print(f"Loaded {snapshot._size} employees in {time.perf_counter() - started:.2f}s")
+        print(json.dumps(snapshot.memory_report(), indent=2))
+        mismatches = verify_snapshot(snapshot, conn)
+    for mismatch in mismatches:
+        print(f"MISMATCH {mismatch}")
+    if mismatches:
+        sys.exit(1)
+    print("Snapshot matches the employees table.")
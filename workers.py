@@ -0,0 +1,110 @@
+# hrdash/workers.py
+
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+
+# ===================================================================
+# PRE-FORKED WORKER PROCESSES
+# ===================================================================
+# The parent applies migrations, opens the listening socket and forks the workers.
+# Each worker builds its own app (pools, writer thread, caches) after the fork and
+# accepts connections from the shared socket, so the kernel spreads clients over
+# the workers. Socket.IO events cross between them through the message queue (see
+# message_queue.py); clients must use the WebSocket transport, because consecutive
+# long-polling requests may land on different workers.
+
+RESTART_DELAY = 1  # Seconds before replacing a worker that exited unexpectedly
+
+def create_listener(host, port, backlog=128):
+    """Binds the socket every worker accepts connections from."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def serve_worker(sock, config_name, host, port):
+    """Runs one worker: creates its app and serves the shared socket until SIGTERM or SIGINT."""
+    from app import create_app
+    from extensions import socketio, writer
+    from database import close_db_pools
+
+    app = create_app(config_name)
+    try:
+        if socketio.async_mode == 'threading':
+            from werkzeug.serving import make_server
+            server = make_server(host, port, app, threaded=True, fd=sock.fileno())
+            # shutdown() waits for serve_forever() to return, so it can't run in the handler itself
+            stop = lambda *_: threading.Thread(target=server.shutdown).start()
+            signal.signal(signal.SIGTERM, stop)
+            signal.signal(signal.SIGINT, stop)
+            server.serve_forever()
+        elif socketio.async_mode == 'eventlet':
+            import eventlet.greenio
+            import eventlet.wsgi
+            eventlet.wsgi.server(eventlet.greenio.GreenSocket(sock), app)
+        else:
+            raise RuntimeError(f"Pre-forked workers don't support async mode '{socketio.async_mode}'")
+    finally:
+        writer.stop()
+        close_db_pools()
+
+def serve_workers(config_name, host, port, workers):
+    """
+    Starts 'workers' processes serving one port and supervises them, replacing any that
+    exits unexpectedly. SIGTERM or SIGINT stops them all.
+    """
+    from database import create_database_table
+    # Once, here, so the workers don't race to migrate the same database
+    create_database_table()
+    sock = create_listener(host, port)
+    children = {}
+    stopping = False
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            # A replacement worker would otherwise inherit the supervisor's handlers
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                serve_worker(sock, config_name, host, port)
+            except Exception:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = index
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    for index in range(workers):
+        spawn(index)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"Serving on http://{host}:{port} with {workers} worker processes")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is not None and not stopping:
+            print(f"Worker {index} (pid {pid}) exited with status {status}; restarting it")
+            time.sleep(RESTART_DELAY)
+            spawn(index)
+    sock.close()
@@ -0,0 +1,232 @@
+# hrdash/writer.py
+
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from metrics import current_statement_list, recording_statements
+
+class WriteUnavailable(Exception):
+    """Raised when a write cannot be accepted or finished in time; routes answer 503."""
+
+class WriteQueueFull(WriteUnavailable):
+    """The write queue is at capacity."""
+
+class WriteTimeout(WriteUnavailable):
+    """A queued write was withdrawn because the writer did not start it within WRITE_TIMEOUT seconds."""
+
+# Placed on the queue to make the writer thread exit
+_STOP = object()
+
+class WriteQueue:
+    """
+    Serializes every database write through one thread that owns the only write connection.
+
+    Routes hand it a function taking a connection, e.g. 'writer.run(lambda conn: ...)',
+    and block until it has been committed. The thread drains up to 'batch_max' queued
+    operations at a time and commits them as one transaction (group commit), so a burst
+    of writes costs one fsync instead of one each. Every operation runs inside its own
+    SAVEPOINT: if it raises, only its changes are rolled back and the exception is
+    re-raised to its caller, while the rest of the batch still commits. The statements
+    an operation executes are counted in the metrics of the request that submitted it.
+
+    The queue is bounded; when it is full, submit() raises WriteQueueFull instead of
+    letting requests pile up behind the writer.
+    """
+
+    def __init__(self, max_size=256, batch_max=64, timeout=30):
+        self.max_size = max_size
+        self.batch_max = batch_max
+        self.timeout = timeout
+        self._queue = None
+        self._thread = None
+        self._app = None
+        self._callbacks = None
+        self._commit_hooks = []
+        self._lock = threading.Lock()
+        self.counters = {
+            'submitted': 0,   # Operations accepted onto the queue
+            'rejected': 0,    # Operations refused because the queue was full
+            'completed': 0,   # Operations committed
+            'failed': 0,      # Operations that raised and were rolled back
+            'batches': 0,     # Transactions committed (or attempted) by the writer
+            'timed_out': 0,   # Callers that gave up waiting
+        }
+        self.max_batch_seen = 0
+
+    def init_app(self, app):
+        """Reads the queue limits from the app config and (re)starts the writer thread."""
+        self.stop()
+        self.max_size = app.config.get('WRITE_QUEUE_SIZE', self.max_size)
+        self.batch_max = app.config.get('WRITE_BATCH_MAX', self.batch_max)
+        self.timeout = app.config.get('WRITE_TIMEOUT', self.timeout)
+        self._app = app
+        self._commit_hooks = []
+        self._queue = queue.Queue(maxsize=self.max_size)
+        self._thread = threading.Thread(target=self._run, name='hrdash-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        """Lets the writer finish what is already queued, then stops the thread."""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass  # The thread is a daemon; it dies with the process
+        self._thread.join(timeout)
+        self._thread = None
+
+    # --- Submitting work ---
+
+    def submit(self, operation):
+        """
+        Queues 'operation(conn)' and returns a Future for its result.
+        Raises WriteQueueFull if the queue is at capacity.
+        """
+        if self._thread is None:
+            raise RuntimeError("The write queue has not been started; call init_app() first")
+        future = Future()
+        try:
+            self._queue.put_nowait((operation, future, current_statement_list()))
+        except queue.Full:
+            with self._lock:
+                self.counters['rejected'] += 1
+            raise WriteQueueFull(f"Write queue is full ({self.max_size} operations waiting)")
+        with self._lock:
+            self.counters['submitted'] += 1
+        return future
+
+    def run(self, operation):
+        """Submits 'operation(conn)', waits until it is committed and returns its result."""
+        future = self.submit(operation)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # Only withdraws the operation if the writer hasn't picked it up yet. Once it
+            # has, the write is going to commit (or fail) and the caller must hear which.
+            if not future.cancel():
+                return future.result()
+            with self._lock:
+                self.counters['timed_out'] += 1
+            raise WriteTimeout(f"Write did not start within {self.timeout} seconds")
+
+    def on_commit(self, callback):
+        """
+        Registers 'callback()' to run on the writer thread once the operation currently
+        executing has been committed, before its caller is woken. Dropped if the
+        operation is rolled back. Only valid inside an operation.
+        """
+        if self._callbacks is None or threading.current_thread() is not self._thread:
+            raise RuntimeError("on_commit() can only be called from inside a write operation")
+        self._callbacks.append(callback)
+
+    def add_commit_hook(self, hook):
+        """
+        Registers 'hook(conn)' to run inside every batch transaction that has at least one
+        successful operation, just before COMMIT. It may return a callback to run on the
+        writer thread once the batch has committed. Cleared by init_app().
+        """
+        self._commit_hooks.append(hook)
+
+    def depth(self):
+        """Number of operations waiting for the writer."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self):
+        """Returns a snapshot of the counters plus the current queue depth."""
+        with self._lock:
+            return dict(self.counters, depth=self.depth(), max_size=self.max_size,
+                        max_batch_seen=self.max_batch_seen)
+
+    # --- Writer thread ---
+
+    def _run(self):
+        from database import DATABASE_NAME, open_connection, connection_options
+        # An app context makes current_app available to operations (e.g. for config lookups)
+        with self._app.app_context():
+            options = connection_options(self._app.config)
+            conn = open_connection(DATABASE_NAME, isolation_level=None, **options)
+            try:
+                while True:
+                    batch, stopping = self._next_batch()
+                    if batch:
+                        conn = self._commit_batch(conn, batch, options)
+                    if stopping:
+                        return
+            finally:
+                conn.close()
+
+    def _next_batch(self):
+        """Blocks for the first operation, then takes whatever else is already queued."""
+        batch = []
+        item = self._queue.get()
+        while True:
+            if item is _STOP:
+                return batch, True
+            future = item[1]
+            # Skips operations whose caller timed out and cancelled them
+            if future.set_running_or_notify_cancel():
+                batch.append(item)
+            if len(batch) >= self.batch_max:
+                return batch, False
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return batch, False
+
+    def _commit_batch(self, conn, batch, options):
+        """Runs a batch in one transaction and resolves its futures once it is committed."""
+        from database import DATABASE_NAME, open_connection
+        outcomes = []
+        after_commit = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for operation, future, records in batch:
+                conn.execute("SAVEPOINT write_op")
+                self._callbacks = []
+                try:
+                    with recording_statements(records):
+                        result = operation(conn)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write_op")
+                    conn.execute("RELEASE write_op")
+                    outcomes.append((future, False, e, []))
+                else:
+                    conn.execute("RELEASE write_op")
+                    outcomes.append((future, True, result, self._callbacks))
+                finally:
+                    self._callbacks = None
+            if any(ok for _, ok, _, _ in outcomes):
+                after_commit = [hook(conn) for hook in self._commit_hooks]
+            conn.execute("COMMIT")
+        except Exception as e:
+            # The transaction itself failed (e.g. the disk is full), so nothing in it was committed
+            self._app.logger.error(f"Write batch of {len(batch)} operations failed: {e}")
+            try:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+            except Exception:
+                conn.close()
+                conn = open_connection(DATABASE_NAME, isolation_level=None, **options)
+            outcomes = [(future, False, e, []) for _, future, _ in batch]
+            after_commit = []
+
+        with self._lock:
+            self.counters['batches'] += 1
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            for _, ok, _, _ in outcomes:
+                self.counters['completed' if ok else 'failed'] += 1
+        callbacks = [callback for callback in after_commit if callback]
+        callbacks += [callback for _, _, _, registered in outcomes for callback in registered]
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                self._app.logger.error(f"Write on_commit callback failed: {e}")
+        for future, ok, value, _ in outcomes:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+        return conn